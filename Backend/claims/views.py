@@ -15,11 +15,25 @@ from django.views.decorators.http import require_http_methods
 import logging
 import requests
 import utils
+from urllib.parse import quote
 from utils.preprocessing import preprocess_single_claim_for_prediction
 
 User = get_user_model()  # Get the user model
 logger = logging.getLogger(__name__)  # Set up logging
 
+def get_prediction_url():
+    """
+    Returns the MLaaS predict URL. Predictions are routed through the configured
+    endpoint so the model activated by engineers is used; a fixed algorithm ID
+    is only used when no endpoint is configured.
+    """
+    base_url = settings.MLAAS_SERVICE_URL.rstrip('/')
+    endpoint = getattr(settings, 'DEFAULT_ML_ENDPOINT', None)
+    if endpoint:
+        return f"{base_url}/endpoints/{quote(str(endpoint), safe='')}/predict/"
+    algorithm_id = getattr(settings, 'DEFAULT_ML_ALGORITHM_ID', 5)
+    return f"{base_url}/algorithms/{algorithm_id}/predict/"
+
 # ------------------------
 # Claims Views (Author: Ahmed Mohamed)
 # ------------------------
@@ -131,8 +145,7 @@ class ClaimSubmissionView(LoginRequiredMixin, CreateView):
                 "input_data": [input_features],  # a list of lists (one list for each instance)
                 "algorithm_name": "xgboost_18feature_model"  # Update as per your MLaaS setup
             }
-            algorithm_id = getattr(settings, 'DEFAULT_ML_ALGORITHM_ID', 5)
-            predict_url = f"{settings.MLAAS_SERVICE_URL.rstrip('/')}/algorithms/{algorithm_id}/predict/"
+            predict_url = get_prediction_url()
             logger.info(f"Sending ML prediction request for Claim {claim.id} to {predict_url}")
             response = requests.post(predict_url, json=payload, timeout=10)
             response.raise_for_status()
@@ -188,8 +201,7 @@ class ClaimPredictionView(LoginRequiredMixin, DetailView):
                 }, status=500)
 
             # Construct endpoint URL 
-            algorithm_id = getattr(settings, 'DEFAULT_ML_ALGORITHM_ID', 5)
-            predict_url = f"{settings.MLAAS_SERVICE_URL.rstrip('/')}/algorithms/{algorithm_id}/predict/"
+            predict_url = get_prediction_url()
 
             # Make prediction request
             payload = {
@@ -275,8 +287,7 @@ def claim_detail(request, claim_id):
                 if not getattr(settings, 'MLAAS_SERVICE_URL', None):
                     error = 'MLaaS service not configured.'  # Set error if MLaaS is not configured
                 else:
-                    algorithm_id = getattr(settings, 'DEFAULT_ML_ALGORITHM_ID', 5)
-                    predict_url = f"{settings.MLAAS_SERVICE_URL.rstrip('/')}/algorithms/{algorithm_id}/predict/"
+                    predict_url = get_prediction_url()
                     response = requests.post(
                         predict_url,
                         json={"input_data": [input_features]},
@@ -1,6 +1,6 @@
 # engineer/urls.py
 """
-URL config for engineer app: dashboard, model upload, retraining trigger.
+URL config for engineer app: dashboard, model upload, retraining trigger and job status.
 """
 from django.urls import path
 from . import views # Import views from the current directory
@@ -27,6 +27,12 @@ urlpatterns = [
         views.trigger_retrain,
         name='trigger_retrain'  # Name used in the retrain button form's action
     ),
+    # JSON status of a queued retraining job, polled by the dashboard
+    path(
+        'retrain_jobs/<int:job_id>/status/',
+        views.retrain_job_status,
+        name='retrain_job_status'
+    ),
     # Removed or commented out the predict_claim_for_engineer URL unless needed
     # path('predict/<int:claim_id>/', views.predict_claim_for_engineer, name='predict_engineer_claim'),
     path('swap_active_model/', swap_active_model, name='swap_active_model'),
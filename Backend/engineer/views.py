@@ -16,6 +16,8 @@ import utils  # Assuming utils.py contains is_engineer role check
 
 logger = logging.getLogger(__name__)  # Set up logging
 
+RETRAIN_JOBS_SHOWN = 10  # Retraining jobs listed on the dashboard
+
 # --- Helper Function for MLaaS API Calls ---
 def _call_mlaas_api(method: str, endpoint_path: str, json_payload: dict = None,
                     data_payload: dict = None, files: dict = None,
@@ -99,11 +101,12 @@ def _call_mlaas_api(method: str, endpoint_path: str, json_payload: dict = None,
         return {'error': f'Unexpected client-side error: {e}', 'status_code': 500}  # Return unexpected error
 
 def _get_dashboard_context_data(request) -> dict:
-    """Helper to fetch models, logs, and endpoints for the dashboard context."""
+    """Helper to fetch models, logs, endpoints and retraining jobs for the dashboard context."""
     context = {}  # Initialise context dictionary
     ml_models = []  # Initialise list for ML models
     prediction_logs = []  # Initialise list for prediction logs
     available_endpoints = []  # Initialise list for available endpoints
+    retrain_jobs = []  # Initialise list for retraining jobs
 
     # Fetch Models (use new engineer endpoint)
     mlaas_model_response = _call_mlaas_api('GET', 'engineer/models/')
@@ -149,9 +152,22 @@ def _get_dashboard_context_data(request) -> dict:
             messages.warning(request, "No endpoints found via API or unexpected format.")  # Log warning for unexpected format
             logger.warning("No endpoints fetched or unexpected endpoint format: %s", endpoint_data)  # Log unexpected format
 
+    # Fetch Recent Retraining Jobs (newest first)
+    mlaas_jobs_response = _call_mlaas_api('GET', 'retrain-jobs/')  # Call MLaaS API to get retraining jobs
+    if 'error' in mlaas_jobs_response:
+        messages.warning(request, f"Could not fetch retraining jobs: {mlaas_jobs_response['error']}")  # Log warning if fetching jobs fails
+    elif 'data' in mlaas_jobs_response:
+        jobs_data = mlaas_jobs_response['data']  # Get job data from response
+        results = jobs_data.get('results') if isinstance(jobs_data, dict) else jobs_data  # Get results
+        if isinstance(results, list):
+            retrain_jobs = results[:RETRAIN_JOBS_SHOWN]  # Keep the most recent jobs
+        else:
+            logger.warning("Unexpected retraining job data format: %s", jobs_data)  # Log unexpected format
+
     context['ml_models'] = ml_models  # Add models to context
     context['prediction_logs'] = prediction_logs  # Add logs to context
     context['available_endpoints'] = available_endpoints  # Add endpoints to context
+    context['retrain_jobs'] = retrain_jobs  # Add retraining jobs to context
     return context  # Return context dictionary
 
 # --- Engineer Dashboard View ---
@@ -243,12 +259,21 @@ def upload_model(request):
 @login_required
 @user_passes_test(utils.is_engineer, login_url='role_redirect')
 def trigger_retrain(request, algorithm_id: int):
-    """Handles POST request to trigger retraining for a specific algorithm ID."""
+    """
+    Handles POST request to trigger retraining for a specific algorithm ID.
+
+    MLaaS queues the job and answers 202 straight away; the dashboard polls
+    retrain_job_status for its progress instead of waiting for the fit.
+    The "Full refit" button posts mode=full; otherwise MLaaS picks the
+    model type's default (incremental for tree models).
+    """
     logger.info("Engineer retraining request for Algorithm ID %s by user '%s'",
                 algorithm_id, request.user.username)  # Log retraining request
 
+    mode = request.POST.get('mode')  # 'full' forces a refit from scratch
     mlaas_response = _call_mlaas_api(
-        'POST', f'algorithms/{algorithm_id}/retrain/', timeout=300  # Call MLaaS API to trigger retraining
+        'POST', f'algorithms/{algorithm_id}/retrain/',  # Call MLaaS API to queue retraining
+        json_payload={'mode': mode} if mode in ('full', 'incremental') else None,
     )
 
     if 'error' in mlaas_response:  # Check for errors in response
@@ -264,7 +289,13 @@ def trigger_retrain(request, algorithm_id: int):
 
         if mlaas_data.get("status") == "no_data":  # Check if no data returned
             messages.info(request, f"Retraining for model ID {algorithm_id}: {message}")  # Info message
-        elif status_code in [200, 201, 202]:  # Check for successful status codes
+        elif status_code == 202:  # Queued (or already queued/running) as a retraining job
+            messages.success(
+                request,
+                f"Retraining for model ID {algorithm_id}: {message} Progress is shown under Retraining Jobs."
+            )  # Success message
+            logger.info("Retraining for Algorithm ID %s runs as job %s", algorithm_id, mlaas_data.get('job_id'))
+        elif status_code in [200, 201]:  # Check for successful status codes
             messages.success(request, f"Retraining for model ID {algorithm_id}: {message}")  # Success message
             if new_model_info:  # Check if new model info exists
                 logger.info("Retraining created new model: ID %s, Version %s",
@@ -280,6 +311,20 @@ def trigger_retrain(request, algorithm_id: int):
     return redirect('engineer:engineer_page')
 
 
+# --- Retraining Job Status View ---
+@require_GET
+@login_required
+@user_passes_test(utils.is_engineer, login_url='role_redirect')
+def retrain_job_status(request, job_id: int):
+    """Returns a retraining job's status, phase and per-phase timings as JSON (polled by the dashboard)."""
+    mlaas_response = _call_mlaas_api('GET', f'retrain-jobs/{job_id}/')  # Call MLaaS API for the job status
+    if 'error' in mlaas_response:
+        return JsonResponse(
+            {'error': mlaas_response['error']}, status=mlaas_response.get('status_code') or 502
+        )  # Pass the MLaaS error on to the page
+    return JsonResponse(mlaas_response['data'] or {})  # Return job status as JSON
+
+
 # --- Model Swap View ---
 @require_POST
 @login_required
@@ -158,3 +158,4 @@ CSRF_TRUSTED_ORIGINS = [
 # ------------------------------------------------------------------
 MLAAS_SERVICE_URL = os.getenv('MLAAS_SERVICE_URL', 'http://mlaas:8009/api')
 DEFAULT_ML_ALGORITHM_ID = int(os.getenv('DEFAULT_ML_ALGORITHM_ID', '5'))
+DEFAULT_ML_ENDPOINT = os.getenv('DEFAULT_ML_ENDPOINT', 'Insurance Claim Prediction')  # Endpoint id or name; predictions use its active model
@@ -3,4 +3,5 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'config.urls_asgi')  # Async predict/explain views under ASGI
 application = get_asgi_application()
@@ -42,7 +42,7 @@ MIDDLEWARE = [
 CORS_ALLOW_ALL_ORIGINS = True  # Allow all origins for CORS
 CORS_ALLOW_CREDENTIALS = True  # Allow credentials for CORS
 
-ROOT_URLCONF = 'config.urls'  # Root URL configuration
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'config.urls')  # Root URL configuration (config.asgi selects config.urls_asgi)
 
 # Template settings
 TEMPLATES = [
@@ -114,6 +114,94 @@ MEDIA_URL = '/media/'  # URL for serving media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')  # Directory for uploaded media files
 
 MODEL_ROOT = os.path.join(BASE_DIR, 'ml_models')  # Directory for ML models
+MODEL_ROUTING_VERSION_FILE = os.path.join(MEDIA_ROOT, 'routing.version')  # Shared version stamp for endpoint routing
+
+# In-process model cache (per worker). Budget is estimated from artifact size on disk; 0 disables caching.
+MODEL_CACHE_MAX_MB = int(os.environ.get('MODEL_CACHE_MAX_MB', '512'))  # Memory budget for cached models
+MODEL_CACHE_MAX_BYTES = MODEL_CACHE_MAX_MB * 1024 * 1024  # Memory budget in bytes
+
+# Load active models and run one synthetic prediction in each worker before it accepts traffic
+MODEL_WARMUP_ON_BOOT = os.environ.get('MODEL_WARMUP_ON_BOOT', 'True') == 'True'
+
+# Shared model memory across gunicorn workers:
+# MODEL_PRELOAD_IN_MASTER loads active models in the gunicorn master before fork (copy-on-write pages);
+# MODEL_MMAP_MODE ('r') memory-maps the NumPy arrays inside joblib artifacts from the page cache.
+MODEL_PRELOAD_IN_MASTER = os.environ.get('MODEL_PRELOAD_IN_MASTER', 'False') == 'True'
+MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE') or None
+
+# Asynchronous MLRequest logging: rows are queued and written with bulk_create by a background thread.
+# When enabled, predict returns the row's pre-allocated UUID as request_id.
+MLREQUEST_ASYNC_LOGGING = os.environ.get('MLREQUEST_ASYNC_LOGGING', 'False') == 'True'
+MLREQUEST_LOG_QUEUE_SIZE = int(os.environ.get('MLREQUEST_LOG_QUEUE_SIZE', '10000'))  # Bounded queue length
+MLREQUEST_LOG_BATCH_SIZE = int(os.environ.get('MLREQUEST_LOG_BATCH_SIZE', '500'))  # Rows per bulk_create
+MLREQUEST_LOG_FLUSH_INTERVAL_MS = int(os.environ.get('MLREQUEST_LOG_FLUSH_INTERVAL_MS', '500'))  # Max wait before a flush
+MLREQUEST_LOG_OVERFLOW = os.environ.get('MLREQUEST_LOG_OVERFLOW', 'sync')  # 'sync' (write inline) or 'drop'
+
+# Micro-batching: concurrent single-row predictions for the same algorithm share one vectorised predict.
+# Only requests in the same worker process are coalesced, so combine with GUNICORN_THREADS > 1.
+PREDICT_BATCHING_ENABLED = os.environ.get('PREDICT_BATCHING_ENABLED', 'False') == 'True'
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', '2'))  # Max wait for more rows
+PREDICT_BATCH_MAX_ROWS = int(os.environ.get('PREDICT_BATCH_MAX_ROWS', '64'))  # Rows that close a batch early
+
+# Per-row prediction result cache, keyed by algorithm id, artifact version and a hash of the row
+PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', 'True') == 'True'
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', '10000'))  # LRU bound in rows
+PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get('PREDICTION_CACHE_TTL_SECONDS', '300'))  # Lifetime of a cached row
+
+# Compiled tree engine (MLAlgorithm.runtime = 'TREE_ENGINE'): batches above this size use the native estimator
+TREE_ENGINE_MAX_BATCH_ROWS = int(os.environ.get('TREE_ENGINE_MAX_BATCH_ROWS', '32'))
+
+# ONNX runtime (MLAlgorithm.runtime = 'ONNX'): onnxruntime threads per session; 1 avoids oversubscribing workers
+ONNX_INTRA_OP_THREADS = int(os.environ.get('ONNX_INTRA_OP_THREADS', '1'))
+ONNX_EXPORT_ON_REGISTER = os.environ.get('ONNX_EXPORT_ON_REGISTER', 'True') == 'True'  # Export every new algorithm to ONNX
+
+# ASGI deployment (MLAAS_SERVER_MODE=asgi): async predict/explain run CPU-bound work on a bounded thread pool
+INFERENCE_POOL_SIZE = int(os.environ.get('INFERENCE_POOL_SIZE', str(os.cpu_count() or 1)))  # Inference threads per worker
+INFERENCE_MAX_PENDING = int(os.environ.get('INFERENCE_MAX_PENDING', str(4 * INFERENCE_POOL_SIZE)))  # Queued calls before 503
+
+# Streaming bulk prediction (/api/algorithms/<id>/predict/bulk/): rows per chunk read, predicted and logged at once.
+BULK_PREDICT_CHUNK_ROWS = int(os.environ.get('BULK_PREDICT_CHUNK_ROWS', '5000'))  # Default chunk size
+BULK_PREDICT_MAX_CHUNK_ROWS = int(os.environ.get('BULK_PREDICT_MAX_CHUNK_ROWS', '100000'))  # Cap for ?chunk_rows=
+
+# SHAP explain: explainers are built once per algorithm and artifact version and kept in an LRU per worker
+SHAP_EXPLAINER_CACHE_SIZE = int(os.environ.get('SHAP_EXPLAINER_CACHE_SIZE', '8'))  # Max explainers held in memory
+EXPLAIN_SVG_CACHE_SECONDS = int(os.environ.get('EXPLAIN_SVG_CACHE_SECONDS', '3600'))  # Lifetime of a cached ?output=svg chart
+EXPLAIN_BATCH_MAX_REQUESTS = int(os.environ.get('EXPLAIN_BATCH_MAX_REQUESTS', '5000'))  # Request IDs per explain-batch call
+EXPLAIN_LINEAR_BACKGROUND_ROWS = int(os.environ.get('EXPLAIN_LINEAR_BACKGROUND_ROWS', '1000'))  # Logged rows averaged for linear contributions
+
+# Background SHAP precomputation after predict (see ml_api/explanation_queue.py); ?explain=true queues a single call
+EXPLAIN_PRECOMPUTE_ON_PREDICT = os.environ.get('EXPLAIN_PRECOMPUTE_ON_PREDICT', 'False') == 'True'  # Queue every prediction
+EXPLAIN_PRECOMPUTE_QUEUE_SIZE = int(os.environ.get('EXPLAIN_PRECOMPUTE_QUEUE_SIZE', '10000'))  # Bounded queue length
+EXPLAIN_PRECOMPUTE_BATCH_SIZE = int(os.environ.get('EXPLAIN_PRECOMPUTE_BATCH_SIZE', '256'))  # Requests per dispatch
+EXPLAIN_PRECOMPUTE_WORKERS = int(os.environ.get('EXPLAIN_PRECOMPUTE_WORKERS', '1'))  # Threads computing SHAP per worker process
+EXPLAIN_PRECOMPUTE_FLUSH_INTERVAL_MS = int(os.environ.get('EXPLAIN_PRECOMPUTE_FLUSH_INTERVAL_MS', '200'))  # Max wait to fill a batch
+
+# Retraining jobs (see ml_api/retrain_jobs.py), run by `manage.py run_retrain_worker`
+RETRAIN_JOB_POLL_SECONDS = float(os.environ.get('RETRAIN_JOB_POLL_SECONDS', '5'))  # Worker sleep when the queue is empty
+RETRAIN_JOB_HEARTBEAT_SECONDS = float(os.environ.get('RETRAIN_JOB_HEARTBEAT_SECONDS', '30'))  # Worker heartbeat interval while running a job
+RETRAIN_JOB_TIMEOUT_SECONDS = int(os.environ.get('RETRAIN_JOB_TIMEOUT_SECONDS', '300'))  # No heartbeat for this long = worker died
+RETRAIN_EXTRACT_CHUNK_SIZE = int(os.environ.get('RETRAIN_EXTRACT_CHUNK_SIZE', '10000'))  # Claim rows fetched per cursor round trip
+
+# Hyperparameter search when a retrain request asks for it ({"search": "grid"|"random"}); see BaseRetrainer
+RETRAIN_SEARCH_MAX_JOBS = int(os.environ.get('RETRAIN_SEARCH_MAX_JOBS', str(max(1, (os.cpu_count() or 1) // 2))))  # CPU budget: parallel CV fits
+RETRAIN_SEARCH_CV_FOLDS = int(os.environ.get('RETRAIN_SEARCH_CV_FOLDS', '3'))  # Default cross-validation folds
+RETRAIN_SEARCH_N_ITER = int(os.environ.get('RETRAIN_SEARCH_N_ITER', '20'))  # Default candidates for random search
+RETRAIN_SEARCH_SCORING = os.environ.get('RETRAIN_SEARCH_SCORING', 'neg_mean_absolute_error')  # sklearn scorer name
+
+# Incremental (warm-start) retraining on claims added since the version was trained; {"mode": "full"} forces a refit
+RETRAIN_INCREMENTAL_MODEL_TYPES = [t for t in os.environ.get('RETRAIN_INCREMENTAL_MODEL_TYPES', 'XGBOOST,RANDOM_FOREST').split(',') if t]  # Default mode per model_type
+RETRAIN_INCREMENTAL_MIN_ROWS = int(os.environ.get('RETRAIN_INCREMENTAL_MIN_ROWS', '100'))  # Fewer new claims: skip (no_data)
+RETRAIN_XGB_INCREMENTAL_ROUNDS = int(os.environ.get('RETRAIN_XGB_INCREMENTAL_ROUNDS', '50'))  # Boosting rounds added per retrain
+RETRAIN_RF_WARM_START_TREES = int(os.environ.get('RETRAIN_RF_WARM_START_TREES', '20'))  # Trees added per retrain
+RETRAIN_RF_MAX_TREES = int(os.environ.get('RETRAIN_RF_MAX_TREES', '500'))  # Oldest trees beyond this are dropped (0 = no cap)
+
+# Incremental training snapshot (see ml_api/training_snapshot.py): preprocessed claims appended by claim-ID watermark
+TRAINING_SNAPSHOT_ENABLED = os.environ.get('TRAINING_SNAPSHOT_ENABLED', 'True') == 'True'
+TRAINING_SNAPSHOT_DIR = os.environ.get('TRAINING_SNAPSHOT_DIR', 'training_snapshot')  # Relative to MEDIA_ROOT
+TRAINING_SNAPSHOT_REBUILD_DAYS = float(os.environ.get('TRAINING_SNAPSHOT_REBUILD_DAYS', '7'))  # Full rebuild picks up edited claims; 0 = never
+
+# Per-stage predict timing (see ml_api/timing.py); histograms are always kept, the header can be turned off
+PREDICT_SERVER_TIMING = os.environ.get('PREDICT_SERVER_TIMING', 'True') == 'True'  # Send the Server-Timing header
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'  # Default primary key field type
 
@@ -0,0 +1,18 @@
+# config/urls_asgi.py
+"""
+URL configuration for the ASGI deployment (selected by config/asgi.py).
+
+Predict and explain are served by the async views in ml_api.async_views; every
+other route falls through to the regular configuration in config/urls.py.
+"""
+from django.urls import include, path  # Import path and include for URL routing
+
+from ml_api import async_views  # Async predict/explain views
+
+urlpatterns = [
+    path('api/algorithms/<int:pk>/predict/', async_views.algorithm_predict, name='async_algorithm_predict'),
+    path('api/endpoints/<str:pk>/predict/', async_views.endpoint_predict, name='async_endpoint_predict'),
+    path('api/requests/explain-batch/', async_views.request_explain_batch, name='async_request_explain_batch'),
+    path('api/requests/<str:pk>/explain/', async_views.request_explain, name='async_request_explain'),
+    path('', include('config.urls')),  # Everything else is unchanged
+]
@@ -0,0 +1,69 @@
+# gunicorn.conf.py
+"""
+Gunicorn configuration and server hooks for the MLaaS service.
+
+Loaded via `gunicorn --config gunicorn.conf.py`. MLAAS_SERVER_MODE selects the
+sync WSGI app (default) or the ASGI app under uvicorn workers, which serves
+predict and explain through async views (see ml_api/async_views.py).
+"""
+
+import os
+
+server_mode = os.environ.get('MLAAS_SERVER_MODE', 'wsgi')  # 'wsgi' (sync workers) or 'asgi' (uvicorn workers)
+if server_mode == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8009')  # Address the service listens on
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))  # Number of worker processes
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))  # Threads per sync worker (> 1 lets predict micro-batching coalesce requests)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))  # Allow time for warm-up and slow SHAP calls
+
+# Load Django (and, via when_ready, the active models) once in the master so
+# forked workers share the model pages copy-on-write instead of each holding a copy.
+preload_app = os.environ.get('MODEL_PRELOAD_IN_MASTER', 'False') == 'True'
+
+
+def when_ready(server):
+    """Runs in the master before workers are forked; preloads models when enabled."""
+    if not preload_app:
+        return
+    import gc
+
+    from django.db import connections
+    from ml_api.warmup import warm_active_models
+
+    # Load only: no predictions, so no native thread pools exist before fork
+    warm_active_models(run_prediction=False)
+    connections.close_all()  # Never share a DB socket with forked workers
+    # Move everything loaded so far to the permanent generation so the cyclic GC
+    # in each worker does not write to (and thereby copy) the shared pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """
+    Runs after a worker has loaded Django and before it starts accepting
+    requests, so warm-up cost is never paid by a live claim.
+    """
+    from django.conf import settings
+
+    if not settings.MODEL_WARMUP_ON_BOOT:
+        return
+    from ml_api.warmup import warm_active_models
+
+    warm_active_models()
+    # Close the connection opened during warm-up; Django reopens one per request
+    from django.db import connections
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    """Flushes queued MLRequest log rows and explanations before the worker process exits."""
+    from ml_api.explanation_queue import explanation_precomputer
+    from ml_api.request_logger import request_writer
+
+    request_writer.shutdown()
+    explanation_precomputer.shutdown()
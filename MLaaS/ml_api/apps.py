@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MLApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_api'
+
+    def ready(self):
+        import ml_api.signals  # noqa: F401  Registers routing invalidation receivers
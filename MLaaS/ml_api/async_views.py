@@ -0,0 +1,302 @@
+# ml_api/async_views.py
+"""
+Async predict and explain views for the ASGI deployment (config/urls_asgi.py).
+
+Under ASGI, Django runs sync views on one shared thread, so a slow prediction
+or SHAP call blocks every other sync request in the worker. These views keep
+the event loop free:
+
+  * CPU-bound work (model loading, predict, SHAP) runs on a bounded
+    ThreadPoolExecutor sized to the cores (INFERENCE_POOL_SIZE). NumPy,
+    scikit-learn, XGBoost and onnxruntime release the GIL in their hot loops.
+  * At most INFERENCE_MAX_PENDING calls may wait for the pool; beyond that the
+    view answers 503 with Retry-After instead of queueing without bound.
+  * The MLRequest row gets a pre-allocated UUID (returned as request_id) and
+    is written by a background task, or by the async request writer when
+    MLREQUEST_ASYNC_LOGGING is on, so the response never waits for the INSERT.
+  * Explanation precomputation (?explain=true) only enqueues the request_id.
+
+Request bodies are the same as for the DRF predict action (JSON, .npy or Arrow
+IPC); responses are always JSON.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import ParseError, ValidationError
+
+from .explanation_queue import explanation_precomputer, precompute_requested
+from .inference import FeatureCountMismatch, run_prediction
+from .models import MLAlgorithm, MLRequest
+from .request_logger import request_writer
+from .routing import routing_table
+from .serializers import validate_feature_matrix
+from .timing import StageTimer, finish_request_timing, timings_requested
+from .warmup import get_model_file_abs_path
+from .wire_formats import ARROW_STREAM_MEDIA_TYPE, NPY_MEDIA_TYPE, decode_arrow_stream, decode_npy
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePool:
+    """Bounded executor for CPU-bound work, with a cap on calls waiting for a thread."""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._owner_pid = None  # Executors do not survive fork, so recreate per process
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None or self._owner_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._owner_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+                    self._owner_pid = os.getpid()
+        return self._executor
+
+    def try_acquire(self) -> bool:
+        """Reserves a slot; False when the pool is saturated."""
+        with self._lock:
+            if self.in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    async def run(self, func, *args):
+        """Runs func(*args) on the pool (slot must already be reserved) and releases the slot."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), _with_db, func, args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        """Returns the pool counters for the metrics endpoint."""
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+def _with_db(func, args):
+    """Runs func on a pool thread, dropping stale DB connections like Django does per request."""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+# Module-level pool for this worker process; threads start on first use
+inference_pool = InferencePool(
+    max_workers=settings.INFERENCE_POOL_SIZE,
+    max_pending=settings.INFERENCE_MAX_PENDING,
+)
+
+_log_tasks = set()  # Strong references so pending log writes are not garbage collected
+
+
+def _error(message, status_code, **extra):
+    return JsonResponse({"error": message, **extra}, status=status_code)
+
+
+def _overloaded():
+    response = _error("Inference pool saturated, retry shortly.", 503)
+    response["Retry-After"] = "1"
+    return response
+
+
+def _parse_input(request):
+    """Decodes the request body into a validated float64 matrix (JSON, .npy or Arrow IPC)."""
+    content_type = (request.content_type or '').split(';')[0].strip()
+    if content_type == NPY_MEDIA_TYPE:
+        return validate_feature_matrix(decode_npy(request.body))
+    if content_type == ARROW_STREAM_MEDIA_TYPE:
+        return validate_feature_matrix(decode_arrow_stream(request.body))
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError as e:
+        raise ParseError(f"JSON parse error - {e}")
+    if not isinstance(payload, dict) or "input_data" not in payload:
+        raise ValidationError({"input_data": ["This field is required."]})
+    return validate_feature_matrix(payload["input_data"])
+
+
+async def _log_request(algorithm, input_data, prediction_list, response_time):
+    """Starts the MLRequest write without waiting for it; returns the request_id."""
+    log_fields = {
+        "input_data": input_data.tolist(),
+        "prediction": prediction_list,
+        "algorithm": algorithm,
+        "response_time": response_time,
+    }
+    if settings.MLREQUEST_ASYNC_LOGGING:
+        return str(request_writer.submit(**log_fields))  # Only enqueues
+
+    ml_request = MLRequest(request_uuid=uuid.uuid4(), **log_fields)
+    task = asyncio.create_task(sync_to_async(_save_log, thread_sensitive=False)(ml_request))
+    _log_tasks.add(task)
+    task.add_done_callback(_log_tasks.discard)
+    return str(ml_request.request_uuid)
+
+
+def _save_log(ml_request):
+    try:
+        ml_request.save()
+    except Exception as db_error:
+        logger.critical(
+            "Error saving MLRequest log for Algorithm ID %s: %s", ml_request.algorithm_id, db_error, exc_info=True
+        )
+    finally:
+        close_old_connections()
+
+
+async def _predict(request, algorithm, timer):
+    """Async counterpart of PredictionMixin._predict."""
+    pk = algorithm.id
+    try:
+        with timer.stage("validate"):
+            input_data = _parse_input(request)
+    except ParseError as e:
+        return JsonResponse({"detail": str(e.detail)}, status=400)
+    except ValidationError as e:
+        errors = e.detail if isinstance(e.detail, dict) else {"input_data": e.detail}  # Same shape as serializer.errors
+        logger.warning("Prediction failed for Algorithm ID %s: Invalid input data. Errors: %s", pk, errors)
+        return JsonResponse(errors, status=400)
+
+    with timer.stage("lookup"):
+        model_file_abs_path = get_model_file_abs_path(algorithm)
+        model_file_found = bool(model_file_abs_path) and os.path.exists(model_file_abs_path)
+    if not model_file_found:
+        logger.error("Prediction failed: Model file for Algorithm ID %s not found at %s", pk, model_file_abs_path)
+        return _error(f"Model file not found or inaccessible for algorithm ID {pk}. Cannot predict.", 503)
+
+    if not inference_pool.try_acquire():
+        return _overloaded()
+    try:
+        outcome = await inference_pool.run(run_prediction, algorithm, model_file_abs_path, input_data, timer)
+    except FeatureCountMismatch as mismatch:
+        logger.warning("Prediction failed for Algorithm ID %s: %s", pk, mismatch)
+        return _error(str(mismatch), 400)
+    except ValueError as ve:
+        logger.error("Prediction ValueError for Algorithm ID %s: %s", pk, ve, exc_info=True)
+        return _error(f"Prediction failed due to invalid input data format or shape for the loaded model: {ve}", 400)
+    except Exception as e:
+        logger.error("Unexpected prediction error for Algorithm ID %s: %s", pk, e, exc_info=True)
+        return _error(f"An unexpected server error occurred during prediction. Details: {e}", 500)
+
+    prediction_list = outcome["prediction"].tolist()
+    response_time_secs = outcome["load_time"] + outcome["predict_time"]
+    with timer.stage("log_write"):
+        request_id = await _log_request(algorithm, input_data, prediction_list, response_time_secs)
+    response_data = {
+        "prediction": prediction_list,
+        "request_id": request_id,
+        "algorithm_version": algorithm.version,
+        "processing_time_ms": round(response_time_secs * 1000, 2),
+        "model_cache_hit": outcome["model_cache_hit"],
+        "cached": outcome["cached"],
+    }
+    if precompute_requested(request.GET):
+        queued = explanation_precomputer.submit(request_id)  # Never blocks
+        response_data["explanation_status"] = "pending" if queued else "not_queued"
+    if timings_requested(request.GET):
+        response_data["timings"] = timer.timings_ms()
+    with timer.stage("serialize"):
+        response = JsonResponse(response_data)
+    return response
+
+
+def _timed(response, algorithm, timer):
+    """Adds Server-Timing to an async predict response and records its stages."""
+    return finish_request_timing(response, algorithm.id if algorithm is not None else None, timer)
+
+
+@csrf_exempt
+@require_POST
+async def algorithm_predict(request, pk):
+    """POST /api/algorithms/<pk>/predict/ (async)."""
+    timer = StageTimer()
+    try:
+        with timer.stage("lookup"):
+            algorithm = await MLAlgorithm.objects.select_related("parent_endpoint").aget(pk=pk)
+    except MLAlgorithm.DoesNotExist:
+        logger.warning("Prediction failed: Algorithm with ID %s not found.", pk)
+        return _timed(_error(f"Algorithm with ID {pk} not found.", 404), None, timer)
+    return _timed(await _predict(request, algorithm, timer), algorithm, timer)
+
+
+@csrf_exempt
+@require_POST
+async def endpoint_predict(request, pk):
+    """POST /api/endpoints/<id or name>/predict/ (async), routed like EndpointViewSet.predict."""
+    timer = StageTimer()
+    with timer.stage("lookup"):
+        algorithm = await sync_to_async(routing_table.resolve, thread_sensitive=False)(pk)
+    if algorithm is None:
+        logger.warning("Prediction failed: No active algorithm routed for endpoint '%s'.", pk)
+        return _timed(_error(f"No active algorithm found for endpoint '{pk}'.", 404), None, timer)
+    return _timed(await _predict(request, algorithm, timer), algorithm, timer)
+
+
+def _rendered(response):
+    """Renders a DRF Response; plain Django responses (e.g. the SVG chart) are already complete."""
+    render = getattr(response, 'render', None)
+    return render() if render is not None else response
+
+
+@require_GET
+async def request_explain(request, pk):
+    """GET /api/requests/<pk>/explain/ (async): runs the DRF explain action on the inference pool."""
+    from .views import MLRequestViewSet  # views imports this module
+
+    if not inference_pool.try_acquire():
+        return _overloaded()
+    explain_view = MLRequestViewSet.as_view({'get': 'explain'})
+
+    def render_explanation():
+        return _rendered(explain_view(request, pk=pk))  # Render on the pool thread too (PNG encoding)
+
+    return await inference_pool.run(render_explanation)
+
+
+@csrf_exempt
+@require_POST
+async def request_explain_batch(request):
+    """POST /api/requests/explain-batch/ (async): runs the DRF explain_batch action on the inference pool."""
+    from .views import MLRequestViewSet  # views imports this module
+
+    if not inference_pool.try_acquire():
+        return _overloaded()
+    explain_batch_view = MLRequestViewSet.as_view({'post': 'explain_batch'})
+
+    def run_explain_batch():
+        return _rendered(explain_batch_view(request))
+
+    return await inference_pool.run(run_explain_batch)
+
+
+def pool_stats() -> dict:
+    """Pool counters plus pending background log writes, for the metrics endpoint."""
+    return {**inference_pool.stats(), "pending_log_writes": len(_log_tasks)}
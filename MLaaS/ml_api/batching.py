@@ -0,0 +1,138 @@
+# ml_api/batching.py
+"""
+Server-side micro-batching of concurrent single-row predictions.
+
+When PREDICT_BATCHING_ENABLED is set, a single-row predict request joins the
+open batch for its algorithm instead of calling model.predict on its own. The
+first request in a batch (the leader) waits up to PREDICT_BATCH_WINDOW_MS, or
+until PREDICT_BATCH_MAX_ROWS rows have joined, then runs one vectorised
+predict on the stacked rows and hands each follower its own result.
+
+Batching only coalesces requests served by the same worker process, so it
+needs a threaded worker (GUNICORN_THREADS > 1) to see concurrent requests.
+"""
+
+import threading
+
+import numpy as np
+from django.conf import settings
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)  # Upper bounds for the batch-size histogram
+
+
+class _Batch:
+    """Rows collected for one vectorised predict call."""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows = []
+        self.full = threading.Event()  # Set when max_rows is reached, so the leader stops waiting
+        self.done = threading.Event()  # Set once predictions (or the error) are available
+        self.predictions = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions for the same algorithm into one predict call."""
+
+    def __init__(self, window_seconds: float, max_rows: int):
+        """
+        Args:
+            window_seconds: How long the leader waits for more rows.
+            max_rows: Rows at which a batch is closed and predicted immediately.
+        """
+        self.window_seconds = window_seconds
+        self.max_rows = max_rows
+        self._open = {}  # (algorithm_id, id(model)) -> _Batch accepting rows
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_size = 0
+        self.histogram = dict.fromkeys(BATCH_SIZE_BUCKETS, 0)
+        self.histogram_overflow = 0
+
+    def predict(self, algorithm_id: int, model, row: np.ndarray):
+        """
+        Predicts one row as part of a shared batch.
+
+        Args:
+            algorithm_id: Primary key of the MLAlgorithm (batches never mix algorithms).
+            model: The loaded model; a reloaded artifact starts a new batch.
+            row: A (1, n_features) float64 array.
+
+        Returns:
+            tuple: (prediction for this row as a length-1 array, size of the batch it ran in)
+        Raises:
+            Exception: Whatever model.predict raised for the batch.
+        """
+        key = (algorithm_id, id(model))
+        with self._lock:
+            batch = self._open.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = _Batch(model)
+                self._open[key] = batch
+            index = len(batch.rows)
+            batch.rows.append(row)
+            if len(batch.rows) >= self.max_rows:
+                del self._open[key]  # Closed: later requests start a new batch
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window_seconds)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._run(batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.predictions[index:index + 1], len(batch.rows)
+
+    def _run(self, batch):
+        """Runs one predict over the batch and records its size."""
+        try:
+            batch.predictions = np.asarray(batch.model.predict(np.vstack(batch.rows)))
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+        self._record(len(batch.rows))
+
+    def _record(self, size: int):
+        """Adds a finished batch to the counters and the histogram."""
+        with self._lock:
+            self.batches += 1
+            self.rows += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            for bound in BATCH_SIZE_BUCKETS:
+                if size <= bound:
+                    self.histogram[bound] += 1
+                    break
+            else:
+                self.histogram_overflow += 1
+
+    def stats(self) -> dict:
+        """Returns the batch counters and the batch-size histogram for the metrics endpoint."""
+        with self._lock:
+            histogram = {f"le_{bound}": count for bound, count in self.histogram.items()}
+            histogram[f"gt_{BATCH_SIZE_BUCKETS[-1]}"] = self.histogram_overflow
+            return {
+                "enabled": settings.PREDICT_BATCHING_ENABLED,
+                "window_ms": round(self.window_seconds * 1000, 3),
+                "max_rows": self.max_rows,
+                "batches": self.batches,
+                "rows": self.rows,
+                "mean_batch_size": round(self.rows / self.batches, 3) if self.batches else None,
+                "max_batch_size": self.max_batch_size,
+                "batch_size_histogram": histogram,
+            }
+
+
+# Module-level batcher shared by the request threads of this worker process
+micro_batcher = MicroBatcher(
+    window_seconds=settings.PREDICT_BATCH_WINDOW_MS / 1000.0,
+    max_rows=settings.PREDICT_BATCH_MAX_ROWS,
+)
@@ -0,0 +1,39 @@
+# ml_api/benchmarking.py
+"""
+Small helpers shared by the benchmark management commands.
+"""
+
+import os
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_memory_kb(pid: int = None) -> dict:
+    """
+    Reads memory usage (in kB) for a process from /proc (Linux only).
+
+    Uses smaps_rollup when available, which includes PSS (proportional set size:
+    shared pages divided by the number of processes sharing them). Falls back
+    to VmRSS from /proc/<pid>/status.
+    """
+    pid = pid or os.getpid()
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0].rstrip(':') in SMAPS_FIELDS:
+                    usage[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    usage['Rss'] = int(line.split()[1])
+    return usage
+
+
+def percentile(values, q: float) -> float:
+    """Returns the q-th percentile (0-100) of a non-empty sequence using nearest-rank."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
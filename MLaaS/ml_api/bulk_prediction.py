@@ -0,0 +1,120 @@
+# ml_api/bulk_prediction.py
+"""
+Streaming, chunked bulk prediction.
+
+The request body is consumed in fixed-size chunks (NDJSON rows or a 2-D .npy
+array). Each chunk is validated, predicted and streamed back as NDJSON before
+the next one is read, so peak memory depends on the chunk size, not on the
+input size. Each chunk is logged as one summary MLRequest instead of one row
+per record.
+"""
+
+import json
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ParseError, ValidationError
+
+from .models import MLRequest
+from .request_logger import request_writer
+from .serializers import validate_feature_matrix
+from .wire_formats import NDJSON_MEDIA_TYPE, NPY_MEDIA_TYPE, iter_ndjson_chunks, iter_npy_chunks
+
+logger = logging.getLogger(__name__)
+
+BULK_INPUT_READERS = {
+    NDJSON_MEDIA_TYPE: iter_ndjson_chunks,
+    NPY_MEDIA_TYPE: iter_npy_chunks,
+}
+
+
+def _log_chunk(algorithm, chunk_index, row_offset, prediction, response_time):
+    """Writes one summary MLRequest for a chunk (through the async writer when enabled)."""
+    values = np.asarray(prediction, dtype=np.float64)
+    log_fields = {
+        "input_data": {
+            "bulk": True,
+            "chunk_index": chunk_index,
+            "row_offset": row_offset,
+            "rows": int(values.shape[0]),
+        },
+        "prediction": {
+            "count": int(values.size),
+            "mean": float(values.mean()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+        },
+        "algorithm": algorithm,
+        "response_time": response_time,
+    }
+    try:
+        if settings.MLREQUEST_ASYNC_LOGGING:
+            return str(request_writer.submit(**log_fields))
+        return MLRequest.objects.create(**log_fields).id
+    except Exception as db_error:
+        logger.critical(
+            "Error saving bulk MLRequest log for Algorithm ID %s, chunk %d: %s",
+            algorithm.id, chunk_index, db_error, exc_info=True
+        )
+        return None
+
+
+def stream_bulk_predictions(algorithm, model, chunks):
+    """
+    Generator of NDJSON lines: one {"row", "prediction"} line per input row,
+    then a final {"done": true, ...} summary. Errors after streaming has
+    started are reported as a final {"error": ...} line.
+
+    Args:
+        algorithm: The MLAlgorithm used (for logging).
+        model: The loaded model.
+        chunks: Iterable of raw row chunks (lists or arrays).
+    """
+    bulk_start = time.time()
+    row_offset = 0
+    chunk_index = 0
+    request_ids = []
+    try:
+        for chunk_index, chunk in enumerate(chunks):
+            chunk_start = time.time()
+            input_data = validate_feature_matrix(chunk)
+            expected_features = getattr(model, "n_features_in_", None)
+            if expected_features is not None and input_data.shape[1] != expected_features:
+                raise ValidationError(
+                    f"Input data shape mismatch: received {input_data.shape[1]} features, "
+                    f"but model expects {expected_features}."
+                )
+            prediction = model.predict(input_data)
+            request_ids.append(
+                _log_chunk(algorithm, chunk_index, row_offset, prediction, time.time() - chunk_start)
+            )
+            yield "".join(
+                json.dumps({"row": row_offset + i, "prediction": value}) + "\n"
+                for i, value in enumerate(prediction.tolist())
+            )
+            row_offset += input_data.shape[0]
+    except (ParseError, ValidationError) as e:
+        message = " ".join(map(str, e.detail)) if isinstance(e.detail, list) else str(e.detail)
+        logger.warning("Bulk prediction for Algorithm ID %s stopped at row %d: %s", algorithm.id, row_offset, message)
+        yield json.dumps({"error": message, "row_offset": row_offset, "chunk_index": chunk_index}) + "\n"
+        return
+    except Exception as e:
+        logger.error("Unexpected bulk prediction error for Algorithm ID %s: %s", algorithm.id, e, exc_info=True)
+        yield json.dumps({"error": f"Unexpected error: {e}", "row_offset": row_offset}) + "\n"
+        return
+
+    total_time = time.time() - bulk_start
+    logger.info(
+        "Bulk prediction for Algorithm ID %s: %d rows in %d chunk(s), %.4fs",
+        algorithm.id, row_offset, len(request_ids), total_time
+    )
+    yield json.dumps({
+        "done": True,
+        "rows": row_offset,
+        "chunks": len(request_ids),
+        "request_ids": request_ids,
+        "algorithm_version": algorithm.version,
+        "processing_time_ms": round(total_time * 1000, 2),
+    }) + "\n"
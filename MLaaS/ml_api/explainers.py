@@ -0,0 +1,354 @@
+# ml_api/explainers.py
+"""
+Per-worker cache of SHAP explainers.
+
+Building an explainer is expensive for tree models: shap.TreeExplainer walks
+every tree and copies it into its own arrays. Explainers are therefore built
+once per algorithm and artifact version ((mtime_ns, size), see
+ModelCache.artifact_version) and reused by later explain calls; a replaced
+artifact gets a new explainer. The model itself comes from the per-worker
+model cache, so explaining a model that is already serving predictions does
+not unpickle it again.
+
+Known model types get a fast path that needs no shap at all:
+
+  * XGBoost: Booster.predict(pred_contribs=True), XGBoost's own native exact
+    TreeSHAP (the same path-dependent algorithm as shap.TreeExplainer).
+  * Linear models (coef_/intercept_): the closed form coef * (x - mean), with
+    base value intercept + coef . mean. The mean is taken over the
+    algorithm's last EXPLAIN_LINEAR_BACKGROUND_ROWS logged input rows (zero
+    when none are logged yet), i.e. contributions are relative to a typical
+    recent request. It is computed once per artifact version and saved as a
+    `.background_mean.npz` sidecar that every worker loads, and a hash of it
+    is part of the explainer version.
+
+RandomForest/ExtraTrees use shap.TreeExplainer (exact TreeSHAP) directly; other
+models go through shap.Explainer's automatic selection. A model whose explainer
+cannot be built is remembered as such for that artifact version, so the
+failure is not retried on every request.
+
+At most SHAP_EXPLAINER_CACHE_SIZE explainers are kept; the least recently
+used is dropped first. shap itself is imported when the first explainer is
+built.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from .model_cache import ModelCache, model_cache
+from .models import MLRequest
+
+logger = logging.getLogger(__name__)
+
+TREE_EXPLAINER_MODELS = (
+    'RandomForestRegressor', 'RandomForestClassifier', 'ExtraTreesRegressor', 'ExtraTreesClassifier',
+)
+
+
+BACKGROUND_MEAN_SUFFIX = '.background_mean.npz'
+
+Contributions = namedtuple('Contributions', ['values', 'base_values'])  # Same fields as shap.Explanation
+
+
+class ExplainerUnavailable(Exception):
+    """Raised when no SHAP explainer can be built for a model."""
+    pass
+
+
+class XGBoostContributionExplainer:
+    """Exact TreeSHAP contributions from XGBoost's native pred_contribs."""
+
+    def __init__(self, model):
+        import xgboost as xgb  # Only imported for XGBoost models
+
+        self._xgb = xgb
+        self.booster = model if isinstance(model, xgb.Booster) else model.get_booster()
+        best_iteration = getattr(model, 'best_iteration', None)  # Early-stopped models predict with the best round
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        self.version = f"XGBoostContributions/xgboost-{xgb.__version__}"
+
+    def __call__(self, X) -> Contributions:
+        dmatrix = self._xgb.DMatrix(np.asarray(X, dtype=np.float32), feature_names=self.booster.feature_names)
+        contribs = self.booster.predict(dmatrix, pred_contribs=True, iteration_range=self.iteration_range)
+        if contribs.ndim == 3:  # Multi-class: (rows, classes, features + 1) -> shap's (rows, features, classes)
+            return Contributions(contribs[:, :, :-1].transpose(0, 2, 1), contribs[:, :, -1])
+        return Contributions(contribs[:, :-1], contribs[:, -1])  # Last column is the bias
+
+
+class LinearContributionExplainer:
+    """Closed-form contributions of a linear model: coef * (x - mean)."""
+
+    def __init__(self, model, background_mean):
+        self.coef = np.atleast_2d(np.asarray(model.coef_, dtype=np.float64))  # (outputs, features)
+        self.mean = np.asarray(background_mean, dtype=np.float64)
+        intercept = np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64))
+        self.base_value = intercept + self.coef @ self.mean  # Prediction at the mean, per output
+        mean_hash = hashlib.sha1(self.mean.tobytes()).hexdigest()[:12]  # Same tag implies same base values
+        self.version = f"LinearContributions/{type(model).__name__}/mean-{mean_hash}"
+
+    def __call__(self, X) -> Contributions:
+        centred = np.asarray(X, dtype=np.float64) - self.mean
+        n_rows = centred.shape[0]
+        if self.coef.shape[0] == 1:
+            return Contributions(centred * self.coef[0], np.full(n_rows, self.base_value[0]))
+        values = centred[:, :, np.newaxis] * self.coef.T[np.newaxis]  # (rows, features, outputs)
+        return Contributions(values, np.tile(self.base_value, (n_rows, 1)))
+
+
+def is_linear_model(model) -> bool:
+    """True for fitted linear models whose output is coef . x + intercept."""
+    return (
+        type(model).__module__.startswith('sklearn.linear_model')
+        and hasattr(model, 'coef_') and hasattr(model, 'intercept_')
+    )
+
+
+def background_mean(algorithm_id: int, n_features: int):
+    """Mean of the algorithm's most recent logged input rows, or None if none are logged."""
+    limit = settings.EXPLAIN_LINEAR_BACKGROUND_ROWS
+    rows = [
+        row for input_data in MLRequest.objects.filter(algorithm_id=algorithm_id)
+        .order_by('-id').values_list('input_data', flat=True)[:limit]
+        if isinstance(input_data, list)  # Skip bulk chunk summaries
+        for row in input_data if len(row) == n_features
+    ][:limit]
+    return np.asarray(rows, dtype=np.float64).mean(axis=0) if rows else None
+
+
+def _read_background_mean(path: str, artifact_version, n_features: int):
+    """Returns the sidecar's mean if it belongs to this artifact version, else None."""
+    try:
+        with np.load(path) as data:
+            if np.array_equal(data['artifact_version'], artifact_version) and data['mean'].shape == (n_features,):
+                return data['mean']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def artifact_background_mean(algorithm_id: int, model_file_abs_path: str, n_features: int):
+    """
+    Background mean of a linear model, fixed per artifact version.
+
+    The first process that needs it computes it from the logged rows and saves
+    it next to the artifact; later builds in any worker load that sidecar, so
+    they all produce the same contributions. When no rows are logged yet the
+    mean is zero and is not saved, so a real mean replaces it later.
+
+    Args:
+        algorithm_id: MLAlgorithm whose logged rows are averaged.
+        model_file_abs_path: Absolute path to its model artifact.
+        n_features: Number of model inputs.
+    """
+    path = f"{model_file_abs_path}{BACKGROUND_MEAN_SUFFIX}"
+    artifact_version = np.asarray(ModelCache.artifact_version(model_file_abs_path), dtype=np.int64)
+    stored = _read_background_mean(path, artifact_version, n_features)
+    if stored is not None:
+        return stored
+    mean = background_mean(algorithm_id, n_features)
+    if mean is None:
+        return np.zeros(n_features)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as fh:
+            np.savez(fh, mean=mean, artifact_version=artifact_version)
+        try:
+            os.link(tmp_path, path)  # Fails if another worker saved first; its mean wins
+        except FileExistsError:
+            stored = _read_background_mean(path, artifact_version, n_features)
+            if stored is not None:
+                return stored
+            os.replace(tmp_path, path)  # Sidecar of a replaced artifact
+    except OSError as e:
+        logger.warning("Could not save background mean for Algorithm ID %s: %s", algorithm_id, e)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+    return mean
+
+
+def linear_background_mean(algorithm_id: int, model_file_abs_path: str):
+    """
+    Returns the artifact's background mean if it is a linear model, else None.
+    Lets a parent process resolve it once before handing batches to forked workers.
+    """
+    model, _, _ = model_cache.get(algorithm_id, model_file_abs_path)
+    if not is_linear_model(model):
+        return None
+    return artifact_background_mean(algorithm_id, model_file_abs_path, np.atleast_2d(model.coef_).shape[1])
+
+
+def uses_tree_explainer(model) -> bool:
+    """True for the model types explained with shap.TreeExplainer (XGBoost has its own native path)."""
+    return type(model).__module__.startswith('sklearn.ensemble') and type(model).__name__ in TREE_EXPLAINER_MODELS
+
+
+def build_explainer(model, feature_names=None, algorithm_id=None, model_file_abs_path=None, background=None):
+    """
+    Builds the explainer for a fitted model: a native fast path for XGBoost and
+    linear models, else a SHAP explainer.
+
+    Args:
+        model: The fitted estimator.
+        feature_names: Column names, used only when they match the model's feature count.
+        algorithm_id: MLAlgorithm whose logged rows give a linear model's background mean.
+        model_file_abs_path: Artifact the background mean is saved next to (see artifact_background_mean).
+        background: A linear model's background mean, used instead of looking it up.
+
+    Returns:
+        A callable explainer (explainer(X) -> object with values and base_values).
+    Raises:
+        ExplainerUnavailable: If the model cannot be explained.
+    """
+    try:
+        if type(model).__module__.startswith('xgboost'):
+            return XGBoostContributionExplainer(model)
+        if is_linear_model(model):
+            n_coef = np.atleast_2d(model.coef_).shape[1]
+            if background is None:
+                background = (
+                    artifact_background_mean(algorithm_id, model_file_abs_path, n_coef)
+                    if algorithm_id is not None and model_file_abs_path else np.zeros(n_coef)
+                )
+            return LinearContributionExplainer(model, background)
+    except Exception as e:
+        raise ExplainerUnavailable(f"Cannot build contributions for {type(model).__name__}: {e}")
+
+    n_features = getattr(model, 'n_features_in_', None)
+    if feature_names is not None and n_features is not None and len(feature_names) != n_features:
+        feature_names = None
+    import shap  # Deferred: importing shap takes seconds, and most workers only predict
+
+    try:
+        if uses_tree_explainer(model):
+            return shap.TreeExplainer(model, feature_names=feature_names)
+        return shap.Explainer(model, feature_names=feature_names)
+    except Exception as e:
+        raise ExplainerUnavailable(f"Cannot build a SHAP explainer for {type(model).__name__}: {e}")
+
+
+class ExplainerCache:
+    """Thread-safe LRU cache of SHAP explainers keyed by algorithm and artifact version."""
+
+    def __init__(self, max_entries: int):
+        """
+        Args:
+            max_entries: Maximum number of cached explainers. 0 disables caching.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # algorithm_id -> (artifact version, explainer or ExplainerUnavailable)
+        self._lock = threading.Lock()
+        self._build_locks = {}  # algorithm_id -> Lock, so concurrent misses build once
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.build_failures = 0
+
+    def get(self, algorithm_id: int, model_file_abs_path: str, feature_names=None, background=None):
+        """
+        Returns the explainer for an algorithm, building it on a miss.
+
+        Args:
+            algorithm_id: Primary key of the MLAlgorithm.
+            model_file_abs_path: Absolute path to its model artifact.
+            feature_names: Optional column names for the explanation.
+            background: A linear model's background mean to build with, instead of looking it up.
+
+        Returns:
+            tuple: (explainer, cache_hit: bool)
+        Raises:
+            FileNotFoundError: If the artifact does not exist.
+            ExplainerUnavailable: If SHAP cannot explain the model (also when cached as such).
+        """
+        version = ModelCache.artifact_version(model_file_abs_path)
+        entry = self._lookup(algorithm_id, version)
+        if entry is None:
+            with self._lock:
+                build_lock = self._build_locks.setdefault(algorithm_id, threading.Lock())
+            with build_lock:
+                entry = self._lookup(algorithm_id, version, count=False)  # Another thread may have built it
+                if entry is None:
+                    return self._build(algorithm_id, model_file_abs_path, version, feature_names, background), False
+        if isinstance(entry, ExplainerUnavailable):
+            raise ExplainerUnavailable(str(entry))  # Fresh exception, so tracebacks do not pile up
+        return entry, True
+
+    def _lookup(self, algorithm_id, version, count=True):
+        with self._lock:
+            cached = self._entries.get(algorithm_id)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(algorithm_id)  # Mark as most recently used
+                if count:
+                    self.hits += 1
+                return cached[1]
+            if count:
+                self.misses += 1
+            return None
+
+    def _build(self, algorithm_id, model_file_abs_path, version, feature_names, background=None):
+        model, _, _ = model_cache.get(algorithm_id, model_file_abs_path)
+        try:
+            explainer = build_explainer(
+                model, feature_names, algorithm_id=algorithm_id, model_file_abs_path=model_file_abs_path,
+                background=background,
+            )
+        except ExplainerUnavailable as e:
+            logger.warning("SHAP explainer unavailable for Algorithm ID %s: %s", algorithm_id, e)
+            with self._lock:
+                self.build_failures += 1
+            self._store(algorithm_id, version, e)
+            raise
+        logger.info("Built %s for Algorithm ID %s.", type(explainer).__name__, algorithm_id)
+        self._store(algorithm_id, version, explainer)
+        return explainer
+
+    def _store(self, algorithm_id, version, explainer):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[algorithm_id] = (version, explainer)
+            self._entries.move_to_end(algorithm_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, algorithm_id: int):
+        """Drops the explainer for an algorithm (retrained, edited or deleted)."""
+        with self._lock:
+            self._entries.pop(algorithm_id, None)
+
+    def clear(self):
+        """Empties the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.build_failures = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters for the metrics endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "build_failures": self.build_failures,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "explainers": {
+                    str(algorithm_id): type(explainer).__name__
+                    for algorithm_id, (_, explainer) in self._entries.items()
+                },
+            }
+
+
+# Module-level instance shared by all requests handled by this worker process
+explainer_cache = ExplainerCache(max_entries=settings.SHAP_EXPLAINER_CACHE_SIZE)
@@ -0,0 +1,272 @@
+# ml_api/explanation_queue.py
+"""
+Background SHAP precomputation for freshly logged prediction requests.
+
+Explanations are usually opened shortly after the prediction, so predict can
+queue its MLRequest here (EXPLAIN_PRECOMPUTE_ON_PREDICT, or ?explain=true per
+call) and the explanation is stored before anyone asks for it. A dispatcher
+thread drains the bounded in-process queue in batches of up to
+EXPLAIN_PRECOMPUTE_BATCH_SIZE requests: it marks them PENDING in
+MLRequestExplanation, groups them by algorithm and explains each group with a
+single vectorised SHAP call on a pool of EXPLAIN_PRECOMPUTE_WORKERS threads,
+then stores the rows as READY, or FAILED with the error message.
+
+Requests are queued by integer ID or by the UUID the asynchronous request
+writer pre-allocates. Their rows may not be written yet, so the dispatcher
+flushes the request writer and retries the lookup briefly before giving up
+on a request.
+
+When the queue is full the request is not queued; its explanation is simply
+computed on demand. PENDING rows left behind by a worker exit are picked up
+by the explain action or the backfill_explanations command.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .explanation_store import explain_requests, explanation_model_path, is_explainable, store_explanations
+from .models import MLRequest, MLRequestExplanation
+from .request_logger import request_writer
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # Sentinel that tells the dispatcher thread to finish the queue and exit
+MISSING_ROW_RETRIES = 3  # Lookups of requests whose log row is not written yet
+MISSING_ROW_RETRY_SECONDS = 0.2
+
+
+def precompute_requested(query_params) -> bool:
+    """True when predict should queue its request for explanation (setting, or ?explain=true|1)."""
+    return settings.EXPLAIN_PRECOMPUTE_ON_PREDICT or (
+        str(query_params.get("explain", "")).lower() in ("1", "true", "yes")
+    )
+
+
+class ExplanationPrecomputer:
+    """Background dispatcher plus worker pool that stores SHAP explanations of queued requests."""
+
+    def __init__(self, max_queue_size: int, batch_size: int, workers: int, flush_interval: float):
+        """
+        Args:
+            max_queue_size: Maximum number of requests waiting to be explained.
+            batch_size: Requests taken off the queue per dispatch.
+            workers: Threads computing SHAP; each algorithm group of a batch is one task.
+            flush_interval: Maximum seconds the dispatcher waits to fill a batch.
+        """
+        self.batch_size = batch_size
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = None
+        self._owner_pid = None  # Threads do not survive fork, so restart per process
+        self._queued_keys = set()  # str(pk) or str(uuid) of requests queued or being explained
+        self.enqueued = 0
+        self.rejected = 0
+        self.ready = 0
+        self.failed = 0
+        self.skipped = 0
+        self.missing = 0
+        self.batches = 0
+
+    def submit(self, request_key) -> bool:
+        """
+        Queues a logged request for explanation without blocking.
+
+        Args:
+            request_key: The MLRequest's integer ID or request UUID (the predict request_id).
+
+        Returns:
+            bool: False if the queue is full and the request was not queued.
+        """
+        self._ensure_started()
+        key = str(request_key)
+        try:
+            self._queue.put_nowait(key)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Explanation queue full (%d requests); not precomputing %s.", self._queue.maxsize, key)
+            return False
+        with self._lock:
+            self.enqueued += 1
+            self._queued_keys.add(key)
+        return True
+
+    def is_queued(self, *request_keys) -> bool:
+        """True if any of the keys (ID, UUID) is waiting or being explained in this process."""
+        with self._lock:
+            return any(str(key) in self._queued_keys for key in request_keys)
+
+    def _ensure_started(self):
+        """Starts the dispatcher thread and worker pool lazily in the current process."""
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._owner_pid == os.getpid():
+                return
+            if self._owner_pid is None:
+                atexit.register(self.shutdown)
+            self._owner_pid = os.getpid()
+            self._queued_keys = set()  # Keys inherited through fork were never queued here
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="explain-precompute")
+            self._thread = threading.Thread(target=self._run, name="explain-dispatcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Dispatcher loop: collect keys until the batch is full or the interval expires, then explain them."""
+        while True:
+            batch = []
+            stop = False
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break  # Interval expired with a partial batch
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch:
+                self._dispatch(batch)
+            if stop:
+                self._queue.task_done()
+                connection.close()
+                return
+
+    def _dispatch(self, keys):
+        """Explains one batch, waiting for its worker tasks so flush() covers finished work."""
+        try:
+            groups = self._mark_pending(self._load(keys))
+            futures = [self._executor.submit(self._explain_group, group) for group in groups.values()]
+            for future in futures:
+                future.result()
+            self.batches += 1
+        except Exception as e:
+            logger.critical("Explanation precompute batch of %d requests failed: %s", len(keys), e, exc_info=True)
+            connection.close()  # Drop a possibly broken connection; the next batch reconnects
+        finally:
+            with self._lock:
+                self._queued_keys.difference_update(keys)
+            for _ in keys:
+                self._queue.task_done()
+
+    def _load(self, keys) -> list:
+        """Fetches the queued requests, waiting briefly for rows the request writer has not written yet."""
+        ids = {key for key in keys if key.isdigit()}
+        uuids = set(keys) - ids
+        found = []
+        for attempt in range(MISSING_ROW_RETRIES + 1):
+            rows = list(MLRequest.objects.filter(
+                Q(pk__in=ids) | Q(request_uuid__in=uuids)
+            ).select_related('algorithm'))
+            found.extend(rows)
+            ids -= {str(row.pk) for row in rows}
+            uuids -= {str(row.request_uuid) for row in rows}
+            if not (ids or uuids) or attempt == MISSING_ROW_RETRIES:
+                break
+            if settings.MLREQUEST_ASYNC_LOGGING:
+                request_writer.flush()
+            time.sleep(MISSING_ROW_RETRY_SECONDS)
+        if ids or uuids:
+            with self._lock:
+                self.missing += len(ids) + len(uuids)
+            logger.warning("Cannot precompute explanations of unlogged requests: %s", sorted(ids | uuids))
+        return found
+
+    def _mark_pending(self, ml_requests) -> dict:
+        """Creates PENDING rows and returns {algorithm_id: requests to explain}, skipping READY ones."""
+        explainable = [ml_request for ml_request in ml_requests if is_explainable(ml_request)]
+        with self._lock:
+            self.skipped += len(ml_requests) - len(explainable)
+        MLRequestExplanation.objects.bulk_create(
+            [MLRequestExplanation(request=ml_request, status=MLRequestExplanation.STATUS_PENDING)
+             for ml_request in explainable],
+            ignore_conflicts=True,  # Keep rows that already exist (READY, or re-queued)
+        )
+        ready = set(MLRequestExplanation.objects.filter(
+            request__in=explainable, status=MLRequestExplanation.STATUS_READY,
+        ).values_list('request_id', flat=True))
+        groups = {}
+        for ml_request in explainable:
+            if ml_request.pk not in ready:
+                groups.setdefault(ml_request.algorithm_id, []).append(ml_request)
+        return groups
+
+    def _explain_group(self, ml_requests):
+        """Worker task: one vectorised SHAP call for one algorithm's requests, stored READY or FAILED."""
+        algorithm = ml_requests[0].algorithm
+        try:
+            model_fp = explanation_model_path(algorithm)
+            if model_fp is None:
+                raise FileNotFoundError(f"Model file for algorithm ID {algorithm.id} not found.")
+            store_explanations(explain_requests(algorithm, ml_requests, model_fp))
+            with self._lock:
+                self.ready += len(ml_requests)
+        except Exception as e:
+            logger.warning(
+                "Precomputing %d explanations for Algorithm ID %s failed: %s", len(ml_requests), algorithm.id, e
+            )
+            MLRequestExplanation.objects.filter(
+                request__in=ml_requests, status=MLRequestExplanation.STATUS_PENDING,  # Never overwrite READY
+            ).update(status=MLRequestExplanation.STATUS_FAILED, error=f"{type(e).__name__}: {e}")
+            with self._lock:
+                self.failed += len(ml_requests)
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Blocks until every queued request has been explained (or failed)."""
+        if self._thread is not None and self._owner_pid == os.getpid():
+            self._queue.join()
+
+    def shutdown(self, timeout: float = 30.0):
+        """Finishes queued requests and stops the dispatcher and workers (worker exit / atexit)."""
+        if self._thread is None or self._owner_pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=False)
+        self._thread = None
+        logger.info("Explanation precomputer stopped (pid %d): %s", os.getpid(), self.stats())
+
+    def stats(self) -> dict:
+        """Returns the precompute counters for the metrics endpoint."""
+        with self._lock:
+            return {
+                "on_predict": settings.EXPLAIN_PRECOMPUTE_ON_PREDICT,
+                "queued": self._queue.qsize(),
+                "in_flight": len(self._queued_keys),
+                "max_queue_size": self._queue.maxsize,
+                "workers": self.workers,
+                "enqueued": self.enqueued,
+                "rejected": self.rejected,
+                "ready": self.ready,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "missing": self.missing,
+                "batches": self.batches,
+            }
+
+
+# Module-level precomputer for this worker process; its threads start on first use
+explanation_precomputer = ExplanationPrecomputer(
+    max_queue_size=settings.EXPLAIN_PRECOMPUTE_QUEUE_SIZE,
+    batch_size=settings.EXPLAIN_PRECOMPUTE_BATCH_SIZE,
+    workers=settings.EXPLAIN_PRECOMPUTE_WORKERS,
+    flush_interval=settings.EXPLAIN_PRECOMPUTE_FLUSH_INTERVAL_MS / 1000.0,
+)
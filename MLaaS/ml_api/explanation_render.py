@@ -0,0 +1,85 @@
+# ml_api/explanation_render.py
+"""
+Chart rendering for explain responses.
+
+The SVG bar chart is built by hand as a small XML string, so it needs no
+plotting library and renders in well under a millisecond. The PNG chart (the
+original response format) still uses matplotlib, which is imported on first
+use only; importing it at module load added most of a second to every
+worker's start-up.
+"""
+
+import base64
+import io
+from xml.sax.saxutils import escape
+
+SVG_WIDTH = 640
+SVG_ROW_HEIGHT = 26
+SVG_LABEL_WIDTH = 210  # Left column for feature names
+SVG_VALUE_WIDTH = 70  # Right margin for the value labels
+SVG_TOP = 40  # Title band
+SVG_BOTTOM = 36  # Axis label band
+SVG_BAR_COLOR = '#1f77b4'  # matplotlib's default blue, so SVG and PNG charts look alike
+
+
+def render_bar_chart_svg(names, values, title: str, xlabel: str) -> str:
+    """
+    Renders a horizontal bar chart, largest bar first, as a standalone SVG document.
+
+    Args:
+        names: Bar labels, in display order (top to bottom).
+        values: Non-negative bar lengths, same order.
+        title: Chart title.
+        xlabel: Label under the bars.
+
+    Returns:
+        str: The SVG markup.
+    """
+    values = [float(v) for v in values]
+    height = SVG_TOP + SVG_ROW_HEIGHT * len(values) + SVG_BOTTOM
+    plot_width = SVG_WIDTH - SVG_LABEL_WIDTH - SVG_VALUE_WIDTH
+    scale = plot_width / max(max(values, default=0.0), 1e-12)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{height}" '
+        f'viewBox="0 0 {SVG_WIDTH} {height}" font-family="sans-serif" font-size="12">',
+        f'<title>{escape(title)}</title>',
+        f'<text x="{SVG_WIDTH / 2:.1f}" y="24" text-anchor="middle" font-size="14">{escape(title)}</text>',
+    ]
+    for i, (name, value) in enumerate(zip(names, values)):
+        y = SVG_TOP + i * SVG_ROW_HEIGHT
+        bar_width = max(value, 0.0) * scale
+        text_y = y + SVG_ROW_HEIGHT / 2 + 4
+        parts.append(
+            f'<text x="{SVG_LABEL_WIDTH - 8}" y="{text_y:.1f}" text-anchor="end">{escape(str(name))}</text>'
+            f'<rect x="{SVG_LABEL_WIDTH}" y="{y + 4}" width="{bar_width:.2f}" height="{SVG_ROW_HEIGHT - 8}" '
+            f'fill="{SVG_BAR_COLOR}"/>'
+            f'<text x="{SVG_LABEL_WIDTH + bar_width + 4:.2f}" y="{text_y:.1f}">{value:.2f}</text>'
+        )
+    axis_y = SVG_TOP + SVG_ROW_HEIGHT * len(values)
+    parts.append(
+        f'<line x1="{SVG_LABEL_WIDTH}" y1="{SVG_TOP}" x2="{SVG_LABEL_WIDTH}" y2="{axis_y}" stroke="#333"/>'
+        f'<text x="{SVG_LABEL_WIDTH + plot_width / 2:.1f}" y="{axis_y + 24}" text-anchor="middle">'
+        f'{escape(xlabel)}</text>'
+    )
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def render_bar_chart_png_base64(names, values, title: str, xlabel: str) -> str:
+    """Renders the same chart with matplotlib as a base64-encoded PNG."""
+    from matplotlib.figure import Figure  # Deferred: matplotlib is slow to import
+
+    fig = Figure(figsize=(6, 4))  # Figure objects need no pyplot global state, so this is thread-safe
+    ax = fig.subplots()
+    ax.barh(list(names)[::-1], list(values)[::-1])
+    ax.set_xlabel(xlabel)
+    ax.set_title(title)
+    ax.invert_yaxis()
+    for i, v in enumerate(list(values)[::-1]):
+        ax.text(v + 1e-6, i, f"{v:.2f}", va="center")
+
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
@@ -0,0 +1,196 @@
+# ml_api/explanation_store.py
+"""
+Persisted SHAP explanations for logged prediction requests.
+
+The SHAP values of an MLRequest never change once its model is fixed, so they
+are computed once and kept in MLRequestExplanation (one row per request). The
+explain action reads the stored row and only computes on a miss; the
+backfill_explanations command fills the store for historical requests, and
+the background precomputer (explanation_queue.py) fills it right after
+predict. Only READY rows count as stored: a PENDING or FAILED row is
+recomputed on demand and overwritten.
+
+Values are computed with the per-worker explainer from explainers.py (native
+contributions for XGBoost and linear models, SHAP otherwise). For models with
+several outputs (classifiers) the last output is stored.
+"""
+
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .explainers import explainer_cache
+from .models import MLRequestExplanation
+from .retrain_preprocessing import FINAL_FEATURE_COLUMNS_ORDERED as FEATURE_NAMES
+from .warmup import get_model_file_abs_path
+
+logger = logging.getLogger(__name__)
+
+STORED_FIELDS = ['status', 'shap_values', 'base_value', 'explainer_version', 'error']
+
+
+def is_explainable(ml_request) -> bool:
+    """Bulk chunk summaries (dict input_data) carry no feature rows to explain."""
+    return isinstance(ml_request.input_data, list)
+
+
+def explanation_model_path(algorithm):
+    """Returns the artifact to explain with: the registered path, else MODEL_ROOT/<basename>; None if neither exists."""
+    model_fp = get_model_file_abs_path(algorithm)
+    if model_fp and os.path.exists(model_fp):
+        return model_fp
+    if algorithm.model_file and getattr(algorithm.model_file, 'name', None):
+        model_fp = os.path.join(settings.MODEL_ROOT, os.path.basename(algorithm.model_file.name))
+        if os.path.exists(model_fp):
+            return model_fp
+    return None
+
+
+def compute_shap(algorithm_id: int, model_file_abs_path: str, rows, background=None) -> tuple:
+    """
+    Computes SHAP values (feature contributions) for a feature matrix with the algorithm's cached explainer.
+
+    Args:
+        algorithm_id: Primary key of the MLAlgorithm.
+        model_file_abs_path: Absolute path to its model artifact.
+        rows: (n_rows, n_features) feature values.
+        background: A linear model's background mean, if already resolved (see linear_background_mean).
+
+    Returns:
+        tuple: (values (n_rows, n_features) ndarray, base values (n_rows,) ndarray, explainer_version str)
+    Raises:
+        ExplainerUnavailable: If SHAP cannot explain the model.
+        FileNotFoundError: If the artifact does not exist.
+    """
+    explainer, _ = explainer_cache.get(
+        algorithm_id, model_file_abs_path, feature_names=FEATURE_NAMES, background=background
+    )
+    X = np.asarray(rows, dtype=np.float64)
+    shap_out = explainer(X)
+    values = np.asarray(shap_out.values, dtype=np.float64)
+    base_values = np.asarray(shap_out.base_values, dtype=np.float64)
+    if values.ndim == 3:  # (rows, features, outputs)
+        values = values[..., -1]
+    if base_values.ndim == 2:
+        base_values = base_values[:, -1]
+    base_values = np.broadcast_to(base_values.reshape(-1) if base_values.ndim else base_values, (X.shape[0],))
+    return values, base_values, explainer_version(explainer)
+
+
+def explainer_version(explainer) -> str:
+    """Version tag stored with explanations: the fast path's own tag, else the SHAP explainer class and release."""
+    version = getattr(explainer, 'version', None)
+    if isinstance(version, str):
+        return version
+    import shap  # Already loaded by the explainer cache when a SHAP explainer was built
+
+    return f"{type(explainer).__name__}/shap-{shap.__version__}"
+
+
+def build_explanations(ml_requests, values, base_values, version) -> list:
+    """Splits SHAP values computed for the stacked rows of several requests into unsaved explanations."""
+    explanations = []
+    offset = 0
+    for ml_request in ml_requests:
+        n_rows = len(ml_request.input_data)
+        explanations.append(MLRequestExplanation(
+            request=ml_request,
+            shap_values=values[offset:offset + n_rows].tolist(),
+            base_value=float(base_values[offset]),
+            explainer_version=version,
+        ))
+        offset += n_rows
+    return explanations
+
+
+def explain_requests(algorithm, ml_requests, model_file_abs_path: str) -> list:
+    """
+    Explains several requests of one algorithm with a single explainer call.
+
+    Returns:
+        list: Unsaved MLRequestExplanation objects, in the order of ml_requests.
+    """
+    rows = [row for ml_request in ml_requests for row in ml_request.input_data]
+    values, base_values, version = compute_shap(algorithm.id, model_file_abs_path, rows)
+    return build_explanations(ml_requests, values, base_values, version)
+
+
+def store_explanations(explanations):
+    """Saves READY explanations with one upsert, replacing PENDING/FAILED rows of the same requests."""
+    MLRequestExplanation.objects.bulk_create(
+        explanations, update_conflicts=True, unique_fields=['request'], update_fields=STORED_FIELDS,
+    )
+
+
+def get_or_compute_explanation(ml_request) -> tuple:
+    """
+    Returns the stored explanation of a request, computing and storing it on a miss.
+
+    Returns:
+        tuple: (MLRequestExplanation, from_store: bool)
+    Raises:
+        FileNotFoundError: If it is not stored and the model artifact is missing.
+        ExplainerUnavailable: If it is not stored and SHAP cannot explain the model.
+    """
+    try:
+        if ml_request.explanation.status == MLRequestExplanation.STATUS_READY:
+            return ml_request.explanation, True
+    except MLRequestExplanation.DoesNotExist:
+        pass
+
+    algorithm = ml_request.algorithm
+    model_fp = explanation_model_path(algorithm)
+    if model_fp is None:
+        raise FileNotFoundError(f"Model file for algorithm ID {algorithm.id} not found.")
+    explanation = explain_requests(algorithm, [ml_request], model_fp)[0]
+    store_explanations([explanation])  # Same values if stored concurrently by another request or the backfill
+    return explanation, False
+
+
+def get_or_compute_explanations(ml_requests, store: bool = True) -> tuple:
+    """
+    Explanations for many requests: stored rows are read in one query, and the
+    rest are computed with one vectorised SHAP call per algorithm.
+
+    Args:
+        ml_requests: Explainable MLRequest objects (select_related('algorithm') avoids a query per algorithm).
+        store: Save newly computed explanations with one bulk_create.
+
+    Returns:
+        tuple: ({request_id: MLRequestExplanation}, set of request_ids read from the store,
+                {request_id: error message} for requests that could not be explained)
+    """
+    request_ids = [ml_request.pk for ml_request in ml_requests]
+    explanations = {
+        e.request_id: e for e in MLRequestExplanation.objects.filter(
+            request_id__in=request_ids, status=MLRequestExplanation.STATUS_READY,
+        )
+    }
+    from_store = set(explanations)
+    errors = {}
+
+    groups = {}  # algorithm_id -> requests still to explain, in input order
+    for ml_request in ml_requests:
+        if ml_request.pk not in explanations:
+            groups.setdefault(ml_request.algorithm_id, []).append(ml_request)
+
+    computed = []
+    for group in groups.values():
+        algorithm = group[0].algorithm
+        model_fp = explanation_model_path(algorithm)
+        try:
+            if model_fp is None:
+                raise FileNotFoundError(f"Model file for algorithm ID {algorithm.id} not found.")
+            group_explanations = explain_requests(algorithm, group, model_fp)
+        except Exception as e:
+            logger.warning("Batch explain failed for Algorithm ID %s (%d requests): %s", algorithm.id, len(group), e)
+            errors.update({ml_request.pk: str(e) for ml_request in group})
+            continue
+        computed.extend(group_explanations)
+        explanations.update({e.request.pk: e for e in group_explanations})
+
+    if store and computed:
+        store_explanations(computed)
+    return explanations, from_store, errors
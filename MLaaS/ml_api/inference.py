@@ -0,0 +1,106 @@
+# ml_api/inference.py
+"""
+Framework-independent prediction core shared by the sync (DRF) and async
+predict views.
+
+run_prediction answers cached rows from the prediction cache, loads the
+algorithm's runtime model through the model cache for the rest, checks the
+feature count and predicts (micro-batched for single rows when enabled). It
+does no request parsing, logging or response building, and it is safe to run
+on an executor thread.
+"""
+
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .batching import micro_batcher
+from .model_cache import ModelCache
+from .prediction_cache import prediction_cache
+from .runtimes import get_runtime_model
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureCountMismatch(ValueError):
+    """Raised when the input's feature count differs from what the model expects."""
+    pass
+
+
+def run_prediction(algorithm, model_file_abs_path: str, input_data: np.ndarray, timer: StageTimer = None) -> dict:
+    """
+    Predicts a validated float64 feature matrix with an algorithm's model.
+
+    Args:
+        algorithm: The MLAlgorithm to predict with.
+        model_file_abs_path: Absolute path of its (existing) artifact.
+        input_data: (rows, features) float64 array from validate_feature_matrix.
+        timer: Optional StageTimer that receives the model_fetch and predict stages.
+
+    Returns:
+        dict: prediction (np.ndarray), cached (bool), model_cache_hit (bool or None
+              when the model was not needed), load_time and predict_time (seconds).
+    Raises:
+        FeatureCountMismatch: If the model expects a different number of features.
+        FileNotFoundError: If the artifact disappeared.
+        Exception: Anything the model raised while predicting.
+    """
+    timer = timer or StageTimer()
+    predict_stage_start = time.perf_counter()  # The predict stage also covers prediction cache lookups
+
+    # --- Answer repeated rows from the prediction cache ---
+    row_keys = []
+    row_predictions = [None] * input_data.shape[0]
+    if settings.PREDICTION_CACHE_ENABLED:
+        row_keys = prediction_cache.row_keys(
+            algorithm.id, ModelCache.artifact_version(model_file_abs_path), input_data
+        )
+        row_predictions = prediction_cache.get_many(row_keys)
+    missing_rows = [i for i, value in enumerate(row_predictions) if value is None]
+    cache_hit, load_time, predict_time = None, 0.0, 0.0  # The model is not touched when every row is cached
+
+    if missing_rows:
+        # --- Fetch model from the per-worker cache (loads from disk on a miss) ---
+        timer.record("predict", time.perf_counter() - predict_stage_start)
+        with timer.stage("model_fetch"):
+            model, cache_hit, load_time = get_runtime_model(algorithm, model_file_abs_path)
+        predict_stage_start = time.perf_counter()
+        if not cache_hit:
+            logger.info(
+                "Loaded model for Algorithm ID %s from '%s' in %.4fs",
+                algorithm.id, model_file_abs_path, load_time
+            )
+
+        expected_features = getattr(model, "n_features_in_", None)  # Get expected number of features
+        if expected_features is not None and input_data.shape[1] != expected_features:
+            raise FeatureCountMismatch(
+                f"Input data shape mismatch: received {input_data.shape[1]} features, "
+                f"but model expects {expected_features}."
+            )
+
+        rows_to_predict = input_data if len(missing_rows) == input_data.shape[0] else input_data[missing_rows]
+        predict_start = time.time()  # Start timer for prediction
+        if settings.PREDICT_BATCHING_ENABLED and rows_to_predict.shape[0] == 1:
+            # Single rows share one vectorised predict with concurrent requests
+            new_predictions, _ = micro_batcher.predict(algorithm.id, model, rows_to_predict)
+        else:
+            new_predictions = model.predict(rows_to_predict)  # Perform prediction
+        predict_time = time.time() - predict_start  # Calculate prediction time
+
+        new_predictions = np.asarray(new_predictions)
+        for i, value in zip(missing_rows, new_predictions):
+            row_predictions[i] = value
+        if row_keys:
+            prediction_cache.set_many([row_keys[i] for i in missing_rows], new_predictions)
+    timer.record("predict", time.perf_counter() - predict_stage_start)
+
+    return {
+        "prediction": np.asarray(row_predictions),
+        "cached": not missing_rows,
+        "model_cache_hit": cache_hit,
+        "load_time": load_time,
+        "predict_time": predict_time,
+    }
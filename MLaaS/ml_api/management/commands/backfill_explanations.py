@@ -0,0 +1,145 @@
+"""
+Django management command that stores SHAP explanations for historical
+prediction requests (MLRequest rows without a READY MLRequestExplanation).
+
+Requests are read in ID order per algorithm and grouped into batches of
+--batch-size requests; each batch is explained with one vectorised SHAP call.
+Batches are computed in parallel by --workers forked processes (each builds
+its explainer once per algorithm) and written back with bulk_create by this
+process. This process also resolves each linear model's background mean and
+passes it along, so the workers never touch the database. Rerunning the
+command only picks up requests that are still unexplained, including ones the
+background precomputer left PENDING (worker exit) or FAILED.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ml_api.explainers import linear_background_mean
+from ml_api.explanation_store import (
+    build_explanations, compute_shap, explanation_model_path, is_explainable, store_explanations,
+)
+from ml_api.models import MLAlgorithm, MLRequest, MLRequestExplanation
+
+
+def _worker_ready():
+    """No-op used to start the worker processes before the database is used again."""
+    return os.getpid()
+
+
+def _explain_batch(algorithm_id, model_file_abs_path, rows, background=None):
+    """Worker: computes SHAP for one batch; returns (values, base_values, version) or the error message."""
+    try:
+        return compute_shap(algorithm_id, model_file_abs_path, rows, background=background), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class Command(BaseCommand):
+    """Computes and stores missing SHAP explanations in parallel batches."""
+
+    help = "Backfill MLRequestExplanation rows for prediction requests that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', type=int, action='append', default=[],
+                            help="Only requests of this MLAlgorithm ID (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=200, help="Requests per SHAP call.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes computing SHAP (1 computes inline).")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many requests.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+        self.totals = {'explained': 0, 'skipped': 0, 'failed': 0}
+        start = time.perf_counter()
+
+        pool = None
+        if options['workers'] > 1:
+            connections.close_all()  # Forked workers must not inherit open database connections
+            pool = ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('fork'))
+            for future in [pool.submit(_worker_ready) for _ in range(options['workers'])]:
+                future.result()
+        try:
+            self._run(pool, options)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Explained {self.totals['explained']} requests in {elapsed:.1f}s "
+            f"({self.totals['skipped']} skipped, {self.totals['failed']} failed)."
+        ))
+
+    def _run(self, pool, options):
+        queryset = MLRequest.objects.exclude(
+            explanation__status=MLRequestExplanation.STATUS_READY
+        ).order_by('algorithm_id', 'id')
+        if options['algorithm']:
+            queryset = queryset.filter(algorithm_id__in=options['algorithm'])
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+
+        model_paths = {}
+        backgrounds = {}  # algorithm_id -> linear background mean (None for other models)
+        pending = deque()  # (batch, future or inline result), oldest first
+        max_pending = 2 * options['workers']
+        for batch in self._batches(queryset.only('id', 'input_data', 'algorithm_id'), options['batch_size']):
+            algorithm_id = batch[0].algorithm_id
+            if algorithm_id not in model_paths:
+                model_paths[algorithm_id] = explanation_model_path(MLAlgorithm.objects.get(pk=algorithm_id))
+                if model_paths[algorithm_id] is None:
+                    self.stderr.write(f"Algorithm ID {algorithm_id}: model file not found, skipping its requests.")
+                else:
+                    try:
+                        backgrounds[algorithm_id] = linear_background_mean(algorithm_id, model_paths[algorithm_id])
+                    except Exception:
+                        backgrounds[algorithm_id] = None  # The worker reports the load error per batch
+            if model_paths[algorithm_id] is None:
+                self.totals['skipped'] += len(batch)
+                continue
+
+            rows = [row for ml_request in batch for row in ml_request.input_data]
+            args = (algorithm_id, model_paths[algorithm_id], rows, backgrounds[algorithm_id])
+            pending.append((batch, pool.submit(_explain_batch, *args) if pool else _explain_batch(*args)))
+            while len(pending) >= max_pending or (pool is None and pending):
+                self._store(*pending.popleft())
+        while pending:
+            self._store(*pending.popleft())
+
+    def _batches(self, queryset, batch_size):
+        """Yields lists of explainable requests that share an algorithm."""
+        batch = []
+        for ml_request in queryset.iterator(chunk_size=batch_size * 4):
+            if not is_explainable(ml_request):
+                self.totals['skipped'] += 1
+                continue
+            if batch and (len(batch) >= batch_size or batch[0].algorithm_id != ml_request.algorithm_id):
+                yield batch
+                batch = []
+            batch.append(ml_request)
+        if batch:
+            yield batch
+
+    def _store(self, batch, outcome):
+        result, error = outcome.result() if hasattr(outcome, 'result') else outcome
+        if error:
+            self.totals['failed'] += len(batch)
+            self.stderr.write(
+                f"Algorithm ID {batch[0].algorithm_id}: requests {batch[0].id}-{batch[-1].id} failed: {error}"
+            )
+            return
+        explanations = build_explanations(batch, *result)
+        store_explanations(explanations)
+        self.totals['explained'] += len(explanations)
+        self.stdout.write(
+            f"Algorithm ID {batch[0].algorithm_id}: stored {len(explanations)} explanations "
+            f"(requests {batch[0].id}-{batch[-1].id})."
+        )
@@ -0,0 +1,129 @@
+"""
+Django management command that benchmarks the native contribution paths
+against the generic SHAP explainer.
+
+For an XGBRegressor and a LinearRegression (fitted on synthetic data, or
+loaded with --model-path) it times the fast path explain uses
+(XGBoostContributionExplainer: Booster.predict(pred_contribs=True);
+LinearContributionExplainer: coef * (x - mean)) against the SHAP explainer
+that explain used before (shap.TreeExplainer for XGBoost, shap.Explainer with
+the same background rows otherwise), for batch sizes from 1 to 1000 rows. Explainer
+build time is reported once per model, and the maximum absolute difference
+between the two paths' values next to each timing. If SHAP cannot explain a
+model, its column shows the error instead.
+"""
+
+import time
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ml_api.explainers import (
+    TREE_EXPLAINER_MODELS, LinearContributionExplainer, XGBoostContributionExplainer, is_linear_model,
+)
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000]
+
+
+class Command(BaseCommand):
+    """Prints fast-path vs SHAP explainer latency per batch size."""
+
+    help = "Benchmark native XGBoost/linear contributions against the generic SHAP explainer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-path', action='append', default=[],
+                            help="Model artifact to benchmark (repeatable). Defaults to synthetic XGBoost and linear models.")
+        parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_BATCH_SIZES)
+        parser.add_argument('--features', type=int, default=18)
+        parser.add_argument('--trees', type=int, default=100)
+        parser.add_argument('--background', type=int, default=100, help="Background rows for the mean / SHAP masker.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the best is reported.")
+
+    def _best_ms(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def _synthetic_models(self, n_features, n_trees):
+        from sklearn.linear_model import LinearRegression
+        from xgboost import XGBRegressor
+
+        rng = np.random.default_rng(0)
+        X = rng.random((5000, n_features))
+        y = X @ rng.random(n_features) + rng.normal(scale=0.1, size=5000)
+        return [
+            ('XGBRegressor (synthetic)', XGBRegressor(n_estimators=n_trees, max_depth=6).fit(X, y)),
+            ('LinearRegression (synthetic)', LinearRegression().fit(X, y)),
+        ]
+
+    def _fast_explainer(self, model, background):
+        if type(model).__module__.startswith('xgboost'):
+            return XGBoostContributionExplainer(model)
+        if is_linear_model(model):
+            return LinearContributionExplainer(model, background.mean(axis=0))
+        return None
+
+    @staticmethod
+    def _values(explanation):
+        values = np.asarray(explanation.values)
+        return values[..., -1] if values.ndim == 3 else values
+
+    def handle(self, *args, **options):
+        import shap
+
+        if options['model_path']:
+            models = [(path, joblib.load(path)) for path in options['model_path']]
+        else:
+            models = self._synthetic_models(options['features'], options['trees'])
+
+        rng = np.random.default_rng(1)
+        for label, model in models:
+            n_features = getattr(model, 'n_features_in_', None) or options['features']
+            background = rng.random((options['background'], n_features))
+
+            start = time.perf_counter()
+            fast = self._fast_explainer(model, background)
+            fast_build_ms = (time.perf_counter() - start) * 1000
+            if fast is None:
+                self.stdout.write(self.style.WARNING(f"{label}: no fast contribution path for {type(model).__name__}"))
+                continue
+
+            start = time.perf_counter()
+            try:
+                if type(model).__module__.startswith('xgboost') or type(model).__name__ in TREE_EXPLAINER_MODELS:
+                    generic = shap.TreeExplainer(model)
+                else:
+                    generic = shap.Explainer(model, background)
+                generic_error = None
+            except Exception as e:
+                generic, generic_error = None, f"{type(e).__name__}: {e}"
+            generic_build_ms = (time.perf_counter() - start) * 1000
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {type(fast).__name__} built in {fast_build_ms:.2f} ms, "
+                + (f"{type(generic).__name__} in {generic_build_ms:.2f} ms" if generic else "SHAP explainer unavailable")
+            ))
+            if generic_error:
+                self.stdout.write(self.style.WARNING(f"  {generic_error[:200]}"))
+            self.stdout.write(f"{'rows':>8} {'fast ms':>10} {'shap ms':>10} {'speed-up':>9} {'max |diff|':>12}")
+            for size in options['sizes']:
+                X = rng.random((size, n_features))
+                fast_ms = self._best_ms(lambda: fast(X), options['repeat'])
+                if generic is None:
+                    self.stdout.write(f"{size:>8} {fast_ms:>10.3f} {'-':>10} {'-':>9} {'-':>12}")
+                    continue
+                try:
+                    generic_ms = self._best_ms(lambda: generic(X), options['repeat'])
+                except Exception as e:
+                    self.stdout.write(f"{size:>8} {fast_ms:>10.3f} {'failed':>10}  {type(e).__name__}: {str(e)[:80]}")
+                    continue
+                diff = float(np.max(np.abs(self._values(fast(X)) - self._values(generic(X)))))
+                self.stdout.write(
+                    f"{size:>8} {fast_ms:>10.3f} {generic_ms:>10.3f} "
+                    f"{generic_ms / fast_ms if fast_ms else float('inf'):>8.1f}x {diff:>12.2e}"
+                )
+            self.stdout.write("")
@@ -0,0 +1,80 @@
+"""
+Django management command that measures how long a worker takes to import the
+MLaaS application.
+
+Each run starts a fresh Python interpreter (no warm module cache in the
+process) that sets Django up and imports the URLconf, and with it every view
+module, the way a gunicorn worker does before serving its first request. The
+"lazy" run imports the tree as it is; the "eager" run first imports the
+modules the views used to load at module level (shap, matplotlib.pyplot,
+pandas and the ONNX converters), reproducing the start-up cost before they
+were deferred. Reports median/min import time, resident memory after import
+and which heavy packages ended up loaded.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+EAGER_MODULES = ('shap', 'matplotlib.pyplot', 'pandas', 'skl2onnx', 'onnxmltools')
+HEAVY_PACKAGES = ('shap', 'matplotlib', 'pandas', 'sklearn', 'scipy', 'xgboost', 'skl2onnx', 'onnxmltools')
+
+CHILD_SCRIPT = """
+import importlib, json, os, sys, time
+start = time.perf_counter()
+for name in {preload!r}:
+    importlib.import_module(name)
+import django
+django.setup()
+importlib.import_module({urlconf!r})
+elapsed = time.perf_counter() - start
+from ml_api.benchmarking import read_memory_kb
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_kb": read_memory_kb().get("Rss", 0),
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+class Command(BaseCommand):
+    """Compares worker import time with the heavy explain dependencies deferred and loaded eagerly."""
+
+    help = "Measure the application's import time in fresh interpreters (lazy vs eager heavy imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per mode.")
+        parser.add_argument('--modes', nargs='+', choices=('lazy', 'eager'), default=['lazy', 'eager'])
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be at least 1.")
+        self.stdout.write(f"Importing {settings.ROOT_URLCONF} in {options['runs']} fresh interpreters per mode")
+        self.stdout.write(f"{'mode':>6} {'median s':>9} {'min s':>7} {'RSS MB':>7}  heavy packages loaded")
+        for mode in options['modes']:
+            results = [self._run_once(mode) for _ in range(options['runs'])]
+            seconds = [result['seconds'] for result in results]
+            self.stdout.write(
+                f"{mode:>6} {statistics.median(seconds):>9.3f} {min(seconds):>7.3f} "
+                f"{statistics.median(result['rss_kb'] for result in results) / 1024:>7.1f}  "
+                f"{', '.join(results[-1]['loaded']) or '-'}"
+            )
+
+    def _run_once(self, mode):
+        script = CHILD_SCRIPT.format(
+            preload=EAGER_MODULES if mode == 'eager' else (),
+            urlconf=settings.ROOT_URLCONF,
+            heavy=HEAVY_PACKAGES,
+        )
+        completed = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=dict(os.environ),
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"Import failed ({mode}):\n{completed.stderr[-2000:]}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
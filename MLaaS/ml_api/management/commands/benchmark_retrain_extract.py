@@ -0,0 +1,128 @@
+"""
+Django management command that benchmarks retraining data extraction.
+
+Compares the object path (preprocess_claim_objects: one Python dict per Claim
+model instance, then a DataFrame) with the columnar path
+(retrain_preprocessing_columnar: one values_list query streamed in chunks into
+preallocated NumPy columns). For each it reports wall time, rows per second
+and peak Python memory (tracemalloc, measured in a separate run so tracing
+does not distort the timing), plus whether both produce the same X and y.
+
+With access to the 'claims' models it reads the Claim table. Otherwise, or
+with --synthetic, both paths are fed --rows generated rows without a
+database: lightweight objects shaped like Claim instances for the object
+path and float tuples for the columnar path, so only the Python-side cost is
+compared.
+"""
+
+import time
+import tracemalloc
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ml_api.retrain_preprocessing import (
+    CLAIM_FIELD_COLUMNS, EXTRACT_COLUMNS, fill_columns, preprocess_claim_columns, preprocess_claim_objects,
+    retrain_preprocessing_columnar,
+)
+
+
+def _synthetic_values(n_rows, seed=0):
+    """(n_rows, len(EXTRACT_COLUMNS)) values in extract order; the filtered specials are zero."""
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.random((n_rows, len(EXTRACT_COLUMNS))) * 1000, 2)
+    values[:, EXTRACT_COLUMNS.index('injuryprognosis')] = rng.integers(1, 30, n_rows)
+    for col in ('specialhealthexpenses', 'specialfixes', 'specialrehabilitation', 'specialadditionalinjury'):
+        values[:, EXTRACT_COLUMNS.index(col)] = 0
+    return values
+
+
+def _synthetic_claims(values):
+    """Yields objects shaped like Claim instances (Decimal money fields, related accident/injury)."""
+    prognosis = EXTRACT_COLUMNS.index('injuryprognosis')
+    field_positions = [(field, EXTRACT_COLUMNS.index(col)) for col, field in CLAIM_FIELD_COLUMNS.items()]
+    for row in values.tolist():
+        injury = SimpleNamespace(
+            injury_prognosis=int(row[prognosis]), injury_description='Unknown', dominant_injury='Unknown',
+            whiplash=False, minor_psychological_injury=False, exceptional_circumstances=False,
+        )
+        accident = SimpleNamespace(
+            injury=injury, driver=None, vehicle=None, accident_type='Unknown', accident_description='Unknown',
+            weather_conditions='Unknown', police_report_filed=False, witness_present=False, accident_date=None,
+        )
+        claim = SimpleNamespace(accident=accident, claim_date=None)
+        for field, position in field_positions:
+            setattr(claim, field, Decimal(f"{row[position]:.2f}"))
+        yield claim
+
+
+def _synthetic_rows(values):
+    """Yields float tuples as the database returns them for claim_columns_queryset."""
+    for row in values.tolist():
+        yield tuple(row)
+
+
+class Command(BaseCommand):
+    """Prints rows/s and peak memory of the object and columnar retraining extracts."""
+
+    help = "Benchmark columnar retraining data extraction against the per-Claim object path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', action='store_true',
+                            help="Use generated rows even if the claims models are available.")
+        parser.add_argument('--rows', type=int, default=200000, help="Generated rows in synthetic mode.")
+        parser.add_argument('--chunk-size', type=int, default=settings.RETRAIN_EXTRACT_CHUNK_SIZE)
+
+    def _paths(self, options):
+        """Returns (source description, {name: callable returning (X, y)})."""
+        chunk_size = options['chunk_size']
+        if not options['synthetic']:
+            try:
+                from claims.models import Claim
+            except ImportError:
+                self.stdout.write(self.style.WARNING("claims models unavailable; using synthetic rows."))
+            else:
+                return f"Claim table ({Claim.objects.count()} rows)", {
+                    'object': lambda: preprocess_claim_objects(Claim.objects.select_related('accident')),
+                    'columnar': lambda: retrain_preprocessing_columnar(Claim.objects.all(), chunk_size=chunk_size),
+                }
+        values = _synthetic_values(options['rows'])
+        return f"{options['rows']} synthetic rows (no database)", {
+            'object': lambda: preprocess_claim_objects(_synthetic_claims(values)),
+            'columnar': lambda: preprocess_claim_columns(fill_columns(
+                _synthetic_rows(values), len(EXTRACT_COLUMNS), expected_rows=len(values), chunk_size=chunk_size,
+            )),
+        }
+
+    def handle(self, *args, **options):
+        source, paths = self._paths(options)
+        self.stdout.write(f"Source: {source}, chunk size {options['chunk_size']}")
+        self.stdout.write(f"{'path':>10} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}")
+
+        results = {}
+        for name, run in paths.items():
+            start = time.perf_counter()
+            X, y = run()
+            seconds = time.perf_counter() - start
+            results[name] = (X, y)
+
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rate = X.shape[0] / seconds if seconds else float('inf')
+            self.stdout.write(f"{name:>10} {X.shape[0]:>10} {seconds:>9.3f} {rate:>12,.0f} {peak / 2**20:>9.1f}")
+
+        (X_obj, y_obj), (X_col, y_col) = results['object'], results['columnar']
+        same = X_obj.shape == X_col.shape and (
+            X_obj.empty or (
+                np.allclose(X_obj.to_numpy(dtype=np.float64), X_col.to_numpy(dtype=np.float64))
+                and np.allclose(y_obj.to_numpy(dtype=np.float64), y_col.to_numpy(dtype=np.float64))
+            )
+        )
+        line = "Columnar X/y match the object path." if same else "Columnar X/y differ from the object path."
+        self.stdout.write(self.style.SUCCESS(line) if same else self.style.WARNING(line))
@@ -0,0 +1,124 @@
+"""
+Django management command that compares inference runtimes for one model.
+
+For the native joblib model, the compiled tree engine and the ONNX export it
+reports single-row latency (p50/p99 over many calls), batch latency and the
+memory a worker needs to hold the runtime. Each runtime is measured in its own
+forked process so memory deltas are not polluted by the other runtimes.
+Runtimes that cannot be built for the model are reported and skipped.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_api.benchmarking import percentile, read_memory_kb
+from ml_api.onnx_runtime import OnnxConversionError, OnnxModel, export_and_verify
+from ml_api.tree_engine import CompiledTreeEnsemble, TreeCompilationError, compile_and_verify
+
+RUNTIMES = ('NATIVE', 'TREE_ENGINE', 'ONNX')
+
+
+def _load_runtime(runtime, paths):
+    """Loads one runtime from its artifact, as a worker would on a cache miss."""
+    if runtime == 'NATIVE':
+        return joblib.load(paths['NATIVE'])
+    if runtime == 'TREE_ENGINE':
+        return CompiledTreeEnsemble.load(paths['TREE_ENGINE'])
+    return OnnxModel(paths['ONNX'])
+
+
+def _measure(runtime, paths, n_features, calls, batch_rows, results):
+    """Body of a forked child: load one runtime, then time single-row and batch predictions."""
+    rss_before = read_memory_kb().get('Rss', 0)
+    load_start = time.perf_counter()
+    model = _load_runtime(runtime, paths)
+    load_ms = (time.perf_counter() - load_start) * 1000
+
+    rng = np.random.default_rng(0)
+    rows = rng.random((calls, 1, n_features))
+    model.predict(rows[0])  # First call initialises lazy state
+    single_ms = []
+    for row in rows:
+        start = time.perf_counter()
+        model.predict(row)
+        single_ms.append((time.perf_counter() - start) * 1000)
+    batch = rng.random((batch_rows, n_features))
+    start = time.perf_counter()
+    model.predict(batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    results[runtime] = {
+        'load_ms': load_ms,
+        'p50_ms': percentile(single_ms, 50),
+        'p99_ms': percentile(single_ms, 99),
+        'batch_ms': batch_ms,
+        'rss_delta_mb': (read_memory_kb().get('Rss', 0) - rss_before) / 1024,
+    }
+
+
+class Command(BaseCommand):
+    """Prints latency and memory for the native, tree engine and ONNX runtimes of a model."""
+
+    help = "Compare latency and memory of the native, compiled tree engine and ONNX runtimes for a model."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_path', help="Model artifact (.pkl/.joblib) to benchmark.")
+        parser.add_argument('--calls', type=int, default=1000, help="Single-row predictions per runtime.")
+        parser.add_argument('--batch-rows', type=int, default=10000)
+        parser.add_argument('--runtimes', nargs='+', choices=RUNTIMES, default=list(RUNTIMES))
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['model_path']):
+            raise CommandError(f"Model file not found: {options['model_path']}")
+        model = joblib.load(options['model_path'])
+        n_features = getattr(model, 'n_features_in_', None)
+        if not n_features:
+            raise CommandError(f"{type(model).__name__} does not expose n_features_in_.")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = {'NATIVE': options['model_path']}
+            runtimes = ['NATIVE'] if 'NATIVE' in options['runtimes'] else []
+            for runtime, filename, build, error in (
+                    ('TREE_ENGINE', 'model.trees.npz', compile_and_verify, TreeCompilationError),
+                    ('ONNX', 'model.onnx', export_and_verify, OnnxConversionError)):
+                if runtime not in options['runtimes']:
+                    continue
+                paths[runtime] = os.path.join(tmp_dir, filename)
+                try:
+                    build(model, paths[runtime])
+                    runtimes.append(runtime)
+                except error as e:
+                    self.stdout.write(self.style.WARNING(f"{runtime} skipped: {e}"))
+            del model
+
+            ctx = multiprocessing.get_context('fork')
+            results = ctx.Manager().dict()
+            for runtime in runtimes:
+                process = ctx.Process(
+                    target=_measure,
+                    args=(runtime, paths, n_features, options['calls'], options['batch_rows'], results),
+                )
+                process.start()
+                process.join()
+
+            batch_label = f"{options['batch_rows']} rows ms"
+            self.stdout.write(
+                f"{'runtime':>12} {'load ms':>9} {'p50 ms':>8} {'p99 ms':>8} "
+                f"{batch_label:>16} {'RSS +MB':>8} {'file MB':>8}"
+            )
+            for runtime in runtimes:
+                result = results.get(runtime)
+                if result is None:
+                    self.stdout.write(self.style.ERROR(f"{runtime:>12} measurement failed"))
+                    continue
+                self.stdout.write(
+                    f"{runtime:>12} {result['load_ms']:>9.1f} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} "
+                    f"{result['batch_ms']:>16.2f} {result['rss_delta_mb']:>8.1f} "
+                    f"{os.path.getsize(paths[runtime]) / 1024 / 1024:>8.2f}"
+                )
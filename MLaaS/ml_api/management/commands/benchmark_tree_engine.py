@@ -0,0 +1,80 @@
+"""
+Django management command that benchmarks the compiled tree engine.
+
+Compares the native predict of a RandomForestRegressor and an XGBRegressor
+(fitted on synthetic data, or loaded with --model-path) against the flat-array
+CompiledTreeEnsemble, for batch sizes from 1 to 10k rows. The maximum absolute
+difference between the two is reported next to the timings.
+"""
+
+import time
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ml_api.tree_engine import TreeCompilationError, compile_model
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+
+class Command(BaseCommand):
+    """Prints native vs compiled predict time per batch size for tree ensembles."""
+
+    help = "Benchmark compiled tree engine inference against native RandomForest/XGBoost predict."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-path', action='append', default=[],
+                            help="Model artifact to benchmark (repeatable). Defaults to synthetic RF and XGBoost models.")
+        parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_BATCH_SIZES)
+        parser.add_argument('--features', type=int, default=18)
+        parser.add_argument('--trees', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the best is reported.")
+
+    def _best_ms(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def _synthetic_models(self, n_features, n_trees):
+        from sklearn.ensemble import RandomForestRegressor
+        from xgboost import XGBRegressor
+
+        rng = np.random.default_rng(0)
+        X = rng.random((5000, n_features))
+        y = X @ rng.random(n_features) + rng.normal(scale=0.1, size=5000)
+        return [
+            ('RandomForestRegressor (synthetic)', RandomForestRegressor(n_estimators=n_trees, random_state=0).fit(X, y)),
+            ('XGBRegressor (synthetic)', XGBRegressor(n_estimators=n_trees, max_depth=6).fit(X, y)),
+        ]
+
+    def handle(self, *args, **options):
+        if options['model_path']:
+            models = [(path, joblib.load(path)) for path in options['model_path']]
+        else:
+            models = self._synthetic_models(options['features'], options['trees'])
+
+        rng = np.random.default_rng(1)
+        for label, model in models:
+            try:
+                compiled = compile_model(model)
+            except TreeCompilationError as e:
+                self.stdout.write(self.style.WARNING(f"{label}: {e}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {compiled.roots.shape[0]} trees, {compiled.feature.shape[0]} nodes, depth {compiled.max_depth}"
+            ))
+            self.stdout.write(f"{'rows':>8} {'native ms':>12} {'compiled ms':>12} {'speed-up':>9} {'max |diff|':>12}")
+            for size in options['sizes']:
+                X = rng.random((size, compiled.n_features_in_))
+                native_ms = self._best_ms(lambda: model.predict(X), options['repeat'])
+                compiled_ms = self._best_ms(lambda: compiled.predict(X), options['repeat'])
+                diff = float(np.max(np.abs(compiled.predict(X) - model.predict(X))))
+                self.stdout.write(
+                    f"{size:>8} {native_ms:>12.3f} {compiled_ms:>12.3f} "
+                    f"{native_ms / compiled_ms if compiled_ms else float('inf'):>8.1f}x {diff:>12.2e}"
+                )
+            self.stdout.write("")
@@ -0,0 +1,67 @@
+"""
+Django management command that benchmarks prediction input validation.
+
+Compares the previous per-value Python loop against validate_feature_matrix
+(vectorised NumPy checks) and the full AlgorithmPredictInputSerializer, for a
+range of batch sizes.
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ml_api.serializers import AlgorithmPredictInputSerializer, validate_feature_matrix
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def legacy_validate(value):
+    """The nested isinstance loop validation used before vectorisation (reference only)."""
+    if not all(isinstance(item, list) for item in value):
+        raise ValueError("Each item must be a list.")
+    first_row_len = len(value[0])
+    if not all(len(item) == first_row_len for item in value):
+        raise ValueError("Rows differ in length.")
+    for item in value:
+        for num in item:
+            if not isinstance(num, (int, float)):
+                raise ValueError("Non-numeric value.")
+    return np.array(value)  # The view converted the list afterwards
+
+
+class Command(BaseCommand):
+    """Prints validation time per batch size for legacy, vectorised and serializer paths."""
+
+    help = "Benchmark predict input validation time against batch size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_BATCH_SIZES)
+        parser.add_argument('--features', type=int, default=18)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the best is reported.")
+
+    def _best_ms(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        self.stdout.write(
+            f"{'rows':>8} {'legacy ms':>12} {'vectorised ms':>14} {'serializer ms':>14} {'speed-up':>9}"
+        )
+        for size in options['sizes']:
+            payload = rng.random((size, options['features'])).round(2).tolist()  # JSON-decoded shape
+            legacy_ms = self._best_ms(lambda: legacy_validate(payload), options['repeat'])
+            vector_ms = self._best_ms(lambda: validate_feature_matrix(payload), options['repeat'])
+            serializer_ms = self._best_ms(
+                lambda: AlgorithmPredictInputSerializer(data={'input_data': payload}).is_valid(raise_exception=True),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f"{size:>8} {legacy_ms:>12.3f} {vector_ms:>14.3f} {serializer_ms:>14.3f} "
+                f"{legacy_ms / vector_ms if vector_ms else float('inf'):>8.1f}x"
+            )
@@ -0,0 +1,120 @@
+"""
+Django management command that measures per-worker memory with and without
+shared model memory.
+
+Forks N worker processes the way gunicorn does and reports RSS and PSS for
+each one in three modes:
+  private  - every worker unpickles its own copy (the default deployment)
+  preload  - models are loaded once in the parent before fork (MODEL_PRELOAD_IN_MASTER)
+  mmap     - every worker loads with joblib mmap_mode='r' (MODEL_MMAP_MODE)
+
+PSS divides shared pages between the processes sharing them, so the PSS total
+is the real memory cost of the worker pool.
+"""
+
+import gc
+import multiprocessing
+import os
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ml_api.benchmarking import read_memory_kb
+from ml_api.models import MLAlgorithm
+from ml_api.warmup import get_model_file_abs_path
+
+MODES = ('private', 'preload', 'mmap')
+
+_preloaded_models = []  # Filled in the parent for 'preload' mode and inherited by forked workers
+
+
+def _load_models(paths, mmap_mode=None):
+    """Loads every artifact, optionally memory-mapping the NumPy arrays."""
+    return [joblib.load(path, mmap_mode=mmap_mode) for path in paths]
+
+
+def _worker(mode, paths, ready, stop):
+    """Body of a forked benchmark worker: acquire models, predict once, wait to be measured."""
+    if mode == 'preload':
+        models = _preloaded_models
+    else:
+        models = _load_models(paths, mmap_mode='r' if mode == 'mmap' else None)
+    for model in models:
+        n_features = getattr(model, 'n_features_in_', None) or 18
+        model.predict(np.zeros((1, n_features)))  # Touch the model as a real request would
+    ready.set()
+    stop.wait(timeout=300)
+
+
+class Command(BaseCommand):
+    """Reports per-worker RSS/PSS for private, preloaded and memory-mapped models."""
+
+    help = "Benchmark per-worker memory with and without shared model memory (Linux only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Number of forked workers per mode.")
+        parser.add_argument(
+            '--model-path', action='append', dest='model_paths',
+            help="Artifact to load (repeatable). Defaults to every active MLAlgorithm.",
+        )
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+
+    def handle(self, *args, **options):
+        paths = options['model_paths'] or self._active_model_paths()
+        if not paths:
+            raise CommandError("No model artifacts to benchmark. Pass --model-path or register active models.")
+        connections.close_all()  # Forked workers must not inherit the DB socket
+
+        self.stdout.write(f"Artifacts: {', '.join(paths)}")
+        self.stdout.write(f"Parent baseline RSS: {read_memory_kb().get('Rss', 0) / 1024:.1f} MB")
+        for mode in options['modes']:
+            self._run_mode(mode, paths, options['workers'])
+
+    def _active_model_paths(self):
+        paths = []
+        for algorithm in MLAlgorithm.objects.filter(is_active=True).order_by('id'):
+            path = get_model_file_abs_path(algorithm)
+            if path and os.path.exists(path):
+                paths.append(path)
+        return paths
+
+    def _run_mode(self, mode, paths, n_workers):
+        ctx = multiprocessing.get_context('fork')
+        if mode == 'preload':
+            _preloaded_models[:] = _load_models(paths)
+            gc.freeze()  # Same treatment as the gunicorn when_ready hook
+
+        stop = ctx.Event()
+        workers = []
+        for _ in range(n_workers):
+            ready = ctx.Event()
+            process = ctx.Process(target=_worker, args=(mode, paths, ready, stop))
+            process.start()
+            workers.append((process, ready))
+        for process, ready in workers:
+            ready.wait(timeout=300)
+
+        usages = [read_memory_kb(process.pid) for process, _ in workers]
+        stop.set()
+        for process, _ in workers:
+            process.join()
+
+        if mode == 'preload':
+            gc.unfreeze()
+            _preloaded_models.clear()
+            gc.collect()
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(f"--- Mode: {mode} ({n_workers} workers) ---"))
+        self.stdout.write(f"{'worker':>6} {'RSS MB':>10} {'PSS MB':>10} {'private MB':>11}")
+        for index, usage in enumerate(usages):
+            private_kb = usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0)
+            self.stdout.write(
+                f"{index:>6} {usage.get('Rss', 0) / 1024:>10.1f} "
+                f"{usage.get('Pss', 0) / 1024:>10.1f} {private_kb / 1024:>11.1f}"
+            )
+        total_pss = sum(u.get('Pss', 0) for u in usages) / 1024
+        mean_rss = sum(u.get('Rss', 0) for u in usages) / 1024 / len(usages)
+        self.stdout.write(f"Mean RSS per worker: {mean_rss:.1f} MB | Total PSS of pool: {total_pss:.1f} MB")
@@ -0,0 +1,161 @@
+"""
+Django management command that load-tests the predict endpoint.
+
+Sends --requests predict calls from --concurrency client threads (one
+keep-alive connection each) and reports throughput and p50/p95/p99 latency of
+successful calls for every target. 503s (load shedding by the async inference
+pool) are counted separately from other errors.
+
+Targets are given as --target label=URL, or started locally with
+--spawn wsgi asgi, which runs gunicorn with gunicorn.conf.py once per
+MLAAS_SERVER_MODE on consecutive ports so the sync and async setups are
+compared under the same load.
+"""
+
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_api.benchmarking import percentile
+
+
+def _client(url, body, n_requests, latencies, errors, lock):
+    """One client thread: sends n_requests POSTs over a single keep-alive connection; errors collects statuses."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        try:
+            connection.request('POST', parts.path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = None  # Connection-level failure
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with lock:
+            if status == 200:
+                latencies.append(elapsed_ms)
+            else:
+                errors.append(status)
+    connection.close()
+
+
+class Command(BaseCommand):
+    """Reports predict throughput and tail latency for one or more running (or spawned) servers."""
+
+    help = "Load-test predict: throughput and p50/p95/p99 latency, e.g. sync WSGI vs async ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', default=[],
+                            help="label=base URL of a running server, e.g. sync=http://localhost:8009 (repeatable).")
+        parser.add_argument('--spawn', nargs='+', choices=('wsgi', 'asgi'), default=[],
+                            help="Start gunicorn locally in these server modes instead of using --target.")
+        parser.add_argument('--port', type=int, default=8100, help="First port used by --spawn.")
+        parser.add_argument('--workers', type=int, default=1, help="gunicorn workers per spawned server.")
+        parser.add_argument('--algorithm', type=int, required=True, help="MLAlgorithm ID to predict with.")
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--rows', type=int, default=1, help="Rows per request.")
+        parser.add_argument('--features', type=int, default=18)
+        parser.add_argument('--warmup', type=int, default=50, help="Untimed requests sent before measuring.")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            label, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f"--target must be label=URL, got '{target}'.")
+            targets.append((label, url.rstrip('/')))
+        if not targets and not options['spawn']:
+            raise CommandError("Pass --target label=URL or --spawn wsgi asgi.")
+
+        rng = np.random.default_rng(0)
+        body = json.dumps({'input_data': rng.random((options['rows'], options['features'])).round(3).tolist()})
+
+        self.stdout.write(
+            f"{options['requests']} requests, concurrency {options['concurrency']}, {options['rows']} row(s) each"
+        )
+        self.stdout.write(
+            f"{'target':>10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'503s':>6} {'errors':>7}"
+        )
+        for label, url in targets:
+            self._report(label, self._run(url, body, options))
+        for index, mode in enumerate(options['spawn']):
+            port = options['port'] + index
+            server = self._spawn(mode, port, options['workers'])
+            try:
+                self._report(mode, self._run(f"http://127.0.0.1:{port}", body, options))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def _predict_url(self, base_url, options):
+        return f"{base_url}/api/algorithms/{options['algorithm']}/predict/"
+
+    def _run(self, base_url, body, options):
+        url = self._predict_url(base_url, options)
+        lock = threading.Lock()
+        _client(url, body, options['warmup'], [], [], lock)
+
+        latencies, errors = [], []
+        concurrency = options['concurrency']
+        per_client = [options['requests'] // concurrency + (1 if i < options['requests'] % concurrency else 0)
+                      for i in range(concurrency)]
+        threads = [
+            threading.Thread(target=_client, args=(url, body, n, latencies, errors, lock))
+            for n in per_client if n
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors, time.perf_counter() - start
+
+    def _report(self, label, result):
+        latencies, errors, elapsed = result
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"{label:>10} all {len(errors)} requests failed"))
+            return
+        self.stdout.write(
+            f"{label:>10} {len(latencies) / elapsed:>9.1f} {percentile(latencies, 50):>9.2f} "
+            f"{percentile(latencies, 95):>9.2f} {percentile(latencies, 99):>9.2f} "
+            f"{max(latencies):>9.2f} {errors.count(503):>6} {len(errors) - errors.count(503):>7}"
+        )
+
+    def _spawn(self, mode, port, workers):
+        """Starts gunicorn in the given server mode and waits for the readiness probe."""
+        env = dict(os.environ, MLAAS_SERVER_MODE=mode, GUNICORN_BIND=f"127.0.0.1:{port}",
+                   GUNICORN_WORKERS=str(workers))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/ready/", timeout=2) as response:
+                    if response.status == 200:
+                        return server
+            except (urllib.error.URLError, OSError):
+                pass
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn ({mode}) exited with code {server.returncode}.")
+            time.sleep(0.5)
+        server.terminate()
+        raise CommandError(f"gunicorn ({mode}) did not become ready on port {port}.")
@@ -63,6 +63,7 @@ class Command(BaseCommand):
                 "description": "Predicts insurance claims using an XGBoost model.",
                 "model_type": "XGBOOST",
                 "is_active": True,
+                "primary": True,  # Endpoint routes to this model unless an engineer picked another
             },
         ]
 
@@ -80,6 +81,7 @@ class Command(BaseCommand):
                     'model_file': model_path,  # Store the relative path
                     'model_type': model_data["model_type"],  # Set model type
                     'is_active': model_data["is_active"],  # Set active status
+                    'runtime': model_data.get("runtime", "NATIVE"),  # Inference runtime (NATIVE, TREE_ENGINE or ONNX)
                 }
             )
 
@@ -87,7 +89,7 @@ class Command(BaseCommand):
             updated = False  # Initialise updated flag
             if not created:  # If the model already exists
                 # Check multiple fields that might need updating if defaults change
-                fields_to_check = ['description', 'model_file', 'model_type', 'is_active']  # Fields to check for updates
+                fields_to_check = ['description', 'model_file', 'model_type', 'is_active', 'runtime']  # Fields to check for updates
                 for field in fields_to_check:
                     if getattr(algorithm, field) != model_data.get(field, getattr(algorithm, field)):
                         setattr(algorithm, field, model_data[field])  # Update field value
@@ -139,4 +141,11 @@ class Command(BaseCommand):
             latest.save()
             self.stdout.write(self.style.SUCCESS(f"Set {latest.name} v{latest.version} as ACTIVE (latest version)"))
 
+        # --- Route the endpoint to the primary model, keeping an engineer's earlier choice ---
+        primary = next(m["name"] for m in models_to_register if m.get("primary"))
+        if not endpoint.primary_algorithm_name:
+            endpoint.primary_algorithm_name = primary
+            endpoint.save()
+        self.stdout.write(self.style.SUCCESS(f"Endpoint {endpoint.name} routes to {endpoint.primary_algorithm_name}"))
+
         self.stdout.write("--- Model Registration Finished ---")
\ No newline at end of file
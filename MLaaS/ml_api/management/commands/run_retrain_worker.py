@@ -0,0 +1,75 @@
+"""
+Django management command that runs queued retraining jobs.
+
+Runs as its own long-lived process (the mlaas-retrain-worker compose service)
+so model fitting never occupies a web worker. It claims the oldest queued
+RetrainJob, runs BaseRetrainer.retrain for it while recording the phase
+timings on the job, and polls again; when the queue is empty it sleeps
+--poll-interval seconds. SIGTERM/SIGINT stop the loop after the current job.
+Several workers may run side by side; each job is claimed by exactly one.
+On start it fails the jobs that earlier worker processes on this host left
+RUNNING, and while a job runs it keeps the job's heartbeat fresh.
+"""
+
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ml_api.retrain_jobs import claim_next_job, fail_orphaned_jobs, fail_stale_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    """Claims and runs RetrainJob rows until stopped."""
+
+    help = "Run queued retraining jobs (POST /api/algorithms/<id>/retrain/) in this process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=settings.RETRAIN_JOB_POLL_SECONDS,
+                            help="Seconds to sleep when no job is queued.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit when the queue is empty instead of polling.")
+        parser.add_argument('--max-jobs', type=int, default=None, help="Exit after running this many jobs.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._request_stop)
+
+        name = worker_name()
+        self.stdout.write(f"Retrain worker {name} started.")
+        orphaned = fail_orphaned_jobs(name)
+        if orphaned:
+            self.stdout.write(self.style.WARNING(f"Failed {orphaned} jobs left running by exited workers on this host."))
+        completed = 0
+        while not self.stopping:
+            close_old_connections()  # Long-lived process: drop connections the database has closed
+            fail_stale_jobs()
+            job = claim_next_job(name)
+            if job is None:
+                if options['once']:
+                    break
+                self._sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f"Job {job.pk}: retraining Algorithm ID {job.algorithm_id} (v{job.algorithm.version})...")
+            job = run_job(job)
+            line = f"Job {job.pk}: {job.get_status_display()} {job.phase_timings}"
+            self.stdout.write(self.style.SUCCESS(line) if job.status != job.STATUS_FAILED else self.style.ERROR(
+                f"{line} - {job.error}"
+            ))
+            completed += 1
+            if options['max_jobs'] and completed >= options['max_jobs']:
+                break
+        self.stdout.write(f"Retrain worker {name} stopped after {completed} jobs.")
+
+    def _request_stop(self, signum, frame):
+        self.stdout.write("Stop requested; finishing the current job.")
+        self.stopping = True
+
+    def _sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        while not self.stopping and time.monotonic() < deadline:
+            time.sleep(max(0.0, min(0.5, deadline - time.monotonic())))
@@ -0,0 +1,32 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def populate_request_uuids(apps, schema_editor):
+    """Gives every existing MLRequest its own UUID before the unique constraint is added."""
+    MLRequest = apps.get_model('ml_api', 'MLRequest')
+    for ml_request in MLRequest.objects.only('id').iterator():
+        ml_request.request_uuid = uuid.uuid4()
+        ml_request.save(update_fields=['request_uuid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlrequest',
+            name='request_uuid',
+            field=models.UUIDField(editable=False, help_text='Pre-allocated identifier returned to callers before the row is written.', null=True),
+        ),
+        migrations.RunPython(populate_request_uuids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mlrequest',
+            name='request_uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, help_text='Pre-allocated identifier returned to callers before the row is written.', unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0002_mlrequest_request_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlalgorithm',
+            name='runtime',
+            field=models.CharField(choices=[('NATIVE', 'Native model'), ('TREE_ENGINE', 'Compiled tree engine')], default='NATIVE', help_text='Inference runtime used for predictions; falls back to native if the model cannot be compiled.', max_length=20),
+        ),
+    ]
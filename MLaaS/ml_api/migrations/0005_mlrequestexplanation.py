@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0004_alter_mlalgorithm_runtime_onnx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MLRequestExplanation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shap_values', models.JSONField(help_text='Per-feature SHAP values, one list per input row.')),
+                ('base_value', models.FloatField(help_text='Expected model output the SHAP values are relative to.')),
+                ('explainer_version', models.CharField(help_text="Explainer class and SHAP version that produced the values (e.g., 'TreeExplainer/shap-0.47.2').", max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the explanation was computed.')),
+                ('request', models.OneToOneField(help_text='The prediction request this explanation belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='explanation', to='ml_api.mlrequest')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0005_mlrequestexplanation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlrequestexplanation',
+            name='error',
+            field=models.TextField(blank=True, help_text='Why the background computation failed, if it did.'),
+        ),
+        migrations.AddField(
+            model_name='mlrequestexplanation',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='READY', help_text='Whether the SHAP values are ready, still being computed in the background, or failed.', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='mlrequestexplanation',
+            name='base_value',
+            field=models.FloatField(blank=True, help_text='Expected model output the SHAP values are relative to.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='mlrequestexplanation',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, help_text='Timestamp when the explanation was computed (or queued).'),
+        ),
+        migrations.AlterField(
+            model_name='mlrequestexplanation',
+            name='explainer_version',
+            field=models.CharField(blank=True, help_text="Explainer class and SHAP version that produced the values (e.g., 'TreeExplainer/shap-0.47.2').", max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='mlrequestexplanation',
+            name='shap_values',
+            field=models.JSONField(blank=True, help_text='Per-feature SHAP values, one list per input row.', null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0006_mlrequestexplanation_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetrainJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('NO_DATA', 'No data'), ('FAILED', 'Failed')], db_index=True, default='QUEUED', help_text='Lifecycle state of the job.', max_length=10)),
+                ('phase', models.CharField(blank=True, help_text='Retraining phase currently running (preprocess, load, fit, save).', max_length=20)),
+                ('phase_timings', models.JSONField(blank=True, default=dict, help_text='Seconds spent in each finished phase.')),
+                ('result', models.JSONField(blank=True, help_text='Summary returned by the retrainer (metrics, new version).', null=True)),
+                ('error', models.TextField(blank=True, help_text='Why the job failed, if it did.')),
+                ('worker', models.CharField(blank=True, help_text='Worker (host:pid) that claimed the job.', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the job was queued.')),
+                ('started_at', models.DateTimeField(blank=True, help_text='Timestamp when a worker claimed the job.', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, help_text='Timestamp when the job finished.', null=True)),
+                ('algorithm', models.ForeignKey(help_text='The algorithm version to retrain.', on_delete=django.db.models.deletion.CASCADE, related_name='retrain_jobs', to='ml_api.mlalgorithm')),
+                ('new_algorithm', models.ForeignKey(blank=True, help_text='The algorithm version created by the job.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ml_api.mlalgorithm')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
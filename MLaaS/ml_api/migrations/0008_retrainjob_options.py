@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0007_retrainjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retrainjob',
+            name='options',
+            field=models.JSONField(blank=True, default=dict, help_text="Retraining options from the request, e.g. {'search': {'strategy': 'random', ...}}."),
+        ),
+        migrations.AlterField(
+            model_name='retrainjob',
+            name='phase',
+            field=models.CharField(blank=True, help_text='Retraining phase currently running (preprocess, load, search, fit, save).', max_length=20),
+        ),
+    ]
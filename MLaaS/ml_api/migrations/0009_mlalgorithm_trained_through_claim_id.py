@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0008_retrainjob_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlalgorithm',
+            name='trained_through_claim_id',
+            field=models.BigIntegerField(blank=True, help_text="Highest claim ID in this version's training data; incremental retraining starts after it.", null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+def set_primary_from_current_route(apps, schema_editor):
+    """Pins each endpoint to the algorithm it was routed to before (the most recently updated active one)."""
+    Endpoint = apps.get_model('ml_api', 'Endpoint')
+    MLAlgorithm = apps.get_model('ml_api', 'MLAlgorithm')
+    for endpoint in Endpoint.objects.all():
+        current = MLAlgorithm.objects.filter(parent_endpoint=endpoint, is_active=True).order_by(
+            '-updated_at', '-id'
+        ).first()
+        if current is not None:
+            Endpoint.objects.filter(pk=endpoint.pk).update(primary_algorithm_name=current.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0009_mlalgorithm_trained_through_claim_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endpoint',
+            name='primary_algorithm_name',
+            field=models.CharField(blank=True, help_text='Name of the algorithm this endpoint routes to; its active version serves predictions.', max_length=128),
+        ),
+        migrations.RunPython(set_primary_from_current_route, migrations.RunPython.noop),
+    ]
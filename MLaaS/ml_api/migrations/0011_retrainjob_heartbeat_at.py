@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml_api', '0010_endpoint_primary_algorithm_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retrainjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last sign of life from the worker running the job.', null=True),
+        ),
+    ]
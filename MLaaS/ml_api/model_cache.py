@@ -0,0 +1,143 @@
+# ml_api/model_cache.py
+"""
+Per-worker in-process cache of loaded model artifacts.
+
+Each gunicorn worker keeps its own cache. Entries are keyed by the algorithm
+ID and the artifact path, and remember the artifact's mtime and size so that a
+file replaced on disk is reloaded on the next request. The cache is bounded by
+a memory budget (estimated from the artifact size on disk) and evicts the least
+recently used model first.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def load_model_artifact(path: str):
+    """
+    Unpickles a model artifact, memory-mapping its NumPy arrays when
+    MODEL_MMAP_MODE is set. Memory-mapped tree arrays live in the OS page cache
+    and are shared by every worker instead of being copied into each one.
+    Only uncompressed joblib dumps can be memory-mapped.
+    """
+    if settings.MODEL_MMAP_MODE:
+        return joblib.load(path, mmap_mode=settings.MODEL_MMAP_MODE)
+    return joblib.load(path)
+
+
+class ModelCache:
+    """Thread-safe LRU cache of unpickled models with hit/miss counters."""
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Memory budget for cached artifacts. 0 disables caching.
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (algorithm_id, path) -> (version, model, size_bytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def artifact_version(path: str) -> tuple:
+        """Returns (mtime_ns, size) for the artifact, used to detect replaced files."""
+        stat_result = os.stat(path)
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    def get(self, algorithm_id: int, path: str, loader=load_model_artifact):
+        """
+        Returns the model for an algorithm, loading it on a miss.
+
+        Args:
+            algorithm_id: Primary key of the MLAlgorithm.
+            path: Absolute path to the model artifact.
+            loader: Callable used to load the artifact on a miss.
+
+        Returns:
+            tuple: (model, cache_hit: bool, load_seconds: float)
+        Raises:
+            FileNotFoundError: If the artifact does not exist.
+        """
+        key = (algorithm_id, path)
+        version = self.artifact_version(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)  # Mark as most recently used
+                self.hits += 1
+                return entry[1], True, 0.0
+            self.misses += 1
+
+        # Load outside the lock so a slow unpickle does not block other algorithms
+        load_start = time.time()
+        model = loader(path)
+        load_time = time.time() - load_start
+
+        self._store(key, version, model)
+        return model, False, load_time
+
+    def _store(self, key, version, model):
+        """Inserts a loaded model, evicting least recently used entries to fit the budget."""
+        size_bytes = version[1]
+        if self.max_bytes <= 0 or size_bytes > self.max_bytes:
+            logger.debug(
+                "Model %s (%d bytes) not cached: exceeds budget of %d bytes.",
+                key, size_bytes, self.max_bytes
+            )
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            while self._entries and self.current_bytes + size_bytes > self.max_bytes:
+                evicted_key, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+                logger.info("Evicted model %s from cache (%d bytes).", evicted_key, evicted_size)
+            self._entries[key] = (version, model, size_bytes)
+            self.current_bytes += size_bytes
+
+    def evict(self, algorithm_id: int):
+        """Drops every cached artifact belonging to an algorithm."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == algorithm_id]:
+                self.current_bytes -= self._entries.pop(key)[2]
+
+    def clear(self):
+        """Empties the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the cache counters for the metrics endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "cached_algorithm_ids": sorted({k[0] for k in self._entries}),
+            }
+
+
+# Module-level instance shared by all requests handled by this worker process
+model_cache = ModelCache(max_bytes=settings.MODEL_CACHE_MAX_BYTES)
@@ -1,5 +1,7 @@
 # ml_api/models.py
 
+import uuid  # Import uuid for pre-allocated request identifiers
+
 from django.db import models  # Import models from Django ORM
 
 class Endpoint(models.Model):
@@ -12,6 +14,11 @@ class Endpoint(models.Model):
         max_length=128,
         help_text="Owner or team responsible for the endpoint."  # Help text for endpoint owner
     )
+    primary_algorithm_name = models.CharField(
+        max_length=128,
+        blank=True,
+        help_text="Name of the algorithm this endpoint routes to; its active version serves predictions."  # Routing target
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text="Timestamp when the endpoint was created."  # Help text for creation timestamp
@@ -58,6 +65,17 @@ class MLAlgorithm(models.Model):
         default='OTHER',
         help_text="Type of the underlying ML model framework used."  # Help text for model type
     )
+    RUNTIME_CHOICES = [
+        ('NATIVE', 'Native model'),  # Predict with the unpickled estimator
+        ('TREE_ENGINE', 'Compiled tree engine'),  # Flat-array ensemble for RandomForest/XGBoost (see tree_engine.py)
+        ('ONNX', 'ONNX Runtime (CPU)'),  # ONNX export run by onnxruntime (see onnx_runtime.py)
+    ]
+    runtime = models.CharField(
+        max_length=20,
+        choices=RUNTIME_CHOICES,
+        default='NATIVE',
+        help_text="Inference runtime used for predictions; falls back to native if the model cannot be compiled or exported."  # Help text for runtime
+    )
     parent_endpoint = models.ForeignKey(
         Endpoint,
         on_delete=models.CASCADE,
@@ -72,6 +90,10 @@ class MLAlgorithm(models.Model):
         auto_now=True,
         help_text="Timestamp of the last update to this algorithm record."  # Help text for update timestamp
     )
+    trained_through_claim_id = models.BigIntegerField(
+        null=True, blank=True,  # Unknown for uploaded models
+        help_text="Highest claim ID in this version's training data; incremental retraining starts after it."  # Help text for training watermark
+    )
     # Add an is_active flag for easier version management via API
     is_active = models.BooleanField(default=True, help_text="Is this the currently active/recommended version?")  # Help text for active status
 
@@ -84,6 +106,12 @@ class MLAlgorithm(models.Model):
 
 class MLRequest(models.Model):
     """Logs prediction requests made to an MLAlgorithm."""
+    request_uuid = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+        help_text="Pre-allocated identifier returned to callers before the row is written."  # Help text for request UUID
+    )
     input_data = models.JSONField(
         help_text="The input data sent for prediction."  # Help text for input data
     )
@@ -112,4 +140,137 @@ class MLRequest(models.Model):
     def __str__(self):
         # Check if algorithm still exists (might be None if deleted unexpectedly)
         algo_str = f"{self.algorithm.name} v{self.algorithm.version}" if self.algorithm else "N/A"  # String representation of the request
-        return f"Request for {algo_str} at {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"  # Return formatted string
\ No newline at end of file
+        return f"Request for {algo_str} at {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"  # Return formatted string
+class MLRequestExplanation(models.Model):
+    """Stored SHAP explanation of an MLRequest, so it is computed once rather than on every view."""
+    STATUS_PENDING = 'PENDING'
+    STATUS_READY = 'READY'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),  # Queued for background computation
+        (STATUS_READY, 'Ready'),  # SHAP values are stored
+        (STATUS_FAILED, 'Failed'),  # Background computation failed (see error)
+    ]
+
+    request = models.OneToOneField(
+        MLRequest,
+        on_delete=models.CASCADE,  # Explanations go with the logged request
+        related_name='explanation',  # Allows access from MLRequest: ml_request.explanation
+        help_text="The prediction request this explanation belongs to."  # Help text for request reference
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_READY,
+        help_text="Whether the SHAP values are ready, still being computed in the background, or failed."  # Help text for status
+    )
+    shap_values = models.JSONField(
+        null=True, blank=True,  # Empty until the explanation is ready
+        help_text="Per-feature SHAP values, one list per input row."  # Help text for SHAP values
+    )
+    base_value = models.FloatField(
+        null=True, blank=True,  # Empty until the explanation is ready
+        help_text="Expected model output the SHAP values are relative to."  # Help text for base value
+    )
+    explainer_version = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Explainer class and SHAP version that produced the values (e.g., 'TreeExplainer/shap-0.47.2')."  # Help text for explainer version
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Why the background computation failed, if it did."  # Help text for error message
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the explanation was computed (or queued)."  # Help text for creation timestamp
+    )
+
+    def __str__(self):
+        return f"Explanation for request {self.request_id} ({self.get_status_display()}, {self.explainer_version})"  # String representation of the explanation
+
+
+class RetrainJob(models.Model):
+    """A queued retraining run, executed by the run_retrain_worker process instead of inside a request."""
+    STATUS_QUEUED = 'QUEUED'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_SUCCEEDED = 'SUCCEEDED'
+    STATUS_NO_DATA = 'NO_DATA'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),  # Waiting for a worker
+        (STATUS_RUNNING, 'Running'),  # Claimed by a worker (see phase)
+        (STATUS_SUCCEEDED, 'Succeeded'),  # New algorithm version created
+        (STATUS_NO_DATA, 'No data'),  # Preprocessing produced no rows; nothing was trained
+        (STATUS_FAILED, 'Failed'),  # See error
+    ]
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+    algorithm = models.ForeignKey(
+        MLAlgorithm,
+        on_delete=models.CASCADE,  # Jobs go with the algorithm version they retrain
+        related_name='retrain_jobs',  # Allows access from MLAlgorithm: algorithm.retrain_jobs.all()
+        help_text="The algorithm version to retrain."  # Help text for algorithm reference
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED,
+        db_index=True,  # Workers poll for queued jobs
+        help_text="Lifecycle state of the job."  # Help text for status
+    )
+    options = models.JSONField(
+        default=dict, blank=True,
+        help_text="Retraining options from the request, e.g. {'search': {'strategy': 'random', ...}}."  # Help text for options
+    )
+    phase = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="Retraining phase currently running (preprocess, load, search, fit, save)."  # Help text for phase
+    )
+    phase_timings = models.JSONField(
+        default=dict, blank=True,
+        help_text="Seconds spent in each finished phase."  # Help text for phase timings
+    )
+    result = models.JSONField(
+        null=True, blank=True,  # Set when the job finishes
+        help_text="Summary returned by the retrainer (metrics, new version)."  # Help text for result
+    )
+    new_algorithm = models.ForeignKey(
+        MLAlgorithm,
+        null=True, blank=True,
+        on_delete=models.SET_NULL,  # Keep the job record if the new version is deleted
+        related_name='+',
+        help_text="The algorithm version created by the job."  # Help text for new algorithm reference
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Why the job failed, if it did."  # Help text for error message
+    )
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Worker (host:pid) that claimed the job."  # Help text for worker
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the job was queued."  # Help text for creation timestamp
+    )
+    started_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Timestamp when a worker claimed the job."  # Help text for start timestamp
+    )
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Last sign of life from the worker running the job."  # Stale heartbeat = worker died
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Timestamp when the job finished."  # Help text for finish timestamp
+    )
+
+    class Meta:
+        ordering = ['-created_at']  # Show most recent jobs first
+
+    def __str__(self):
+        return f"Retrain job {self.pk} for algorithm {self.algorithm_id} ({self.get_status_display()})"  # String representation of the job
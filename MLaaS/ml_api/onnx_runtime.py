@@ -0,0 +1,146 @@
+# ml_api/onnx_runtime.py
+"""
+ONNX export of registered models and CPU inference with onnxruntime.
+
+scikit-learn estimators are converted with skl2onnx and XGBoost models with
+onnxmltools. The `.onnx` file is written next to the pickle and only after
+its predictions have been checked against the original model (see
+export_and_verify). ONNX models take float32 input, so the verification
+tolerance is looser than for the compiled tree engine.
+
+All three packages are optional: without them ONNX conversion reports itself
+unavailable and algorithms are served natively. The converters pull in
+scikit-learn and SciPy, so they are only imported when a model is exported;
+serving an existing `.onnx` file needs onnxruntime alone.
+"""
+
+import importlib.util
+import logging
+import os
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import onnxruntime
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    onnxruntime = None
+    HAS_ONNXRUNTIME = False
+
+# Converters are imported on first export (see convert_to_onnx)
+HAS_SKL2ONNX = importlib.util.find_spec('skl2onnx') is not None
+HAS_ONNXMLTOOLS = importlib.util.find_spec('onnxmltools') is not None
+
+logger = logging.getLogger(__name__)
+
+ONNX_SUFFIX = '.onnx'
+ONNX_INPUT_NAME = 'input'
+VERIFY_ROWS = 512  # Synthetic rows used to compare ONNX and original predictions
+VERIFY_RTOL = 1e-4  # float32 inference
+VERIFY_ATOL = 1e-3
+
+
+class OnnxConversionError(Exception):
+    """Raised when a model cannot be converted to ONNX or its ONNX output does not match."""
+    pass
+
+
+class OnnxModel:
+    """onnxruntime CPU session with a predict() compatible with the estimator it replaces."""
+
+    def __init__(self, path: str):
+        if not HAS_ONNXRUNTIME:
+            raise OnnxConversionError("onnxruntime is not installed.")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.n_features_in_ = model_input.shape[1] if isinstance(model_input.shape[1], int) else None
+        self.output_name = self.session.get_outputs()[0].name
+
+    def predict(self, X):
+        """Predicts a (rows, features) matrix; returns a 1-D float64 array."""
+        outputs = self.session.run([self.output_name], {self.input_name: np.asarray(X, dtype=np.float32)})
+        return np.asarray(outputs[0], dtype=np.float64).ravel()
+
+
+def convert_to_onnx(model, n_features: int) -> bytes:
+    """
+    Converts a fitted estimator to a serialized ONNX model.
+
+    Raises:
+        OnnxConversionError: If the converters are missing or do not support the model.
+    """
+    module = type(model).__module__
+    try:
+        if module.startswith('xgboost'):
+            if not HAS_ONNXMLTOOLS:
+                raise OnnxConversionError("onnxmltools is not installed.")
+            from onnxmltools import convert_xgboost
+            from onnxmltools.convert.common.data_types import FloatTensorType
+
+            onnx_model = convert_xgboost(model, initial_types=[(ONNX_INPUT_NAME, FloatTensorType([None, n_features]))])
+        elif module.startswith('sklearn'):
+            if not HAS_SKL2ONNX:
+                raise OnnxConversionError("skl2onnx is not installed.")
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+
+            onnx_model = convert_sklearn(model, initial_types=[(ONNX_INPUT_NAME, FloatTensorType([None, n_features]))])
+        else:
+            raise OnnxConversionError(f"No ONNX converter for {type(model).__name__}.")
+    except OnnxConversionError:
+        raise
+    except Exception as e:
+        raise OnnxConversionError(f"Converting {type(model).__name__} to ONNX failed: {e}")
+    return onnx_model.SerializeToString()
+
+
+def export_and_verify(model, onnx_path: str) -> OnnxModel:
+    """
+    Converts a model to ONNX, checks it against the original's predictions and saves it.
+
+    Args:
+        model: The fitted estimator.
+        onnx_path: Where to write the `.onnx` file.
+
+    Returns:
+        OnnxModel: A session on the verified file.
+    Raises:
+        OnnxConversionError: If conversion fails or outputs differ beyond tolerance.
+    """
+    if not HAS_ONNXRUNTIME:
+        raise OnnxConversionError("onnxruntime is not installed.")
+    n_features = getattr(model, 'n_features_in_', None)
+    if not n_features:
+        raise OnnxConversionError(f"{type(model).__name__} does not expose n_features_in_.")
+    serialized = convert_to_onnx(model, int(n_features))
+
+    tmp_path = f"{onnx_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(serialized)
+    try:
+        onnx_model = OnnxModel(tmp_path)
+        # float32-representable rows, so both paths see identical inputs
+        X = np.random.default_rng(0).normal(size=(VERIFY_ROWS, int(n_features))).astype(np.float32).astype(np.float64)
+        expected = np.asarray(model.predict(X), dtype=np.float64).ravel()
+        actual = onnx_model.predict(X)
+        if actual.shape != expected.shape or not np.allclose(actual, expected, rtol=VERIFY_RTOL, atol=VERIFY_ATOL):
+            worst = float(np.max(np.abs(actual - expected))) if actual.shape == expected.shape else float('nan')
+            raise OnnxConversionError(
+                f"ONNX predictions differ from {type(model).__name__} by up to {worst:.3g}."
+            )
+        os.replace(tmp_path, onnx_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info("Exported %s to ONNX at %s (%d bytes).", type(model).__name__, onnx_path, len(serialized))
+    return onnx_model  # The session holds the model in memory, so the rename does not affect it
+
+
+def onnx_path_for(model_file_abs_path: str) -> str:
+    """Returns the ONNX sidecar path for a model artifact."""
+    return os.path.splitext(model_file_abs_path)[0] + ONNX_SUFFIX
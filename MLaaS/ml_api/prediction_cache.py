@@ -0,0 +1,126 @@
+# ml_api/prediction_cache.py
+"""
+Per-worker cache of prediction results for individual feature rows.
+
+Entries are keyed by the algorithm ID, the artifact version ((mtime_ns, size),
+see ModelCache.artifact_version) and a SHA-1 of the row as canonical float64
+bytes, so a replaced artifact never serves stale results. Entries expire after
+PREDICTION_CACHE_TTL_SECONDS and the least recently used are evicted beyond
+PREDICTION_CACHE_MAX_ENTRIES. Saving or deleting an MLAlgorithm drops its
+entries in the worker that handled the change (see signals.py); other workers
+rely on the artifact version and TTL.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+
+def canonical_rows(input_data) -> np.ndarray:
+    """Returns rows as C-contiguous float64 with -0.0 folded into 0.0, so equal inputs hash equally."""
+    return np.ascontiguousarray(input_data, dtype=np.float64) + 0.0
+
+
+class PredictionCache:
+    """Thread-safe LRU + TTL cache of per-row predictions."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Args:
+            max_entries: Maximum number of cached rows. 0 disables caching.
+            ttl_seconds: Seconds a cached prediction stays valid.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # (algorithm_id, version, row_digest) -> (expires_at, prediction)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def row_keys(algorithm_id: int, artifact_version: tuple, input_data) -> list:
+        """Builds one cache key per row of a 2-D feature matrix."""
+        rows = canonical_rows(input_data)
+        return [
+            (algorithm_id, artifact_version, hashlib.sha1(row.tobytes()).hexdigest())
+            for row in rows
+        ]
+
+    def get_many(self, keys: list) -> list:
+        """
+        Looks up several rows at once.
+
+        Returns:
+            list: The cached prediction for each key, or None where it missed or expired.
+        """
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self._entries.move_to_end(key)  # Mark as most recently used
+                self.hits += 1
+                results.append(entry[1])
+        return results
+
+    def set_many(self, keys: list, predictions):
+        """Stores the prediction for each key, evicting least recently used rows to fit."""
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, prediction in zip(keys, predictions):
+                self._entries[key] = (expires_at, prediction)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, algorithm_id: int):
+        """Drops every cached prediction for an algorithm (retrained, edited or deleted)."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == algorithm_id]:
+                del self._entries[key]
+
+    def clear(self):
+        """Empties the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.expirations = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Returns the cache counters for the metrics endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.PREDICTION_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+# Module-level instance shared by all requests handled by this worker process
+prediction_cache = PredictionCache(
+    max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,177 @@
+# ml_api/request_logger.py
+"""
+Asynchronous, batched writer for MLRequest log rows.
+
+When MLREQUEST_ASYNC_LOGGING is enabled, predict hands its MLRequest to this
+writer instead of running an INSERT on the request path. A background thread
+drains a bounded in-process queue and writes rows with bulk_create once
+MLREQUEST_LOG_BATCH_SIZE rows are waiting or MLREQUEST_LOG_FLUSH_INTERVAL_MS has
+passed. Each row gets a pre-allocated UUID, which is returned to the caller
+as the request_id.
+
+Overflow policy (MLREQUEST_LOG_OVERFLOW) when the queue is full:
+  'sync' - write the row inline on the request thread (no data loss, back-pressure)
+  'drop' - discard the row and count it in the writer stats
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+from .models import MLRequest
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('sync', 'drop')
+_STOP = object()  # Sentinel that tells the writer thread to flush and exit
+
+
+class MLRequestWriter:
+    """Background thread that flushes queued MLRequest rows with bulk_create."""
+
+    def __init__(self, max_queue_size: int, batch_size: int, flush_interval: float, overflow_policy: str):
+        """
+        Args:
+            max_queue_size: Maximum number of rows waiting to be written.
+            batch_size: Flush as soon as this many rows are waiting.
+            flush_interval: Maximum seconds a row may wait before being flushed.
+            overflow_policy: 'sync' or 'drop' (see module docstring).
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown MLRequest log overflow policy: '{overflow_policy}'")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._owner_pid = None  # Threads do not survive fork, so restart per process
+        self.enqueued = 0
+        self.written = 0
+        self.written_inline = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def submit(self, **fields):
+        """
+        Queues an MLRequest for writing and returns its pre-allocated UUID.
+
+        Args:
+            **fields: MLRequest field values (input_data, prediction, algorithm, response_time).
+
+        Returns:
+            uuid.UUID: The request_uuid the row will be stored with.
+        """
+        self._ensure_started()
+        ml_request = MLRequest(request_uuid=uuid.uuid4(), **fields)
+        try:
+            self._queue.put_nowait(ml_request)
+            self.enqueued += 1
+        except queue.Full:
+            if self.overflow_policy == 'sync':
+                ml_request.save()
+                self.written_inline += 1
+            else:
+                self.dropped += 1
+                logger.warning(
+                    "MLRequest log queue full (%d rows); dropped request %s.",
+                    self._queue.maxsize, ml_request.request_uuid
+                )
+        return ml_request.request_uuid
+
+    def _ensure_started(self):
+        """Starts the writer thread lazily in the current process."""
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._owner_pid == os.getpid():
+                return
+            if self._owner_pid is None:
+                atexit.register(self.shutdown)
+            self._owner_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="mlrequest-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Writer loop: collect rows until the batch is full or the interval expires, then flush."""
+        while True:
+            batch = []
+            stop = False
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break  # Interval expired with a partial batch
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch:
+                self._flush(batch)
+            if stop:
+                connection.close()
+                return
+
+    def _flush(self, batch):
+        """Writes one batch; a failed batch is logged and counted, never retried."""
+        try:
+            MLRequest.objects.bulk_create(batch, batch_size=self.batch_size)
+            self.written += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.critical("Failed to write %d MLRequest log rows: %s", len(batch), e, exc_info=True)
+            connection.close()  # Drop a possibly broken connection; the next flush reconnects
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Blocks until every queued row has been written (or failed)."""
+        if self._thread is not None and self._owner_pid == os.getpid():
+            self._queue.join()
+
+    def shutdown(self, timeout: float = 10.0):
+        """Flushes outstanding rows and stops the writer thread (worker exit / atexit)."""
+        if self._thread is None or self._owner_pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("MLRequest writer stopped (pid %d): %s", os.getpid(), self.stats())
+
+    def stats(self) -> dict:
+        """Returns the writer counters for the metrics endpoint."""
+        return {
+            "enabled": settings.MLREQUEST_ASYNC_LOGGING,
+            "queued": self._queue.qsize(),
+            "max_queue_size": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "written_inline": self.written_inline,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "overflow_policy": self.overflow_policy,
+        }
+
+
+# Module-level writer for this worker process; its thread starts on first use
+request_writer = MLRequestWriter(
+    max_queue_size=settings.MLREQUEST_LOG_QUEUE_SIZE,
+    batch_size=settings.MLREQUEST_LOG_BATCH_SIZE,
+    flush_interval=settings.MLREQUEST_LOG_FLUSH_INTERVAL_MS / 1000.0,
+    overflow_policy=settings.MLREQUEST_LOG_OVERFLOW,
+)
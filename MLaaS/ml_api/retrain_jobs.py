@@ -0,0 +1,202 @@
+# ml_api/retrain_jobs.py
+"""
+Retraining as queued jobs instead of inside the HTTP request.
+
+POST /api/algorithms/<id>/retrain/ validates the algorithm, stores a
+RetrainJob and answers 202 with its ID straight away. The run_retrain_worker
+management command (its own process/container) claims queued jobs one at a
+time and runs BaseRetrainer.retrain, recording the running phase and the
+seconds spent in each finished phase as it goes; callers poll
+/api/retrain-jobs/<id>/ for progress and /api/retrain-jobs/<id>/result/ for
+the outcome.
+
+Jobs are claimed with a conditional UPDATE (QUEUED -> RUNNING), so several
+workers can share the queue on any database. An algorithm has at most one
+active (queued or running) job; retrain requests while one is active return
+that job.
+
+While a job runs, its worker refreshes RetrainJob.heartbeat_at every
+RETRAIN_JOB_HEARTBEAT_SECONDS (and on every phase change). A RUNNING job
+without a heartbeat for RETRAIN_JOB_TIMEOUT_SECONDS is failed, so a dead
+worker frees the algorithm within minutes while a long search or fit keeps
+running. A worker that starts also fails the jobs a previous process on the
+same host left RUNNING (e.g. after a container restart).
+"""
+
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MLAlgorithm, RetrainJob
+from .retraining_logic import get_retrainer
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 10  # Queued jobs tried per claim when other workers race for them
+
+
+def worker_name() -> str:
+    """Identifies this worker process in RetrainJob.worker."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def fail_stale_jobs() -> int:
+    """Fails RUNNING jobs without a heartbeat for RETRAIN_JOB_TIMEOUT_SECONDS (their worker died); returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=settings.RETRAIN_JOB_TIMEOUT_SECONDS)
+    stale = RetrainJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=RetrainJob.STATUS_RUNNING,
+    ).update(
+        status=RetrainJob.STATUS_FAILED,
+        error=f"Worker sent no heartbeat for {settings.RETRAIN_JOB_TIMEOUT_SECONDS} seconds.",
+        finished_at=timezone.now(),
+    )
+    if stale:
+        logger.warning("Marked %d stale retrain jobs as failed.", stale)
+    return stale
+
+
+def _process_alive(pid: int) -> bool:
+    """True if a process with this PID exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by someone else
+    return True
+
+
+def fail_orphaned_jobs(worker: str) -> int:
+    """
+    Fails the RUNNING jobs claimed on this host by processes that no longer
+    exist (or whose PID this worker now has); returns the count.
+
+    Args:
+        worker: This worker's name (host:pid, see worker_name()).
+    """
+    host, _, own_pid = worker.rpartition(':')
+    orphaned = []
+    for job_id, job_worker in RetrainJob.objects.filter(
+        status=RetrainJob.STATUS_RUNNING, worker__startswith=f"{host}:"
+    ).values_list('pk', 'worker'):
+        pid = job_worker.rpartition(':')[2]
+        if not pid.isdigit() or pid == own_pid or not _process_alive(int(pid)):
+            orphaned.append(job_id)
+    if not orphaned:
+        return 0
+    count = RetrainJob.objects.filter(pk__in=orphaned, status=RetrainJob.STATUS_RUNNING).update(
+        status=RetrainJob.STATUS_FAILED,
+        error="Worker process exited before finishing the job.",
+        finished_at=timezone.now(),
+    )
+    logger.warning("Marked %d retrain jobs of exited workers on %s as failed.", count, host)
+    return count
+
+
+def enqueue_retrain(algorithm: MLAlgorithm, options: dict = None) -> tuple:
+    """
+    Queues a retraining job for an algorithm, unless one is already queued or running
+    (that job is returned with its own options).
+
+    Returns:
+        tuple: (RetrainJob, created: bool)
+    """
+    fail_stale_jobs()
+    with transaction.atomic():
+        MLAlgorithm.objects.select_for_update().filter(pk=algorithm.pk).first()  # Serialises concurrent requests
+        active = RetrainJob.objects.filter(
+            algorithm=algorithm, status__in=RetrainJob.ACTIVE_STATUSES
+        ).order_by('created_at').first()
+        if active is not None:
+            return active, False
+        job = RetrainJob.objects.create(algorithm=algorithm, options=options or {})
+    logger.info("Queued retrain job %s for Algorithm ID %s.", job.pk, algorithm.pk)
+    return job, True
+
+
+def claim_next_job(worker: str):
+    """Claims the oldest queued job for this worker; returns it, or None if the queue is empty."""
+    candidates = RetrainJob.objects.filter(
+        status=RetrainJob.STATUS_QUEUED
+    ).order_by('created_at').values_list('pk', flat=True)[:CLAIM_CANDIDATES]
+    for job_id in candidates:
+        now = timezone.now()
+        claimed = RetrainJob.objects.filter(pk=job_id, status=RetrainJob.STATUS_QUEUED).update(
+            status=RetrainJob.STATUS_RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+        )
+        if claimed:  # Zero when another worker claimed it first
+            return RetrainJob.objects.select_related('algorithm').get(pk=job_id)
+    return None
+
+
+class Heartbeat:
+    """Refreshes a running job's heartbeat_at from a background thread until stopped."""
+
+    def __init__(self, job_id: int, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"retrain-heartbeat-{job_id}", daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    RetrainJob.objects.filter(pk=self.job_id).update(heartbeat_at=timezone.now())
+                except Exception as e:
+                    logger.warning("Heartbeat for retrain job %s failed: %s", self.job_id, e)
+        finally:
+            connection.close()  # This thread's own connection
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def run_job(job: RetrainJob) -> RetrainJob:
+    """
+    Runs a claimed job to completion and stores its outcome; never raises for
+    retraining failures (they are recorded on the job).
+    """
+    progress = {"timings": {}}
+
+    def on_phase(phase, timings):
+        progress["timings"] = timings
+        RetrainJob.objects.filter(pk=job.pk).update(phase=phase, phase_timings=timings, heartbeat_at=timezone.now())
+
+    logger.info("Running retrain job %s for Algorithm ID %s.", job.pk, job.algorithm_id)
+    try:
+        retrainer = get_retrainer(job.algorithm, search=job.options.get("search"), mode=job.options.get("mode"))
+        with Heartbeat(job.pk, settings.RETRAIN_JOB_HEARTBEAT_SECONDS):
+            new_algorithm, results = retrainer.retrain(on_phase=on_phase)
+    except Exception as e:
+        logger.error("Retrain job %s failed: %s: %s", job.pk, type(e).__name__, e, exc_info=True)
+        job.status = RetrainJob.STATUS_FAILED
+        job.error = f"{type(e).__name__}: {e}"
+        job.phase_timings = progress["timings"]
+    else:
+        job.status = RetrainJob.STATUS_NO_DATA if results.get("status") == "no_data" else RetrainJob.STATUS_SUCCEEDED
+        job.result = results
+        job.new_algorithm = new_algorithm
+        job.phase_timings = {
+            phase: results[f"{phase}_time_seconds"]
+            for phase in ("preprocess", "load", "search", "fit", "save")
+            if f"{phase}_time_seconds" in results
+        } or progress["timings"]
+        logger.info("Retrain job %s finished: %s.", job.pk, job.get_status_display())
+    job.phase = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'result', 'new_algorithm', 'phase', 'phase_timings', 'finished_at'])
+    return job
@@ -6,6 +6,11 @@ import pandas as pd
 import numpy as np
 import warnings
 import joblib
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast
 
 # --- Constants (from notebook) ---
 NOTEBOOK_REMOVE_VALUES_FROM = [
@@ -26,6 +31,36 @@ FINAL_FEATURE_COLUMNS_ORDERED = [
     'specialassetdamage', 'specialfixes', 'specialloanervehicle', 'specialtripcosts', 'specialjourneyexpenses'
 ]
 TARGET_COLUMN = 'settlementvalue'
+# Final feature / target column -> Claim field; injuryprognosis comes from the accident's Injury
+CLAIM_FIELD_COLUMNS = {
+    'generalfixed': 'general_fixed', 'generaluplift': 'general_uplift', 'generalrest': 'general_rest',
+    'specialhealthexpenses': 'special_health_expenses', 'specialtherapy': 'special_therapy',
+    'specialrehabilitation': 'special_rehabilitation', 'specialmedications': 'special_medications',
+    'specialadditionalinjury': 'special_additional_injury', 'specialearningsloss': 'special_earnings_loss',
+    'specialusageloss': 'special_usage_loss', 'specialreduction': 'special_reduction',
+    'specialoverage': 'special_overage', 'specialassetdamage': 'special_asset_damage',
+    'specialfixes': 'special_fixes', 'specialloanervehicle': 'special_loaner_vehicle',
+    'specialtripcosts': 'special_trip_costs', 'specialjourneyexpenses': 'special_journey_expenses',
+    'settlementvalue': 'settlement_value',
+}
+EXTRACT_COLUMNS = FINAL_FEATURE_COLUMNS_ORDERED + [TARGET_COLUMN]  # Column order of the columnar extract
+
+def tariff_bands(prognosis: np.ndarray) -> np.ndarray:
+    """
+    Tariff band (0-7) of each injury prognosis in months; missing values count as 25 months.
+    """
+    months = np.where(np.isnan(prognosis), 25, prognosis)
+    conditions = [
+        (months <= 3),
+        (months >= 4) & (months <= 6),
+        (months >= 7) & (months <= 9),
+        (months >= 10) & (months <= 12),
+        (months >= 13) & (months <= 15),
+        (months >= 16) & (months <= 18),
+        (months >= 19) & (months <= 24),
+        (months >= 25)
+    ]
+    return np.select(conditions, list(range(8)), default=7).astype(int)
 
 def apply_tariff_bands_cw(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -36,19 +71,7 @@ def apply_tariff_bands_cw(df: pd.DataFrame) -> pd.DataFrame:
     if col not in df.columns:
         warnings.warn(f"Column '{col}' not found for tariff banding. Skipping.")
         return df
-    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(25)
-    conditions = [
-        (df[col] <= 3),
-        (df[col] >= 4) & (df[col] <= 6),
-        (df[col] >= 7) & (df[col] <= 9),
-        (df[col] >= 10) & (df[col] <= 12),
-        (df[col] >= 13) & (df[col] <= 15),
-        (df[col] >= 16) & (df[col] <= 18),
-        (df[col] >= 19) & (df[col] <= 24),
-        (df[col] >= 25)
-    ]
-    choices = list(range(8))
-    df[col] = np.select(conditions, choices, default=7).astype(int)
+    df[col] = tariff_bands(pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64))
     return df
 
 def drop_unwanted_columns_cw(df: pd.DataFrame, cols_to_drop: list) -> pd.DataFrame:
@@ -66,8 +89,14 @@ def retrain_preprocessing_from_queryset(claims_queryset) -> tuple:
         from claims.models import Claim  # noqa: F401
     except ImportError:
         raise EnvironmentError("Cannot access 'claims' database models. Preprocessing failed.")
+    return preprocess_claim_objects(claims_queryset)
+
+def preprocess_claim_objects(claims) -> tuple:
+    """
+    Builds one dict per Claim object (walking its related accident records) and preprocesses them into (X, y).
+    """
     data_list = []
-    for claim in claims_queryset:
+    for claim in claims:
         accident = getattr(claim, 'accident', None)
         driver = getattr(accident, 'driver', None) if accident else None
         vehicle = getattr(accident, 'vehicle', None) if accident else None
@@ -131,4 +160,83 @@ def retrain_preprocessing_from_queryset(claims_queryset) -> tuple:
             df[col] = 0
     X = df[FINAL_FEATURE_COLUMNS_ORDERED]
     y = df[TARGET_COLUMN]
-    return X, y
\ No newline at end of file
+    return X, y
+
+def claim_columns_queryset(claims_queryset):
+    """
+    The extract columns of a Claim QuerySet as one SQL query returning plain float tuples.
+
+    Claims with a non-zero NOTEBOOK_REMOVE_VALUES_FROM amount are filtered in SQL, money
+    fields are cast to float by the database (no Decimal objects), and the injury
+    prognosis of the claim's accident is read with a correlated subquery (first Injury
+    by ID), so accidents with several injuries do not duplicate claims.
+    """
+    from claims.models import Injury
+
+    first_injury = Injury.objects.filter(accident=OuterRef('accident')).order_by('pk')
+    return claims_queryset.order_by().filter(
+        settlement_value__isnull=False,
+        **{CLAIM_FIELD_COLUMNS[col]: 0 for col in NOTEBOOK_REMOVE_VALUES_FROM},
+    ).annotate(
+        injuryprognosis=Cast(Subquery(first_injury.values('injury_prognosis')[:1]), FloatField()),
+        **{col: Cast(field, FloatField()) for col, field in CLAIM_FIELD_COLUMNS.items()},
+    ).values_list(*EXTRACT_COLUMNS)
+
+def fill_columns(rows, n_columns: int, expected_rows: int = 0, chunk_size: int = 10000) -> np.ndarray:
+    """
+    Copies an iterable of numeric tuples into a preallocated float64 (n_rows, n_columns) array.
+
+    Rows are consumed chunk_size at a time, so only one chunk of Python tuples is alive
+    at once. The array is sized for expected_rows and doubled if more rows arrive.
+    None becomes NaN.
+    """
+    out = np.empty((max(expected_rows, 0), n_columns), dtype=np.float64)
+    n_rows = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        end = n_rows + len(chunk)
+        if end > out.shape[0]:
+            grown = np.empty((max(end, 2 * out.shape[0]), n_columns), dtype=np.float64)
+            grown[:n_rows] = out[:n_rows]
+            out = grown
+        out[n_rows:end] = chunk
+        n_rows = end
+    return out[:n_rows] if n_rows == out.shape[0] else out[:n_rows].copy()
+
+def preprocess_claim_columns(columns: np.ndarray) -> tuple:
+    """
+    Turns an extract (columns in EXTRACT_COLUMNS order, already filtered) into (X, y).
+    Same features as retrain_preprocessing_from_queryset: banded injury prognosis, NaN -> 0.
+    """
+    if columns.shape[0] == 0:
+        return pd.DataFrame(), pd.Series(dtype='float64')
+    columns = columns[~np.isnan(columns[:, -1])]  # Target present
+    features = columns[:, :-1]
+    prognosis_col = FINAL_FEATURE_COLUMNS_ORDERED.index('injuryprognosis')
+    bands = tariff_bands(features[:, prognosis_col])
+    np.nan_to_num(features, copy=False, nan=0.0)
+    X = pd.DataFrame(features, columns=FINAL_FEATURE_COLUMNS_ORDERED, copy=False)
+    X['injuryprognosis'] = bands
+    y = pd.Series(columns[:, -1], name=TARGET_COLUMN)
+    return X, y
+
+def retrain_preprocessing_columnar(claims_queryset, chunk_size: int = None) -> tuple:
+    """
+    Preprocess a QuerySet of Claim objects for retraining without building model instances.
+    Streams claim_columns_queryset in chunks (a server-side cursor on PostgreSQL) straight
+    into NumPy columns. Returns (X, y) like retrain_preprocessing_from_queryset.
+    """
+    try:
+        from claims.models import Claim  # noqa: F401
+    except ImportError:
+        raise EnvironmentError("Cannot access 'claims' database models. Preprocessing failed.")
+    chunk_size = chunk_size or settings.RETRAIN_EXTRACT_CHUNK_SIZE
+    rows = claim_columns_queryset(claims_queryset)
+    columns = fill_columns(
+        rows.iterator(chunk_size=chunk_size), len(EXTRACT_COLUMNS),
+        expected_rows=rows.count(), chunk_size=chunk_size,
+    )
+    return preprocess_claim_columns(columns)
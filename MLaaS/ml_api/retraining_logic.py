@@ -11,12 +11,14 @@ import pandas as pd
 import numpy as np
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
 from django.core.files.base import ContentFile
 
 # Local imports (ensure these paths are correct for your structure)
 from .models import MLAlgorithm, Endpoint, MLRequest
-from .retrain_preprocessing import retrain_preprocessing_from_queryset # Import the adapted preprocessor
+from .retrain_preprocessing import retrain_preprocessing_columnar # Columnar extract + preprocessing
+from .training_snapshot import load_snapshot, refresh_snapshot
 from .serializers import MLAlgorithmSerializer  # For creating new algorithm instances
 
 # --- Data Fetching Dependency ---
@@ -37,13 +39,25 @@ class RetrainingError(Exception):
 class BaseRetrainer(abc.ABC):
     """Abstract base class for model retraining strategies."""
 
-    def __init__(self, algorithm_instance: MLAlgorithm):
+    MODE_FULL = 'full'  # Refit from scratch on all claims
+    MODE_INCREMENTAL = 'incremental'  # Continue the existing model on claims added since it was trained
+    MODES = (MODE_FULL, MODE_INCREMENTAL)
+
+    # Candidate values per hyperparameter for search mode; the loaded model's own value is always added
+    SEARCH_SPACE = {}
+
+    def __init__(self, algorithm_instance: MLAlgorithm, search: dict = None, mode: str = MODE_FULL):
         """
         Initializes the retrainer with the algorithm instance to be updated.
 
         Args:
             algorithm_instance: The MLAlgorithm object representing the model
                                 version to be retrained.
+            search: Optional hyperparameter search before the final fit:
+                    {"strategy": "grid" | "random", "n_iter": int, "cv": int, "n_jobs": int}
+                    (all but strategy optional). None refits with the loaded hyperparameters.
+            mode: MODE_FULL, or MODE_INCREMENTAL to update the model with the claims added
+                  since it was trained (falls back to a full refit if that is unknown).
         Raises:
             TypeError: If algorithm_instance is not an MLAlgorithm object.
             ValueError: If the algorithm instance lacks a valid model file path.
@@ -54,6 +68,16 @@ class BaseRetrainer(abc.ABC):
             raise TypeError("algorithm_instance must be an MLAlgorithm object.")
         self.algorithm = algorithm_instance
         self.original_model_path = None
+        self.snapshot_summary = None  # Set when the training data came from the incremental snapshot
+        self.search = search
+        self.search_summary = None  # Candidate table of the last hyperparameter search
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown retraining mode '{mode}'; expected one of {', '.join(self.MODES)}.")
+        if search and mode == self.MODE_INCREMENTAL:
+            raise ValueError("Hyperparameter search requires a full refit.")
+        self.mode = mode
+        self.mode_note = None  # Why the requested mode was not used, if it was not
+        self.training_watermark = None  # Highest claim ID covered by the training data
 
         # Validate model file path and existence
         if self.algorithm.model_file and hasattr(self.algorithm.model_file, 'path'):
@@ -67,8 +91,10 @@ class BaseRetrainer(abc.ABC):
 
     def _get_combined_data_for_retraining(self):
         """
-        Fetches ALL relevant data from the 'claims' DB using the ORM
-        and preprocesses it using the dedicated preprocessing module.
+        Fetches ALL relevant data from the 'claims' DB with one columnar query
+        and preprocesses it using the dedicated preprocessing module. With
+        TRAINING_SNAPSHOT_ENABLED only claims added since the last retrain are
+        preprocessed and appended to the snapshot, which is then memory-mapped.
 
         Returns:
             tuple: (pd.DataFrame: Processed features X, pd.Series: Processed target y)
@@ -83,16 +109,23 @@ class BaseRetrainer(abc.ABC):
         # Fetch ALL data deemed relevant for training the model from scratch
     
         try:
-            claims_queryset = Claim.objects.select_related(
-                'accident', 'accident__driver', 'accident__vehicle', 'accident__injury'
-            ).all() # Modify this query as needed
-            print(f"Retrieved {claims_queryset.count()} potential claim records from DB.")
+            claims_queryset = Claim.objects.all() # Modify this query as needed
         except Exception as e:
              raise RetrainingError(f"Database error during data fetching: {e}")
 
-        # Delegate preprocessing
+        # Delegate extraction and preprocessing (values_list streamed into NumPy columns)
         try:
-            X_processed, y_processed = retrain_preprocessing_from_queryset(claims_queryset)
+            if settings.TRAINING_SNAPSHOT_ENABLED:
+                self.snapshot_summary = refresh_snapshot(claims_queryset)
+                print(f"Training snapshot: {self.snapshot_summary}")
+                X_processed, y_processed = load_snapshot()
+                self.training_watermark = self.snapshot_summary["watermark"]
+            else:
+                self.training_watermark = claims_queryset.aggregate(max_id=Max('pk'))['max_id'] or 0
+                X_processed, y_processed = retrain_preprocessing_columnar(
+                    claims_queryset.filter(pk__lte=self.training_watermark)
+                )
+            print(f"Extracted {X_processed.shape[0]} claim records for training.")
         except Exception as e:
             print(f"Error during preprocessing: {e}")
             traceback.print_exc()
@@ -105,6 +138,46 @@ class BaseRetrainer(abc.ABC):
 
         return X_processed, y_processed
 
+    def _get_new_data_for_retraining(self, since_claim_id: int):
+        """
+        Fetches and preprocesses only the claims added after since_claim_id (incremental mode).
+        A claim that commits after a retrain with an ID below that retrain's watermark is
+        not picked up (see training_snapshot); the next full refit includes it.
+
+        Returns:
+            tuple: (pd.DataFrame: Processed features X, pd.Series: Processed target y), possibly empty
+        Raises:
+            EnvironmentError: If 'claims' DB models cannot be accessed.
+            RetrainingError: If fetching or preprocessing fails.
+        """
+        if not CAN_ACCESS_CLAIMS_DB:
+            raise EnvironmentError("Cannot access 'claims' database models. Retraining aborted.")
+
+        print(f"Fetching claims added after claim ID {since_claim_id} for incremental retraining...")
+        try:
+            new_claims = Claim.objects.filter(pk__gt=since_claim_id)
+            self.training_watermark = new_claims.aggregate(max_id=Max('pk'))['max_id'] or since_claim_id
+            X_processed, y_processed = retrain_preprocessing_columnar(
+                new_claims.filter(pk__lte=self.training_watermark)
+            )
+        except Exception as e:
+            print(f"Error during preprocessing: {e}")
+            traceback.print_exc()
+            raise RetrainingError(f"Data preprocessing failed: {e}")
+        print(f"Extracted {X_processed.shape[0]} new claim records.")
+        return X_processed, y_processed
+
+    def _get_training_data(self):
+        """Training data for the retraining mode: new claims only (incremental) or all claims (full)."""
+        if self.mode == self.MODE_INCREMENTAL:
+            since_claim_id = self.algorithm.trained_through_claim_id
+            if since_claim_id is not None:
+                return self._get_new_data_for_retraining(since_claim_id)
+            self.mode = self.MODE_FULL
+            self.mode_note = "No record of the claims this version was trained on; refitting on all claims."
+            print(self.mode_note)
+        return self._get_combined_data_for_retraining()
+
     def _generate_new_version_string(self):
         """Generates an incremented version string (e.g., 1.0.0 -> 1.0.1)."""
         current_version = self.algorithm.version
@@ -170,8 +243,10 @@ class BaseRetrainer(abc.ABC):
                     version=new_version_str,
                     code=self.algorithm.code, # Copy code/metadata if any
                     model_type=self.algorithm.model_type, # Critical: copy type
+                    runtime=self.algorithm.runtime, # Keep the serving runtime; signals compile the new artifact
                     parent_endpoint=self.algorithm.parent_endpoint,
-                    model_file=new_model_db_path # Assign the relative file path
+                    model_file=new_model_db_path, # Assign the relative file path
+                    trained_through_claim_id=self.training_watermark, # Where the next incremental retrain starts
                     # Set is_active=True if using that flag
                 )
                 
@@ -209,13 +284,116 @@ class BaseRetrainer(abc.ABC):
         """
         pass
 
-    def retrain(self):
+    def _fit_incremental(self, model, X_new, y_new):
+        """
+        Updates the fitted model with the new claims only (incremental mode).
+        Subclasses that support warm starts override this.
+
+        Raises:
+            RetrainingError: If the model cannot be updated incrementally.
+        """
+        raise RetrainingError(f"Incremental retraining is not supported for {type(self).__name__}.")
+
+    def _search_space(self, model) -> dict:
+        """SEARCH_SPACE restricted to the model's parameters, each including the model's current value."""
+        params = model.get_params()
+        space = {}
+        for name, candidates in self.SEARCH_SPACE.items():
+            if name not in params:
+                continue
+            current = params[name].item() if hasattr(params[name], 'item') else params[name]
+            space[name] = candidates if current in candidates else [current] + list(candidates)
+        return space
+
+    def _search_hyperparameters(self, model, X_combined, y_combined):
+        """
+        Cross-validated grid or random search over the search space, starting from the
+        loaded model's hyperparameters. Candidate fits run in parallel on a process pool
+        of at most RETRAIN_SEARCH_MAX_JOBS workers, each fitting single-threaded so the
+        search stays within that CPU budget.
+
+        Returns:
+            dict: Best parameters found; the per-candidate table is kept in self.search_summary.
+        Raises:
+            RetrainingError: If the model has no searchable parameters or the search fails.
+        """
+        from sklearn.base import clone
+        from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
+
+        space = self._search_space(model)
+        if not space:
+            raise RetrainingError(f"No hyperparameter search space for {type(model).__name__}.")
+        strategy = self.search.get("strategy", "random")
+        n_jobs = min(self.search.get("n_jobs") or settings.RETRAIN_SEARCH_MAX_JOBS, settings.RETRAIN_SEARCH_MAX_JOBS)
+        cv = self.search.get("cv") or settings.RETRAIN_SEARCH_CV_FOLDS
+        estimator = clone(model)
+        if 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=1)  # Parallelism comes from the search's process pool
+        if estimator.get_params().get('early_stopping_rounds') is not None:
+            estimator.set_params(early_stopping_rounds=None)  # CV fits get no validation set
+        if strategy == "grid":
+            searcher = GridSearchCV(
+                estimator, space, cv=cv, scoring=settings.RETRAIN_SEARCH_SCORING, n_jobs=n_jobs, refit=False,
+            )
+        else:
+            n_candidates = int(np.prod([len(values) for values in space.values()]))
+            searcher = RandomizedSearchCV(
+                estimator, space, n_iter=min(self.search.get("n_iter") or settings.RETRAIN_SEARCH_N_ITER, n_candidates),
+                cv=cv, scoring=settings.RETRAIN_SEARCH_SCORING, n_jobs=n_jobs, refit=False, random_state=0,
+            )
+
+        print(f"Running {strategy} hyperparameter search ({cv}-fold CV, {n_jobs} parallel fits)...")
+        search_start_time = time.time()
+        try:
+            searcher.fit(X_combined, y_combined)
+        except Exception as e:
+            print(f"Error during hyperparameter search: {e}")
+            traceback.print_exc()
+            raise RetrainingError(f"Hyperparameter search failed: {e}")
+
+        results = searcher.cv_results_
+        candidates = sorted(
+            (
+                {
+                    "params": results["params"][i],
+                    "mean_score": round(float(results["mean_test_score"][i]), 6),
+                    "std_score": round(float(results["std_test_score"][i]), 6),
+                    "mean_fit_seconds": round(float(results["mean_fit_time"][i]), 4),
+                    "rank": int(results["rank_test_score"][i]),
+                }
+                for i in range(len(results["params"]))
+            ),
+            key=lambda candidate: candidate["rank"],
+        )
+        self.search_summary = {
+            "strategy": strategy,
+            "scoring": settings.RETRAIN_SEARCH_SCORING,
+            "cv_folds": cv,
+            "n_jobs": n_jobs,
+            "candidates_evaluated": len(candidates),
+            "best_params": searcher.best_params_,
+            "best_score": round(float(searcher.best_score_), 6),
+            "search_seconds": round(time.time() - search_start_time, 4),
+            "candidates": candidates,
+        }
+        print(f"Best hyperparameters: {searcher.best_params_} (score {searcher.best_score_:.4f})")
+        return searcher.best_params_
+
+    def retrain(self, on_phase=None):
         """
         Orchestrates the full retraining process:
-        1. Fetch and preprocess the combined dataset.
+        1. Fetch and preprocess the combined dataset (incremental mode: only the
+           claims added since the algorithm was trained).
         2. Load the existing model architecture/hyperparameters.
-        3. Fit the model from scratch on the combined data.
-        4. Save the new model version and create its DB record.
+        3. In search mode, pick the best hyperparameters by cross-validation.
+        4. Fit the model from scratch on the combined data (incremental mode:
+           continue the loaded model on the new claims).
+        5. Save the new model version and create its DB record.
+
+        Args:
+            on_phase: Optional callback on_phase(phase, timings), called as each phase
+                      ('preprocess', 'load', 'search', 'fit', 'save') starts with the seconds
+                      spent in the phases finished so far (used for job progress).
 
         Returns:
             tuple: (MLAlgorithm: new_algorithm_instance, dict: results_summary)
@@ -229,20 +407,38 @@ class BaseRetrainer(abc.ABC):
         print(f"--- Starting Retraining Workflow ---")
         print(f"Algorithm ID: {self.algorithm.id}, Type: {self.algorithm.get_model_type_display()}, Version: {self.algorithm.version}")
 
+        phase_timings = {}
+        def start_phase(phase):
+            if on_phase is not None:
+                on_phase(phase, dict(phase_timings))
+
         # Get & Preprocess Combined Data 
+        start_phase("preprocess")
         data_start_time = time.time()
-        X_combined, y_combined = self._get_combined_data_for_retraining()
+        X_combined, y_combined = self._get_training_data()
         preprocess_time = time.time() - data_start_time
+        phase_timings["preprocess"] = round(preprocess_time, 4)
         if X_combined.empty:
             # Handle case where preprocessing yields no data (already logged inside)
              results = {"message": "Preprocessing resulted in no valid data points. Retraining aborted.", "status": "no_data"}
              return None, results # Return None for algorithm, indicate status
+        if self.mode == self.MODE_INCREMENTAL and X_combined.shape[0] < settings.RETRAIN_INCREMENTAL_MIN_ROWS:
+            results = {
+                "message": (
+                    f"Only {X_combined.shape[0]} new claims since claim ID {self.algorithm.trained_through_claim_id} "
+                    f"(RETRAIN_INCREMENTAL_MIN_ROWS is {settings.RETRAIN_INCREMENTAL_MIN_ROWS}). Retraining skipped."
+                ),
+                "status": "no_data",
+                "mode": self.mode,
+            }
+            return None, results
 
         print(f"Data fetching & preprocessing completed in {preprocess_time:.4f}s")
         print(f"Combined dataset shape: X={X_combined.shape}, y={y_combined.shape}")
 
 
         #  Load Existing Model Structure/Hyperparams 
+        start_phase("load")
         load_start_time = time.time()
         try:
             # Path existence already checked in __init__
@@ -253,14 +449,28 @@ class BaseRetrainer(abc.ABC):
             traceback.print_exc()
             raise RetrainingError(f"Failed to load original model: {e}")
         load_time = time.time() - load_start_time
+        phase_timings["load"] = round(load_time, 4)
+
+        # Hyperparameter Search (optional): the final fit below uses the best configuration
+        if self.search:
+            start_phase("search")
+            best_params = self._search_hyperparameters(model, X_combined, y_combined)
+            model.set_params(**best_params)
+            phase_timings["search"] = self.search_summary["search_seconds"]
 
         # Fit Model From Scratch (using subclass logic) 
+        start_phase("fit")
         fit_start_time = time.time()
-        fitted_model = self._fit_model(model, X_combined, y_combined)
+        if self.mode == self.MODE_INCREMENTAL:
+            fitted_model = self._fit_incremental(model, X_combined, y_combined)
+        else:
+            fitted_model = self._fit_model(model, X_combined, y_combined)
         fit_time = time.time() - fit_start_time
+        phase_timings["fit"] = round(fit_time, 4)
         print(f"Model fitting completed in {fit_time:.4f} seconds.")
 
         # Save New Version (File & DB) 
+        start_phase("save")
         save_start_time = time.time()
         new_version_str = self._generate_new_version_string()
         new_algorithm_instance = self._save_new_version(fitted_model, new_version_str)
@@ -276,6 +486,8 @@ class BaseRetrainer(abc.ABC):
             "status": "success",
             "new_algorithm_id": new_algorithm_instance.id,
             "new_version": new_algorithm_instance.version,
+            "mode": self.mode,
+            "trained_through_claim_id": self.training_watermark,
             "data_points_used": X_combined.shape[0],
             "features_count": X_combined.shape[1],
             "preprocess_time_seconds": round(preprocess_time, 4),
@@ -284,11 +496,25 @@ class BaseRetrainer(abc.ABC):
             "save_time_seconds": round(save_time, 4),
             "total_time_seconds": round(total_time, 4),
         }
+        if self.mode_note:
+            results["mode_note"] = self.mode_note
+        if self.search_summary is not None:
+            results["search_time_seconds"] = self.search_summary["search_seconds"]
+            results["hyperparameter_search"] = self.search_summary
+        if self.snapshot_summary is not None:
+            results["training_snapshot"] = self.snapshot_summary
         return new_algorithm_instance, results
 
 
 class RandomForestRetrainer(BaseRetrainer):
     """Retraining logic specific to RandomForest models."""
+    SEARCH_SPACE = {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [None, 10, 20],
+        'min_samples_leaf': [1, 2, 5],
+        'max_features': [1.0, 'sqrt', 0.5],
+    }
+
     def _fit_model(self, model, X_combined, y_combined):
         """Fits the RandomForest model from scratch on the combined data."""
         print("Fitting RandomForest model...")
@@ -302,30 +528,102 @@ class RandomForestRetrainer(BaseRetrainer):
             traceback.print_exc()
             raise RetrainingError(f"RandomForest fitting failed: {e}")
 
+    def _fit_incremental(self, model, X_new, y_new):
+        """
+        Adds RETRAIN_RF_WARM_START_TREES trees fitted on the new claims (warm_start);
+        the existing trees are kept unchanged. Beyond RETRAIN_RF_MAX_TREES the
+        oldest trees are dropped, so the forest, its artifacts and prediction
+        latency stay bounded; a full refit rebuilds it from all claims.
+        """
+        if not hasattr(model, 'estimators_'):
+            raise RetrainingError("The RandomForest model is not fitted; run a full retrain.")
+        n_trees = len(model.estimators_) + settings.RETRAIN_RF_WARM_START_TREES
+        print(f"Adding {settings.RETRAIN_RF_WARM_START_TREES} RandomForest trees on {len(X_new)} new rows...")
+        try:
+            model.set_params(warm_start=True, n_estimators=n_trees)
+            model.fit(X_new, y_new)
+            model.set_params(warm_start=False)  # A later full refit starts from scratch
+        except Exception as e:
+            print(f"Error during RandomForest warm start: {e}")
+            traceback.print_exc()
+            raise RetrainingError(f"RandomForest warm start failed: {e}")
+
+        max_trees = settings.RETRAIN_RF_MAX_TREES
+        if max_trees and len(model.estimators_) > max_trees:
+            print(f"Dropping the {len(model.estimators_) - max_trees} oldest trees (RETRAIN_RF_MAX_TREES={max_trees}).")
+            model.estimators_ = model.estimators_[-max_trees:]  # warm_start appends, so the oldest come first
+            model.set_params(n_estimators=max_trees)
+        return model
+
 
 class XGBoostRetrainer(BaseRetrainer):
     """Retraining logic specific to XGBoost models."""
+    SEARCH_SPACE = {
+        'n_estimators': [100, 300, 600],
+        'max_depth': [3, 6, 9],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'subsample': [0.8, 1.0],
+        'colsample_bytree': [0.8, 1.0],
+    }
+
+    @staticmethod
+    def _without_early_stopping(model):
+        """
+        Clears early_stopping_rounds for a fit without a validation set (XGBoost
+        refuses to fit otherwise). Returns the value to restore afterwards.
+        """
+        early_stopping_rounds = model.get_params().get('early_stopping_rounds')
+        if early_stopping_rounds is not None:
+            print(f"Fitting without early stopping (model has early_stopping_rounds={early_stopping_rounds}).")
+            model.set_params(early_stopping_rounds=None)
+        return early_stopping_rounds
+
     def _fit_model(self, model, X_combined, y_combined):
         """Fits the XGBoost model from scratch on the combined data."""
         print("Fitting XGBoost model...")
         try:
             # model.fit() for XGBoost also typically retrains from scratch
             # using the hyperparameters stored in the loaded model object.
+            early_stopping_rounds = self._without_early_stopping(model)
             model.fit(X_combined, y_combined)
+            model.set_params(early_stopping_rounds=early_stopping_rounds)
             return model
         except Exception as e:
             print(f"Error during XGBoost fitting: {e}")
             traceback.print_exc()
             raise RetrainingError(f"XGBoost fitting failed: {e}")
 
+    def _fit_incremental(self, model, X_new, y_new):
+        """
+        Continues boosting from the existing booster (xgb_model=) for
+        RETRAIN_XGB_INCREMENTAL_ROUNDS rounds on the new claims. An early-stopped
+        model loses its best_iteration, so it predicts with every round, new ones included.
+        """
+        print(f"Adding {settings.RETRAIN_XGB_INCREMENTAL_ROUNDS} boosting rounds on {len(X_new)} new rows...")
+        try:
+            n_estimators = model.get_params()['n_estimators']
+            early_stopping_rounds = self._without_early_stopping(model)
+            model.set_params(n_estimators=settings.RETRAIN_XGB_INCREMENTAL_ROUNDS)  # Rounds added by this fit
+            model.fit(X_new, y_new, xgb_model=model.get_booster())
+            model.get_booster().set_attr(best_iteration=None, best_score=None)  # Else predict stops at the old best
+            model.set_params(n_estimators=n_estimators, early_stopping_rounds=early_stopping_rounds)
+            return model
+        except Exception as e:
+            print(f"Error during incremental XGBoost fitting: {e}")
+            traceback.print_exc()
+            raise RetrainingError(f"Incremental XGBoost fitting failed: {e}")
+
 
-def get_retrainer(algorithm_instance: MLAlgorithm):
+def get_retrainer(algorithm_instance: MLAlgorithm, search: dict = None, mode: str = None):
     """
     Factory function to return the appropriate retrainer class instance
     based on the algorithm's model_type.
 
     Args:
         algorithm_instance: The MLAlgorithm instance to retrain.
+        search: Optional hyperparameter search options (see BaseRetrainer).
+        mode: 'full' or 'incremental'. Defaults to incremental for the model types in
+              RETRAIN_INCREMENTAL_MODEL_TYPES, full otherwise; a search always refits fully.
 
     Returns:
         An instance of a BaseRetrainer subclass.
@@ -337,11 +635,14 @@ def get_retrainer(algorithm_instance: MLAlgorithm):
     """
     # Initial checks are now handled in BaseRetrainer.__init__
     model_type = algorithm_instance.model_type
+    if mode is None:
+        incremental = model_type in settings.RETRAIN_INCREMENTAL_MODEL_TYPES and not search
+        mode = BaseRetrainer.MODE_INCREMENTAL if incremental else BaseRetrainer.MODE_FULL
 
     if model_type == 'RANDOM_FOREST':
-        return RandomForestRetrainer(algorithm_instance)
+        return RandomForestRetrainer(algorithm_instance, search=search, mode=mode)
     elif model_type == 'XGBOOST':
-        return XGBoostRetrainer(algorithm_instance)
+        return XGBoostRetrainer(algorithm_instance, search=search, mode=mode)
     # Add 'elif' blocks for other supported model types if needed in the future
     else:
         raise NotImplementedError(f"Retraining is not implemented for model type: '{model_type}'")
\ No newline at end of file
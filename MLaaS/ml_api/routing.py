@@ -0,0 +1,119 @@
+# ml_api/routing.py
+"""
+In-process routing table from Endpoint (id or name) to its active MLAlgorithm.
+
+An endpoint routes to the active algorithm named by its primary_algorithm_name
+(engineer_set_active_model sets it), so saving some other active algorithm on
+the same endpoint never moves traffic. Without a primary name the endpoint is
+only routed when all of its active algorithms share one name; if several
+versions of the routed name are active, the most recently registered wins.
+
+The table is rebuilt in a single query only when the routing version changes.
+The version is bumped (see signals.py) whenever an MLAlgorithm or Endpoint is
+saved or deleted, which includes engineer_set_active_model. It is stored as a
+small file under MEDIA_ROOT so every worker in the container notices a swap on
+its next request at the cost of one os.stat() instead of a database query.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+from .models import MLAlgorithm
+
+logger = logging.getLogger(__name__)
+
+
+def bump_routing_version():
+    """Marks every worker's routing table as stale (atomic replace of the version file)."""
+    routing_table.local_version += 1
+    version_file = settings.MODEL_ROUTING_VERSION_FILE
+    try:
+        os.makedirs(os.path.dirname(version_file), exist_ok=True)
+        tmp_path = f"{version_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(routing_table.local_version))
+        os.replace(tmp_path, version_file)  # New inode, so other workers always see a change
+    except OSError as e:
+        logger.warning("Could not update routing version file %s: %s", version_file, e)
+
+
+class RoutingTable:
+    """Caches the active MLAlgorithm for each endpoint, keyed by endpoint id and name."""
+
+    def __init__(self):
+        self._routes = {}  # str(endpoint id) or endpoint name -> MLAlgorithm (with parent_endpoint)
+        self._token = None  # Version token the routes were built for
+        self._lock = threading.Lock()
+        self.local_version = 0  # Bumped in-process so this worker never waits on file timestamps
+        self.rebuilds = 0
+
+    def _current_token(self):
+        """Combines the in-process version with the shared version file's identity."""
+        try:
+            stat_result = os.stat(settings.MODEL_ROUTING_VERSION_FILE)
+            file_token = (stat_result.st_ino, stat_result.st_mtime_ns)
+        except OSError:
+            file_token = None
+        return self.local_version, file_token
+
+    def _rebuild(self):
+        """
+        Loads every active algorithm in one query and picks each endpoint's
+        route: the newest active algorithm named by primary_algorithm_name, or,
+        without a primary name, the newest active algorithm if they all share
+        one name. Endpoints with no match get no route.
+        """
+        by_endpoint = {}
+        active = MLAlgorithm.objects.filter(is_active=True).select_related("parent_endpoint").order_by(
+            "parent_endpoint_id", "-id"
+        )
+        for algorithm in active:
+            by_endpoint.setdefault(algorithm.parent_endpoint_id, []).append(algorithm)
+
+        routes = {}
+        for candidates in by_endpoint.values():
+            endpoint = candidates[0].parent_endpoint
+            if endpoint.primary_algorithm_name:
+                candidates = [a for a in candidates if a.name == endpoint.primary_algorithm_name]
+                if not candidates:
+                    logger.warning("Endpoint '%s' has no active '%s' algorithm; it is not routed.",
+                                   endpoint.name, endpoint.primary_algorithm_name)
+                    continue
+            elif len({a.name for a in candidates}) > 1:
+                logger.warning("Endpoint '%s' has several active algorithm names and no primary_algorithm_name; "
+                               "it is not routed.", endpoint.name)
+                continue
+            routes[str(endpoint.id)] = candidates[0]
+            routes[endpoint.name] = candidates[0]
+        self._routes = routes
+        self.rebuilds += 1
+        logger.info("Routing table rebuilt with %d endpoint route(s) (pid %d).", len(routes) // 2, os.getpid())
+
+    def resolve(self, endpoint_ref: str):
+        """
+        Returns the active MLAlgorithm for an endpoint id or name, or None.
+
+        Args:
+            endpoint_ref: Endpoint primary key or exact endpoint name.
+        """
+        token = self._current_token()
+        if token != self._token:
+            with self._lock:
+                if token != self._token:
+                    self._rebuild()
+                    self._token = token
+        return self._routes.get(str(endpoint_ref))
+
+    def stats(self) -> dict:
+        """Returns the current routes for the metrics endpoint."""
+        return {
+            "rebuilds": self.rebuilds,
+            "routes": {ref: algorithm.id for ref, algorithm in self._routes.items()},
+        }
+
+
+# Module-level table for this worker process
+routing_table = RoutingTable()
@@ -0,0 +1,139 @@
+# ml_api/runtimes.py
+"""
+Selection of the inference runtime for an MLAlgorithm.
+
+  NATIVE      - the unpickled estimator (default)
+  TREE_ENGINE - the compiled flat-array ensemble from tree_engine.py for
+                batches up to TREE_ENGINE_MAX_BATCH_ROWS rows; larger batches
+                use the native estimator, which is faster there
+  ONNX        - the ONNX export from onnx_runtime.py, run by onnxruntime on CPU
+
+A runtime's artifacts are prepared when the algorithm is saved (see
+signals.py); the ONNX export is also attempted for every newly registered
+algorithm when ONNX_EXPORT_ON_REGISTER is set, so switching to it later is
+instant. If preparation or verification fails, the algorithm keeps its
+runtime setting but is served natively, and the failure is logged.
+"""
+
+import logging
+import os
+
+from django.conf import settings
+
+from .model_cache import load_model_artifact, model_cache
+from .onnx_runtime import OnnxConversionError, OnnxModel, export_and_verify, onnx_path_for
+from .tree_engine import CompiledTreeEnsemble, TreeCompilationError, compile_and_verify, compiled_path_for
+from .warmup import get_model_file_abs_path
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_NATIVE = 'NATIVE'
+RUNTIME_TREE_ENGINE = 'TREE_ENGINE'
+RUNTIME_ONNX = 'ONNX'
+
+# runtime -> (sidecar path for a model artifact, build-and-verify function, expected build failure)
+RUNTIME_BUILDERS = {
+    RUNTIME_TREE_ENGINE: (compiled_path_for, compile_and_verify, TreeCompilationError),
+    RUNTIME_ONNX: (onnx_path_for, export_and_verify, OnnxConversionError),
+}
+
+
+class TreeEngineRuntime:
+    """Predicts small batches with the compiled ensemble and large ones with the native estimator."""
+
+    def __init__(self, algorithm_id: int, compiled: CompiledTreeEnsemble, model_file_abs_path: str, max_rows: int):
+        self.algorithm_id = algorithm_id
+        self.compiled = compiled
+        self.model_file_abs_path = model_file_abs_path
+        self.max_rows = max_rows
+        self.n_features_in_ = compiled.n_features_in_
+
+    def predict(self, X):
+        if X.shape[0] <= self.max_rows:
+            return self.compiled.predict(X)
+        native, _, _ = model_cache.get(self.algorithm_id, self.model_file_abs_path)  # Loaded on first large batch
+        return native.predict(X)
+
+
+def get_runtime_model(algorithm, model_file_abs_path: str):
+    """
+    Returns the model object to predict with for an algorithm, via the per-worker model cache.
+
+    Returns:
+        tuple: (model, cache_hit: bool, load_seconds: float), as ModelCache.get
+    Raises:
+        FileNotFoundError: If the native artifact does not exist.
+    """
+    runtime = getattr(algorithm, 'runtime', RUNTIME_NATIVE)
+    if runtime == RUNTIME_TREE_ENGINE:
+        compiled_path = compiled_path_for(model_file_abs_path)
+        if os.path.exists(compiled_path):
+            return model_cache.get(
+                algorithm.id, compiled_path,
+                loader=lambda path: TreeEngineRuntime(
+                    algorithm.id, CompiledTreeEnsemble.load(path), model_file_abs_path,
+                    settings.TREE_ENGINE_MAX_BATCH_ROWS,
+                ),
+            )
+    elif runtime == RUNTIME_ONNX:
+        onnx_path = onnx_path_for(model_file_abs_path)
+        if os.path.exists(onnx_path):
+            try:
+                return model_cache.get(algorithm.id, onnx_path, loader=OnnxModel)
+            except OnnxConversionError as e:  # onnxruntime missing in this environment
+                logger.warning("Cannot load ONNX model for Algorithm ID %s: %s", algorithm.id, e)
+    if runtime != RUNTIME_NATIVE:
+        logger.debug("No %s artifact for Algorithm ID %s; serving natively.", runtime, algorithm.id)
+    return model_cache.get(algorithm.id, model_file_abs_path)
+
+
+def prepare_runtime(algorithm, runtime: str = None) -> bool:
+    """
+    Builds and verifies the artifacts a runtime needs, if they are missing or stale.
+
+    Args:
+        algorithm: The MLAlgorithm whose artifact is converted.
+        runtime: Runtime to prepare; defaults to the algorithm's selected runtime.
+
+    Returns:
+        bool: True if the runtime is usable, False if predictions would fall back to NATIVE.
+    """
+    runtime = runtime or getattr(algorithm, 'runtime', RUNTIME_NATIVE)
+    if runtime not in RUNTIME_BUILDERS:
+        return True
+    sidecar_path_for, build, build_error = RUNTIME_BUILDERS[runtime]
+    model_file_abs_path = get_model_file_abs_path(algorithm)
+    if not model_file_abs_path or not os.path.exists(model_file_abs_path):
+        logger.warning("Cannot prepare %s runtime for Algorithm ID %s: model file missing.", runtime, algorithm.id)
+        return False
+
+    sidecar_path = sidecar_path_for(model_file_abs_path)
+    if os.path.exists(sidecar_path) and os.path.getmtime(sidecar_path) >= os.path.getmtime(model_file_abs_path):
+        return True
+    try:
+        build(load_model_artifact(model_file_abs_path), sidecar_path)
+        return True
+    except build_error as e:
+        logger.warning(
+            "%s runtime unavailable for Algorithm ID %s, falling back to native predict: %s",
+            runtime, algorithm.id, e
+        )
+    except Exception as e:
+        logger.error("Error preparing %s runtime for Algorithm ID %s: %s", runtime, algorithm.id, e, exc_info=True)
+    if os.path.exists(sidecar_path):
+        try:
+            os.remove(sidecar_path)  # Never leave a stale artifact behind
+        except OSError as e:  # Runs inside post_save: must not fail the model save
+            logger.warning("Could not delete runtime artifact %s: %s", sidecar_path, e)
+    return False
+
+
+def remove_runtime_artifacts(model_file_abs_path: str):
+    """Deletes derived runtime files (compiled ensemble, ONNX export) that sit next to a model artifact."""
+    for sidecar_path_for, _, _ in RUNTIME_BUILDERS.values():
+        sidecar_path = sidecar_path_for(model_file_abs_path)
+        if os.path.exists(sidecar_path):
+            try:
+                os.remove(sidecar_path)
+            except OSError as e:
+                logger.warning("Could not delete runtime artifact %s: %s", sidecar_path, e)
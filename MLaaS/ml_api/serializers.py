@@ -1,14 +1,17 @@
 # ml_api/serializers.py
 
 import os
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Endpoint, MLAlgorithm, MLRequest
-import numpy as np # Needed for isnumeric check example
+from .models import Endpoint, MLAlgorithm, MLRequest, RetrainJob
+import numpy as np  # Needed for vectorised input validation
 
 # Define validation constants
 VALID_MODEL_EXTENSIONS = ['.pkl', '.joblib']
 MAX_MODEL_FILE_SIZE_MB = 50  # Max size in Megabytes
 MAX_MODEL_FILE_SIZE_BYTES = MAX_MODEL_FILE_SIZE_MB * 1024 * 1024
+NUMERIC_DTYPE_KINDS = 'biuf'  # NumPy dtype kinds accepted as features: bool, int, uint, float
 
 
 class EndpointSerializer(serializers.ModelSerializer):
@@ -23,7 +26,7 @@ class EndpointSerializer(serializers.ModelSerializer):
     class Meta:
         model = Endpoint
         fields = [
-            'id', 'name', 'owner', 'created_at', 'algorithms'
+            'id', 'name', 'owner', 'primary_algorithm_name', 'created_at', 'algorithms'
         ]
         read_only_fields = ('id', 'created_at', 'algorithms')
 
@@ -43,7 +46,9 @@ class MLAlgorithmSerializer(serializers.ModelSerializer):
             'code',
             'model_file',      # For upload and displaying the file path
             'model_type',      # Added field
+            'runtime',         # Inference runtime (NATIVE, TREE_ENGINE or ONNX)
             'is_active',       # Added field
+            'trained_through_claim_id',  # Set by retraining
             'parent_endpoint', # Writable FK field for associating with an endpoint
             'parent_endpoint_details', 
             'created_at',
@@ -51,6 +56,7 @@ class MLAlgorithmSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = (
             'id',
+            'trained_through_claim_id',
             'created_at',
             'updated_at',
         )
@@ -91,6 +97,102 @@ class MLAlgorithmSerializer(serializers.ModelSerializer):
         return None
 
 
+class RetrainJobSerializer(serializers.ModelSerializer):
+    """Serializer for RetrainJob status (progress, per-phase timings, outcome)."""
+    algorithm_details = serializers.StringRelatedField(source='algorithm', read_only=True)
+    queue_seconds = serializers.SerializerMethodField()
+    run_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RetrainJob
+        fields = [
+            'id',
+            'algorithm',
+            'algorithm_details',
+            'status',
+            'options',        # Options from the retrain request
+            'phase',          # Phase currently running, while RUNNING
+            'phase_timings',  # Seconds per finished phase
+            'queue_seconds',
+            'run_seconds',
+            'new_algorithm',
+            'error',
+            'worker',
+            'created_at',
+            'started_at',
+            'heartbeat_at',
+            'finished_at',
+        ]
+        read_only_fields = fields  # Jobs are created by the retrain action and updated by the worker
+
+    def get_queue_seconds(self, obj):
+        """Seconds the job waited for a worker (so far, while still queued)."""
+        end = obj.started_at or timezone.now()
+        return round((end - obj.created_at).total_seconds(), 3)
+
+    def get_run_seconds(self, obj):
+        """Seconds the worker has spent on the job (so far, while running)."""
+        if obj.started_at is None:
+            return None
+        return round(((obj.finished_at or timezone.now()) - obj.started_at).total_seconds(), 3)
+
+
+class RetrainRequestSerializer(serializers.Serializer):
+    """Optional body of the 'retrain' action; without 'search' the model is refit with its current hyperparameters."""
+    mode = serializers.ChoiceField(
+        choices=['full', 'incremental'], required=False,
+        help_text="'full' refits on all claims; 'incremental' continues the model on new claims. "
+                  "Defaults per model type (RETRAIN_INCREMENTAL_MODEL_TYPES)."
+    )
+    search = serializers.ChoiceField(
+        choices=['grid', 'random'], required=False,
+        help_text="Cross-validated hyperparameter search over the retrainer's search space before the final fit."
+    )
+    n_iter = serializers.IntegerField(
+        min_value=1, required=False, help_text="Candidates sampled by random search (default RETRAIN_SEARCH_N_ITER)."
+    )
+    cv = serializers.IntegerField(
+        min_value=2, max_value=10, required=False, help_text="Cross-validation folds (default RETRAIN_SEARCH_CV_FOLDS)."
+    )
+    n_jobs = serializers.IntegerField(
+        min_value=1, required=False, help_text="Parallel fits; capped at RETRAIN_SEARCH_MAX_JOBS."
+    )
+
+    def validate(self, attrs):
+        if attrs.get('search') and attrs.get('mode') == 'incremental':
+            raise serializers.ValidationError("Hyperparameter search requires mode 'full'.")
+        return attrs
+
+    def to_job_options(self) -> dict:
+        """RetrainJob.options for the validated body."""
+        data = dict(self.validated_data)
+        options = {"mode": data.pop('mode')} if 'mode' in data else {}
+        strategy = data.pop('search', None)
+        if strategy:
+            options["search"] = {"strategy": strategy, **data}
+        return options
+
+
+class ExplainBatchRequestSerializer(serializers.Serializer):
+    """Body of the 'explain_batch' action, JSON or form-encoded ("false"/"0" are false)."""
+    REQUEST_IDS_REQUIRED = "A non-empty list of request IDs is required."
+
+    request_ids = serializers.ListField(
+        child=serializers.JSONField(),  # Integer IDs or request UUIDs, parsed by the view
+        error_messages={'required': REQUEST_IDS_REQUIRED, 'null': REQUEST_IDS_REQUIRED,
+                        'not_a_list': REQUEST_IDS_REQUIRED},
+    )
+    store = serializers.BooleanField(default=True, help_text="Store newly computed explanations.")
+    include_values = serializers.BooleanField(default=True, help_text="Include per-row SHAP values in the results.")
+
+    def validate_request_ids(self, value):
+        if not value:
+            raise serializers.ValidationError(self.REQUEST_IDS_REQUIRED)
+        if len(value) > settings.EXPLAIN_BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"At most {settings.EXPLAIN_BATCH_MAX_REQUESTS} requests per batch.")
+        return value
+
+
 class MLRequestSerializer(serializers.ModelSerializer):
     """Serializer for the MLRequest model (prediction logs)."""
     # Provides a readable string representation of the algorithm used
@@ -100,6 +202,7 @@ class MLRequestSerializer(serializers.ModelSerializer):
         model = MLRequest
         fields = [
             'id',
+            'request_uuid',
             'input_data',
             'prediction',
             'algorithm', # The FK id
@@ -110,6 +213,7 @@ class MLRequestSerializer(serializers.ModelSerializer):
         # Logs are typically read-only once created
         read_only_fields = (
             'id',
+            'request_uuid',
             'input_data', # Usually set on creation, not modified
             'prediction',
             'algorithm', # Usually set on creation
@@ -119,9 +223,103 @@ class MLRequestSerializer(serializers.ModelSerializer):
         )
 
 
+def _locate_invalid_value(value):
+    """
+    Walks the raw payload to explain why it could not be converted to a
+    numeric matrix. Only called on the error path, so the per-value Python
+    checks are never paid for valid input.
+
+    Raises:
+        serializers.ValidationError: Describing the first offending row/column.
+    """
+    if not all(isinstance(item, list) for item in value):
+        raise serializers.ValidationError(
+            "Each item in the input_data list must be a list representing features."
+        )
+
+    # Check if all inner lists (rows) have the same number of features
+    first_row_len = len(value[0])
+    if not all(len(item) == first_row_len for item in value):
+        raise serializers.ValidationError("All feature lists (rows) must have the same number of features.")
+
+    for row_idx, item in enumerate(value):
+        for col_idx, num in enumerate(item):
+            if not isinstance(num, (int, float)):
+                raise serializers.ValidationError(
+                    f"All features must be numeric (int or float). Found non-numeric value "
+                    f"'{num}' (type: {type(num).__name__}) at row {row_idx}, column {col_idx}."
+                )
+
+
+def validate_feature_matrix(value) -> np.ndarray:
+    """
+    Converts input data to a 2-D float64 matrix and validates it in vectorised form.
+
+    Accepts a list of rows (JSON) or an existing NumPy array. Shape, dtype and
+    finiteness are checked on the whole array at once; when a check fails, the
+    error message still points at the offending row and column.
+
+    Returns:
+        np.ndarray: The validated (n_rows, n_features) float64 matrix.
+    Raises:
+        serializers.ValidationError: If the data is not a non-empty numeric matrix.
+    """
+    if isinstance(value, np.ndarray):
+        array = value
+    else:
+        if not isinstance(value, list):
+            raise serializers.ValidationError("Input data must be a list (array).")
+        if not value:
+            raise serializers.ValidationError("Input data list cannot be empty.")
+        try:
+            # No dtype here, so strings/None surface as non-numeric dtypes instead of being coerced
+            array = np.asarray(value)
+        except ValueError:
+            array = None  # Ragged rows
+        if array is None or array.ndim != 2 or array.dtype.kind not in NUMERIC_DTYPE_KINDS:
+            _locate_invalid_value(value)
+            if array is None or array.ndim != 2:
+                raise serializers.ValidationError("Input data must be a list of lists of numbers.")
+
+    if array.ndim != 2:
+        raise serializers.ValidationError(
+            f"Input data must be 2-dimensional (rows x features); got {array.ndim} dimension(s)."
+        )
+    if array.shape[0] == 0 or array.shape[1] == 0:
+        raise serializers.ValidationError("Input data must contain at least one row and one feature.")
+
+    try:
+        array = np.asarray(array, dtype=np.float64)  # No copy when already float64
+    except (TypeError, ValueError, OverflowError):
+        raise serializers.ValidationError("All features must be numeric (int or float).")
+
+    finite = np.isfinite(array)
+    if not finite.all():
+        row_idx, col_idx = np.argwhere(~finite)[0]
+        raise serializers.ValidationError(
+            f"All features must be finite numbers. Found '{array[row_idx, col_idx]}' "
+            f"at row {row_idx}, column {col_idx}."
+        )
+    return array
+
+
+class FeatureMatrixField(serializers.Field):
+    """
+    Pass-through field for prediction input. Unlike JSONField it does not
+    re-serialise the payload to check it is JSON; the values are validated
+    as a NumPy matrix by validate_feature_matrix instead.
+    """
+
+    def to_internal_value(self, data):
+        return data
+
+    def to_representation(self, value):
+        return value.tolist() if isinstance(value, np.ndarray) else value
+
+
 class AlgorithmPredictInputSerializer(serializers.Serializer):
     """Serializer specifically for validating input to the 'predict' action."""
-    input_data = serializers.JSONField(
+    input_data = FeatureMatrixField(
         help_text=(
             "Input data for prediction. Must be a list of lists (rows), where each "
             "inner list represents a data point's features (e.g., "
@@ -130,28 +328,5 @@ class AlgorithmPredictInputSerializer(serializers.Serializer):
     )
 
     def validate_input_data(self, value):
-        """Validate the structure and basic types within input_data."""
-        if not isinstance(value, list):
-            raise serializers.ValidationError("Input data must be a list (array).")
-        if not value:
-             raise serializers.ValidationError("Input data list cannot be empty.")
-        if not all(isinstance(item, list) for item in value):
-            raise serializers.ValidationError(
-                "Each item in the input_data list must be a list representing features."
-            )
-
-        # Check if all inner lists (rows) have the same number of features
-        first_row_len = len(value[0])
-        if not all(len(item) == first_row_len for item in value):
-            raise serializers.ValidationError("All feature lists (rows) must have the same number of features.")
-
-        # Check if all feature values are numeric (int or float)
-        for row_idx, item in enumerate(value):
-             for col_idx, num in enumerate(item):
-                 if not isinstance(num, (int, float)):
-                      raise serializers.ValidationError(
-                          f"All features must be numeric (int or float). Found non-numeric value "
-                          f"'{num}' (type: {type(num).__name__}) at row {row_idx}, column {col_idx}."
-                      )
-
-        return value
\ No newline at end of file
+        """Validate the structure and types of input_data; returns a float64 matrix."""
+        return validate_feature_matrix(value)
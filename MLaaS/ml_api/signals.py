@@ -0,0 +1,35 @@
+# ml_api/signals.py
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .explainers import explainer_cache
+from .models import Endpoint, MLAlgorithm
+from .prediction_cache import prediction_cache
+from .routing import bump_routing_version
+from .runtimes import RUNTIME_ONNX, prepare_runtime
+
+
+@receiver(post_save, sender=MLAlgorithm)
+@receiver(post_delete, sender=MLAlgorithm)
+@receiver(post_save, sender=Endpoint)
+@receiver(post_delete, sender=Endpoint)
+def invalidate_routing_table(sender, **kwargs):
+    """Any change to algorithms or endpoints (e.g. activating a model) invalidates routing."""
+    bump_routing_version()
+
+
+@receiver(post_save, sender=MLAlgorithm)
+@receiver(post_delete, sender=MLAlgorithm)
+def invalidate_prediction_cache(sender, instance, **kwargs):
+    """A saved (e.g. retrained or re-pointed) or deleted algorithm must not serve cached predictions or explainers."""
+    prediction_cache.invalidate(instance.id)
+    explainer_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender=MLAlgorithm)
+def prepare_algorithm_runtime(sender, instance, created=False, **kwargs):
+    """Builds and verifies runtime artifacts (tree engine, ONNX) when an algorithm is registered or changed."""
+    prepare_runtime(instance)
+    if created and settings.ONNX_EXPORT_ON_REGISTER and instance.runtime != RUNTIME_ONNX:
+        prepare_runtime(instance, RUNTIME_ONNX)  # Ready in case the runtime is switched later
@@ -0,0 +1,1215 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from sklearn.linear_model import LinearRegression
+
+from ml_api.explainers import ExplainerCache, explainer_cache
+from ml_api.explanation_queue import explanation_precomputer
+from ml_api.explanation_store import compute_shap
+from ml_api.model_cache import ModelCache, load_model_artifact, model_cache
+from ml_api.models import Endpoint, MLAlgorithm, MLRequest, MLRequestExplanation
+from ml_api.prediction_cache import prediction_cache
+from ml_api.retrain_preprocessing import FINAL_FEATURE_COLUMNS_ORDERED as FEATURE_NAMES
+from ml_api.timing import StageTimer, stage_latency
+
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()  # Keeps routing stamps and artifacts out of the source tree
+test_media_settings = override_settings(
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+    MODEL_ROUTING_VERSION_FILE=os.path.join(TEST_MEDIA_ROOT, 'routing.version'),
+)
+
+
+def make_linear_model(n_features=3):
+    """Fits a tiny LinearRegression so tests do not depend on shipped artifacts."""
+    rng = np.random.default_rng(0)
+    X = rng.random((20, n_features))
+    y = X @ np.arange(1, n_features + 1) + 2.0
+    return LinearRegression().fit(X, y)
+
+
+class ModelArtifactMixin:
+    """Writes a model artifact to a temporary directory and registers it."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.model_path = os.path.join(self.tmp_dir, 'linear.pkl')
+        joblib.dump(make_linear_model(), self.model_path)
+        self.endpoint = Endpoint.objects.create(name='Test Endpoint', owner='Tests')
+        self.algorithm = MLAlgorithm.objects.create(
+            name='Linear', version='1.0.0', model_file=self.model_path,
+            parent_endpoint=self.endpoint,
+        )
+        self.client = APIClient()
+        model_cache.clear()
+        prediction_cache.clear()
+
+    def tearDown(self):
+        model_cache.clear()
+        prediction_cache.clear()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def register_forest(self, n_features=3):
+        """Registers a small RandomForestRegressor, which SHAP explains with TreeExplainer."""
+        from sklearn.ensemble import RandomForestRegressor
+
+        X = np.random.default_rng(0).random((100, n_features))
+        forest_path = os.path.join(self.tmp_dir, 'forest.pkl')
+        joblib.dump(RandomForestRegressor(n_estimators=5, random_state=0).fit(X, X.sum(axis=1)), forest_path)
+        return MLAlgorithm.objects.create(
+            name='Forest', version='1.0.0', model_file=forest_path, parent_endpoint=self.endpoint,
+        )
+
+    def register_unexplainable(self, n_features=3):
+        """Registers a KNeighborsRegressor: no fast contribution path, and SHAP needs a masker for it."""
+        from sklearn.neighbors import KNeighborsRegressor
+
+        X = np.random.default_rng(0).random((20, n_features))
+        knn_path = os.path.join(self.tmp_dir, 'knn.pkl')
+        joblib.dump(KNeighborsRegressor(n_neighbors=3).fit(X, X.sum(axis=1)), knn_path)
+        return MLAlgorithm.objects.create(
+            name='KNN', version='1.0.0', model_file=knn_path, parent_endpoint=self.endpoint,
+        )
+
+
+@test_media_settings
+class MLaaSTestCase(ModelArtifactMixin, TestCase):
+    """Base class for tests that need a registered model artifact."""
+
+
+class ModelCacheTests(MLaaSTestCase):
+    def test_hit_after_first_load(self):
+        cache = ModelCache(max_bytes=10 * 1024 * 1024)
+        _, hit, _ = cache.get(1, self.model_path)
+        self.assertFalse(hit)
+        _, hit, load_time = cache.get(1, self.model_path)
+        self.assertTrue(hit)
+        self.assertEqual(load_time, 0.0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_reload_when_artifact_changes(self):
+        cache = ModelCache(max_bytes=10 * 1024 * 1024)
+        cache.get(1, self.model_path)
+        joblib.dump(make_linear_model(), self.model_path)
+        stat_result = os.stat(self.model_path)
+        os.utime(self.model_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1000))
+        _, hit, _ = cache.get(1, self.model_path)
+        self.assertFalse(hit)
+
+    def test_lru_eviction_respects_budget(self):
+        size = os.path.getsize(self.model_path)
+        cache = ModelCache(max_bytes=size * 2)
+        cache.get(1, self.model_path)
+        cache.get(2, self.model_path)
+        cache.get(1, self.model_path)  # 1 becomes most recently used
+        cache.get(3, self.model_path)  # Evicts 2
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.stats()['cached_algorithm_ids'], [1, 3])
+        self.assertLessEqual(cache.current_bytes, cache.max_bytes)
+
+    @override_settings(MODEL_MMAP_MODE='r')
+    def test_mmap_loading_matches_regular_load(self):
+        X = np.ones((2, 3))
+        mapped = load_model_artifact(self.model_path)
+        np.testing.assert_allclose(mapped.predict(X), joblib.load(self.model_path).predict(X))
+
+
+class PredictTests(MLaaSTestCase):
+    def predict_url(self):
+        return reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+
+    @override_settings(PREDICTION_CACHE_ENABLED=False)
+    def test_predict_uses_cache_on_second_call(self):
+        payload = {'input_data': [[1.0, 2.0, 3.0]]}
+        first = self.client.post(self.predict_url(), payload, format='json')
+        second = self.client.post(self.predict_url(), payload, format='json')
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.data['model_cache_hit'])
+        self.assertTrue(second.data['model_cache_hit'])
+        self.assertAlmostEqual(second.data['prediction'][0], first.data['prediction'][0])
+        self.assertEqual(MLRequest.objects.count(), 2)
+
+    def test_predict_rejects_non_numeric_input(self):
+        response = self.client.post(
+            self.predict_url(), {'input_data': [[1.0, 'a', 3.0]]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('row 0, column 1', str(response.data))
+
+
+class PredictionCacheTests(MLaaSTestCase):
+    def test_repeated_rows_are_served_without_the_model(self):
+        url = reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+        first = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        model_cache.clear()
+        second = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertFalse(first.data['cached'])
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(second.data['prediction'], first.data['prediction'])
+        self.assertEqual(model_cache.stats()['misses'], 0)  # The model was never loaded for the hit
+        self.assertEqual(MLRequest.objects.count(), 2)
+
+        mixed = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0], [-0.0, 0.0, 1.0]]}, format='json')
+        self.assertFalse(mixed.data['cached'])
+        self.assertEqual(mixed.data['prediction'][0], first.data['prediction'][0])
+
+    def test_saving_the_algorithm_invalidates_its_rows(self):
+        url = reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+        self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.algorithm.save()
+        response = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertFalse(response.data['cached'])
+
+    def test_ttl_expiry(self):
+        from ml_api.prediction_cache import PredictionCache
+
+        cache = PredictionCache(max_entries=10, ttl_seconds=-1)
+        keys = cache.row_keys(1, (0, 0), np.ones((1, 3)))
+        cache.set_many(keys, [1.0])
+        self.assertEqual(cache.get_many(keys), [None])
+        self.assertEqual(cache.expirations, 1)
+
+
+class StageTimingTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        stage_latency.clear()
+
+    def test_server_timing_header_timings_block_and_histograms(self):
+        url = reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+        response = self.client.post(url + '?timings=true', {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        header_stages = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+        self.assertEqual(
+            header_stages, ['lookup', 'validate', 'model_fetch', 'predict', 'log_write', 'serialize', 'total']
+        )
+        self.assertEqual(
+            set(response.data['timings']), {'lookup', 'validate', 'model_fetch', 'predict', 'log_write', 'total'}
+        )
+
+        plain = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertNotIn('timings', plain.data)
+        self.assertNotIn('model_fetch', plain['Server-Timing'])  # Served from the prediction cache
+
+        stats = self.client.get(reverse('ml_api:service_metrics')).data['predict_stage_latency']
+        per_stage = stats[str(self.algorithm.id)]
+        self.assertEqual(per_stage['total']['count'], 2)
+        self.assertEqual(per_stage['model_fetch']['count'], 1)
+        self.assertEqual(sum(per_stage['serialize']['histogram_ms'].values()), 2)
+
+    def test_timer_accumulates_repeated_stages(self):
+        timer = StageTimer()
+        timer.record('predict', 0.001)
+        timer.record('predict', 0.002)
+        self.assertAlmostEqual(timer.timings_ms()['predict'], 3.0)
+
+
+class FeatureMatrixValidationTests(TestCase):
+    def assertInvalid(self, value, message):
+        from rest_framework.serializers import ValidationError
+        from ml_api.serializers import validate_feature_matrix
+
+        with self.assertRaises(ValidationError) as ctx:
+            validate_feature_matrix(value)
+        self.assertIn(message, str(ctx.exception.detail))
+
+    def test_valid_rows_become_float64_matrix(self):
+        from ml_api.serializers import validate_feature_matrix
+
+        array = validate_feature_matrix([[1, 2.5], [3, True]])
+        self.assertEqual(array.dtype, np.float64)
+        self.assertEqual(array.shape, (2, 2))
+
+    def test_errors_point_at_row_and_column(self):
+        self.assertInvalid([[1, 2], [3]], 'same number of features')
+        self.assertInvalid([1, 2], 'must be a list representing features')
+        self.assertInvalid([[1, 2], [3, None]], 'row 1, column 1')
+        self.assertInvalid(np.array([[1.0, 2.0], [np.inf, 4.0]]), 'row 1, column 0')
+
+
+class BinaryWireFormatTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+        self.X = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        self.expected = joblib.load(self.model_path).predict(self.X)
+
+    def test_npy_request_and_response(self):
+        import io
+
+        buffer = io.BytesIO()
+        np.save(buffer, self.X)
+        response = self.client.post(
+            self.url, buffer.getvalue(), content_type='application/x-npy', HTTP_ACCEPT='application/x-npy'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-npy')
+        np.testing.assert_allclose(np.load(io.BytesIO(response.content)), self.expected)
+        self.assertIn('X-Prediction-Request-Id', response)
+
+    def test_arrow_request_with_json_response(self):
+        import pyarrow as pa
+
+        rows = pa.FixedSizeListArray.from_arrays(pa.array(self.X.ravel()), 3)
+        batch = pa.record_batch([rows], names=['features'])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        response = self.client.post(
+            self.url, sink.getvalue().to_pybytes(), content_type='application/vnd.apache.arrow.stream'
+        )
+        self.assertEqual(response.status_code, 200)
+        np.testing.assert_allclose(response.json()['prediction'], self.expected)
+
+    def test_binary_accept_renders_errors_as_json(self):
+        response = self.client.post(
+            self.url, {'input_data': []}, format='json', HTTP_ACCEPT='application/x-npy'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class BulkPredictTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('ml_api:mlalgorithm-predict-bulk', args=[self.algorithm.id])
+        self.X = np.arange(21, dtype=np.float64).reshape(7, 3)
+        self.expected = joblib.load(self.model_path).predict(self.X)
+
+    def read_lines(self, response):
+        import json
+
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_ndjson_is_streamed_in_chunks_with_one_log_per_chunk(self):
+        body = '\n'.join(str(row) for row in self.X.tolist())
+        response = self.client.post(self.url + '?chunk_rows=3', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        lines = self.read_lines(response)
+        np.testing.assert_allclose([line['prediction'] for line in lines[:-1]], self.expected)
+        self.assertEqual(lines[-1]['done'], True)
+        self.assertEqual((lines[-1]['rows'], lines[-1]['chunks']), (7, 3))
+        logs = MLRequest.objects.order_by('id')
+        self.assertEqual([log.input_data['rows'] for log in logs], [3, 3, 1])
+        explain = self.client.get(reverse('ml_api:mlrequest-explain', args=[logs[0].id]))
+        self.assertEqual(explain.status_code, 400)
+
+    def test_npy_body_and_mid_stream_errors(self):
+        import io
+
+        buffer = io.BytesIO()
+        np.save(buffer, self.X)
+        response = self.client.post(self.url + '?chunk_rows=4', buffer.getvalue(), content_type='application/x-npy')
+        lines = self.read_lines(response)
+        self.assertEqual(lines[-1]['chunks'], 2)
+        np.testing.assert_allclose([line['prediction'] for line in lines[:-1]], self.expected)
+
+        response = self.client.post(self.url, '[1, 2, 3]\n[1, 2]', content_type='application/x-ndjson')
+        self.assertIn('error', self.read_lines(response)[-1])
+
+    def test_unsupported_content_type_returns_415(self):
+        response = self.client.post(self.url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertEqual(response.status_code, 415)
+
+
+class MicroBatchingTests(TestCase):
+    def test_concurrent_rows_share_one_predict(self):
+        import threading
+
+        from ml_api.batching import MicroBatcher
+
+        model = make_linear_model()
+        batcher = MicroBatcher(window_seconds=5.0, max_rows=4)
+        rows = [np.array([[float(i), 1.0, 2.0]]) for i in range(4)]
+        results = [None] * 4
+
+        def worker(i):
+            results[i] = batcher.predict(1, model, rows[i])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        for row, (prediction, batch_size) in zip(rows, results):
+            np.testing.assert_allclose(prediction, model.predict(row))
+            self.assertEqual(batch_size, 4)  # max_rows closes the batch before the window expires
+        stats = batcher.stats()
+        self.assertEqual((stats['batches'], stats['rows']), (1, 4))
+        self.assertEqual(stats['batch_size_histogram']['le_4'], 1)
+
+
+class TreeEngineTests(MLaaSTestCase):
+    def fit_forest(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        rng = np.random.default_rng(0)
+        X = rng.random((200, 3))
+        return RandomForestRegressor(n_estimators=5, max_depth=4, random_state=0).fit(X, X.sum(axis=1)), X
+
+    def test_compiled_ensembles_match_native_predict(self):
+        from xgboost import XGBRegressor
+
+        from ml_api.tree_engine import compile_model
+
+        forest, X = self.fit_forest()
+        booster = XGBRegressor(n_estimators=10, max_depth=3).fit(X, X.sum(axis=1))
+        for model in (forest, booster):
+            np.testing.assert_allclose(compile_model(model).predict(X), model.predict(X), rtol=1e-5, atol=1e-6)
+
+    def test_registration_compiles_and_predict_uses_engine(self):
+        from ml_api.runtimes import TreeEngineRuntime
+        from ml_api.tree_engine import compiled_path_for
+
+        forest, X = self.fit_forest()
+        forest_path = os.path.join(self.tmp_dir, 'forest.pkl')
+        joblib.dump(forest, forest_path)
+        algorithm = MLAlgorithm.objects.create(
+            name='Forest', version='1.0.0', model_file=forest_path, parent_endpoint=self.endpoint,
+            model_type='RANDOM_FOREST', runtime='TREE_ENGINE',
+        )
+        self.assertTrue(os.path.exists(compiled_path_for(forest_path)))
+
+        url = reverse('ml_api:mlalgorithm-predict', args=[algorithm.id])
+        response = self.client.post(url, {'input_data': X[:2].tolist()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        np.testing.assert_allclose(response.data['prediction'], forest.predict(X[:2]))
+        cached_model = model_cache._entries[(algorithm.id, compiled_path_for(forest_path))][1]
+        self.assertIsInstance(cached_model, TreeEngineRuntime)
+
+    def test_unsupported_model_falls_back_to_native(self):
+        from ml_api.tree_engine import compiled_path_for
+
+        self.algorithm.runtime = 'TREE_ENGINE'
+        self.algorithm.save()
+        self.assertFalse(os.path.exists(compiled_path_for(self.model_path)))
+        url = reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+        response = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        stale_path = compiled_path_for(self.model_path)
+        with open(stale_path, 'wb') as fh:
+            fh.write(b'stale')
+        os.utime(stale_path, ns=(0, 0))  # Older than the model, so it is rebuilt (and fails) on save
+        with patch('ml_api.runtimes.os.remove', side_effect=PermissionError('read-only volume')):
+            self.algorithm.save()  # A sidecar that cannot be deleted must not fail the save
+
+
+class OnnxRuntimeTests(MLaaSTestCase):
+    def test_registration_exports_onnx_and_predict_can_use_it(self):
+        from ml_api.onnx_runtime import OnnxModel, onnx_path_for
+
+        onnx_path = onnx_path_for(self.model_path)
+        self.assertTrue(os.path.exists(onnx_path))  # Exported when the algorithm was created in setUp
+
+        self.algorithm.runtime = 'ONNX'
+        self.algorithm.save()
+        url = reverse('ml_api:mlalgorithm-predict', args=[self.algorithm.id])
+        response = self.client.post(url, {'input_data': [[1.0, 2.0, 3.0]]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        expected = joblib.load(self.model_path).predict(np.array([[1.0, 2.0, 3.0]]))
+        np.testing.assert_allclose(response.data['prediction'], expected, rtol=1e-4)
+        self.assertIsInstance(model_cache._entries[(self.algorithm.id, onnx_path)][1], OnnxModel)
+
+    def test_mismatched_export_is_rejected(self):
+        from ml_api.onnx_runtime import OnnxConversionError, export_and_verify
+
+        model = joblib.load(self.model_path)
+        model.predict = lambda X: LinearRegression.predict(model, X) + 1.0  # Original output no longer matches the export
+        onnx_path = os.path.join(self.tmp_dir, 'shifted.onnx')
+        with self.assertRaises(OnnxConversionError):
+            export_and_verify(model, onnx_path)
+        self.assertFalse(os.path.exists(onnx_path))
+
+
+@test_media_settings
+class ExplainerCacheTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        explainer_cache.clear()
+
+    def tearDown(self):
+        explainer_cache.clear()
+        super().tearDown()
+
+    def test_tree_explainer_is_built_once_per_artifact(self):
+        algorithm = self.register_forest()
+        ml_request = MLRequest.objects.create(input_data=[[0.2, 0.5, 0.9]], prediction=[1.6], algorithm=algorithm)
+        url = reverse('ml_api:mlrequest-explain', args=[ml_request.id])
+
+        first = self.client.get(url)
+        MLRequestExplanation.objects.all().delete()  # Force a second SHAP computation
+        second = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data['top_features'], first.data['top_features'])
+        stats = explainer_cache.stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 1))
+        self.assertEqual(stats['explainers'][str(algorithm.id)], 'TreeExplainer')
+
+        algorithm.save()  # Retrained or edited: the explainer is rebuilt
+        self.assertEqual(explainer_cache.stats()['entries'], 0)
+
+    def test_unexplainable_model_is_not_retried(self):
+        ml_request = MLRequest.objects.create(
+            input_data=[[1.0, 2.0, 3.0]], prediction=[1.0], algorithm=self.register_unexplainable(),
+        )
+        url = reverse('ml_api:mlrequest-explain', args=[ml_request.id])
+        for _ in range(2):
+            response = self.client.get(url)  # Nothing is stored, so both calls need the explainer
+            self.assertEqual(response.status_code, 501)  # No SHAP values and no fallback importances
+        self.assertEqual(explainer_cache.stats()['build_failures'], 1)
+
+    def test_lru_cap(self):
+        cache = ExplainerCache(max_entries=1)
+        second_path = os.path.join(self.tmp_dir, 'second.pkl')
+        shutil.copy(self.model_path, second_path)
+        with patch('ml_api.explainers.build_explainer', side_effect=lambda model, names, **kwargs: object()):
+            cache.get(1, self.model_path)
+            cache.get(2, second_path)
+            _, hit = cache.get(1, self.model_path)
+        self.assertFalse(hit)
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+
+class FastContributionTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        explainer_cache.clear()
+
+    def tearDown(self):
+        explainer_cache.clear()
+        super().tearDown()
+
+    def test_linear_contributions_are_relative_to_logged_mean(self):
+        logged = [[1.0, 2.0, 3.0], [3.0, 0.0, 1.0]]
+        for row in logged:
+            MLRequest.objects.create(input_data=[row], prediction=[0.0], algorithm=self.algorithm)
+        row = [0.5, 1.5, 2.5]
+        values, base_values, version = compute_shap(self.algorithm.id, self.model_path, [row])
+
+        model = joblib.load(self.model_path)
+        mean = np.mean(logged, axis=0)
+        np.testing.assert_allclose(values[0], model.coef_ * (np.array(row) - mean))
+        self.assertAlmostEqual(base_values[0] + values[0].sum(), model.predict([row])[0], places=10)
+        self.assertTrue(version.startswith('LinearContributions/LinearRegression/mean-'))
+        self.assertEqual(explainer_cache.stats()['explainers'][str(self.algorithm.id)], 'LinearContributionExplainer')
+
+    def test_linear_background_mean_is_shared_per_artifact(self):
+        from ml_api.explainers import BACKGROUND_MEAN_SUFFIX
+
+        row = [0.5, 1.5, 2.5]
+        _, zero_base, zero_version = compute_shap(self.algorithm.id, self.model_path, [row])
+        self.assertFalse(os.path.exists(self.model_path + BACKGROUND_MEAN_SUFFIX))  # Nothing logged: not saved
+
+        MLRequest.objects.create(input_data=[[1.0, 2.0, 3.0]], prediction=[0.0], algorithm=self.algorithm)
+        explainer_cache.clear()
+        _, base, version = compute_shap(self.algorithm.id, self.model_path, [row])
+        self.assertTrue(os.path.exists(self.model_path + BACKGROUND_MEAN_SUFFIX))
+        self.assertNotEqual(version, zero_version)
+        self.assertNotAlmostEqual(base[0], zero_base[0])
+
+        # Another worker, with more rows logged since, loads the saved mean instead of its own
+        MLRequest.objects.create(input_data=[[9.0, 9.0, 9.0]], prediction=[0.0], algorithm=self.algorithm)
+        explainer_cache.clear()
+        _, other_base, other_version = compute_shap(self.algorithm.id, self.model_path, [row])
+        self.assertEqual(other_version, version)
+        self.assertEqual(other_base[0], base[0])
+
+    def test_xgboost_uses_native_pred_contribs(self):
+        import xgboost as xgb
+
+        X = np.random.default_rng(0).random((200, 3))
+        xgb_path = os.path.join(self.tmp_dir, 'xgb.pkl')
+        model = xgb.XGBRegressor(n_estimators=20, max_depth=3).fit(X, X @ [1.0, 2.0, 3.0])
+        joblib.dump(model, xgb_path)
+        algorithm = MLAlgorithm.objects.create(
+            name='XGB', version='1.0.0', model_file=xgb_path, parent_endpoint=self.endpoint,
+        )
+        ml_request = MLRequest.objects.create(input_data=X[:2].tolist(), prediction=[0.0, 0.0], algorithm=algorithm)
+
+        response = self.client.get(reverse('ml_api:mlrequest-explain', args=[ml_request.id]), {'output': 'contributions'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['explainer_version'].startswith('XGBoostContributions/xgboost-'))
+        explanation = MLRequestExplanation.objects.get(request=ml_request)
+        np.testing.assert_allclose(  # Contributions add up to each row's prediction
+            explanation.base_value + np.sum(explanation.shap_values, axis=1), model.predict(X[:2]), rtol=1e-5,
+        )
+
+
+class ExplanationStoreTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        explainer_cache.clear()
+        self.forest = self.register_forest()
+
+    def tearDown(self):
+        explainer_cache.clear()
+        super().tearDown()
+
+    def test_explain_computes_once_then_serves_from_store(self):
+        ml_request = MLRequest.objects.create(input_data=[[0.2, 0.5, 0.9]], prediction=[1.6], algorithm=self.forest)
+        url = reverse('ml_api:mlrequest-explain', args=[ml_request.id])
+        first = self.client.get(url)
+        self.assertFalse(first.data['stored'])
+        explanation = MLRequestExplanation.objects.get(request=ml_request)
+        self.assertTrue(explanation.explainer_version.startswith('TreeExplainer/shap-'))
+        model = joblib.load(self.forest.model_file.name)
+        self.assertAlmostEqual(  # SHAP values add up to the prediction
+            explanation.base_value + sum(explanation.shap_values[0]), model.predict([[0.2, 0.5, 0.9]])[0], places=6
+        )
+
+        explainer_cache.clear()
+        second = self.client.get(url)
+        self.assertTrue(second.data['stored'])
+        self.assertEqual(second.data['top_features'], first.data['top_features'])
+        self.assertEqual(explainer_cache.stats()['misses'], 0)  # No explainer was needed
+
+    def test_backfill_command(self):
+        rows = np.random.default_rng(1).random((7, 3)).round(3).tolist()
+        requests = [
+            MLRequest.objects.create(input_data=[row], prediction=[0.0], algorithm=self.forest) for row in rows
+        ]
+        MLRequest.objects.create(input_data={'bulk': True, 'rows': 10}, algorithm=self.forest)
+        MLRequest.objects.create(input_data=[[1.0, 2.0, 3.0]], prediction=[0.0], algorithm=self.register_unexplainable())
+
+        out = StringIO()
+        call_command('backfill_explanations', '--batch-size', '3', '--workers', '1', stdout=out, stderr=StringIO())
+        self.assertIn('Explained 7 requests', out.getvalue())
+        self.assertIn('1 skipped, 1 failed', out.getvalue())  # Bulk summary; SHAP cannot explain the KNN model
+        stored = {e.request_id: e for e in MLRequestExplanation.objects.all()}
+        self.assertEqual(set(stored), {r.id for r in requests})
+        values, _, _ = compute_shap(self.forest.id, self.forest.model_file.name, rows)
+        np.testing.assert_allclose([stored[r.id].shap_values[0] for r in requests], values)
+
+        out = StringIO()
+        call_command('backfill_explanations', '--workers', '1', '--algorithm', str(self.forest.id),
+                     stdout=out, stderr=StringIO())
+        self.assertIn('Explained 0 requests', out.getvalue())
+
+    def test_contributions_and_svg_outputs(self):
+        from django.core.cache import cache
+
+        ml_request = MLRequest.objects.create(input_data=[[0.2, 0.5, 0.9]], prediction=[1.6], algorithm=self.forest)
+        url = reverse('ml_api:mlrequest-explain', args=[ml_request.id])
+
+        contributions = self.client.get(url, {'output': 'contributions'})
+        self.assertEqual(contributions.status_code, 200)
+        self.assertNotIn('shap_image', contributions.data)
+        features = contributions.data['features']
+        self.assertEqual([f['feature'] for f in features][:1], [FEATURE_NAMES[2]])  # Largest feature moves most
+        self.assertEqual(features[0]['value'], 0.9)
+        self.assertAlmostEqual(
+            contributions.data['base_value'] + sum(f['contribution'] for f in features),
+            joblib.load(self.forest.model_file.name).predict([[0.2, 0.5, 0.9]])[0], places=6,
+        )
+
+        cache.clear()
+        svg = self.client.get(url, {'output': 'svg'})
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertTrue(svg.content.startswith(b'<svg xmlns="http://www.w3.org/2000/svg"'))
+        self.assertIn(b'Top 10 Factors Driving This Claim', svg.content)
+        with patch('ml_api.views.render_bar_chart_svg') as render:
+            cached = self.client.get(url, {'output': 'svg'})
+        render.assert_not_called()
+        self.assertEqual(cached.content, svg.content)
+
+        self.assertEqual(self.client.get(url, {'output': 'gif'}).status_code, 400)
+
+    def test_explain_batch_groups_by_algorithm(self):
+        from ml_api import explanation_store
+
+        rows = np.random.default_rng(2).random((4, 3)).round(3).tolist()
+        forest_requests = [
+            MLRequest.objects.create(input_data=[row], prediction=[0.0], algorithm=self.forest) for row in rows
+        ]
+        self.client.get(reverse('ml_api:mlrequest-explain', args=[forest_requests[0].id]))  # Already stored
+        knn_request = MLRequest.objects.create(
+            input_data=[[1.0, 2.0, 3.0]], prediction=[0.0], algorithm=self.register_unexplainable(),
+        )
+        bulk_summary = MLRequest.objects.create(input_data={'bulk': True}, algorithm=self.forest)
+        request_ids = [
+            str(forest_requests[3].request_uuid), forest_requests[0].id, knn_request.id,
+            forest_requests[1].id, bulk_summary.id, 999999, forest_requests[2].id,
+        ]
+
+        url = reverse('ml_api:mlrequest-explain-batch')
+        with patch.object(explanation_store, 'compute_shap', wraps=explanation_store.compute_shap) as compute:
+            response = self.client.post(url, {'request_ids': request_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(compute.call_count, 2)  # One vectorised call per algorithm (forest, KNN)
+        self.assertEqual(len(compute.call_args_list[0].args[2]), 3)  # The three unstored forest rows
+        results = response.data['results']
+        self.assertEqual(
+            [r['request_id'] for r in results],
+            [forest_requests[3].id, forest_requests[0].id, forest_requests[1].id, forest_requests[2].id],
+        )
+        self.assertEqual([r['stored'] for r in results], [False, True, False, False])
+        self.assertEqual(response.data['computed'], 3)
+        values, _, _ = compute_shap(self.forest.id, self.forest.model_file.name, [rows[3], rows[0], rows[1], rows[2]])
+        np.testing.assert_allclose([r['shap_values'][0] for r in results], values)
+        self.assertEqual(
+            [e['request_id'] for e in response.data['errors']], [knn_request.id, bulk_summary.id, 999999]
+        )
+        self.assertEqual(MLRequestExplanation.objects.filter(request__algorithm=self.forest).count(), 4)
+
+        MLRequestExplanation.objects.all().delete()
+        dry = self.client.post(
+            url, {'request_ids': [forest_requests[0].id], 'store': False, 'include_values': False}, format='json'
+        )
+        self.assertNotIn('shap_values', dry.data['results'][0])
+        self.assertFalse(MLRequestExplanation.objects.exists())
+
+        form = self.client.post(  # Form-encoded flags: "false" must not be truthy
+            url, {'request_ids': [forest_requests[0].id], 'store': 'false', 'include_values': '0'}
+        )
+        self.assertEqual(form.status_code, 200)
+        self.assertNotIn('shap_values', form.data['results'][0])
+        self.assertFalse(MLRequestExplanation.objects.exists())
+
+        empty = self.client.post(url, {'request_ids': []}, format='json')
+        self.assertEqual(empty.status_code, 400)
+        self.assertEqual(empty.data['request_ids'], ['A non-empty list of request IDs is required.'])
+        self.assertEqual(self.client.post(url, {'store': True}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'request_ids': ['nope']}, format='json').status_code, 400)
+
+    def test_views_do_not_import_shap_or_matplotlib(self):
+        import subprocess
+        import sys
+
+        from django.conf import settings
+
+        script = (
+            "import sys, django; django.setup(); import config.urls; "
+            "print(sorted(m for m in ('shap', 'matplotlib') if m in sys.modules))"
+        )
+        completed = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings', USE_SQLITE='True'),
+        )
+        self.assertEqual(completed.stdout.strip(), '[]', completed.stderr)
+
+
+class RetrainJobTests(MLaaSTestCase):
+    def setUp(self):
+        super().setUp()
+        from django.conf import settings
+
+        self.forest = self.register_forest()
+        media_path = os.path.join('ml_models', f'forest_{self.forest.id}.pkl')  # Retrainers resolve MEDIA_ROOT paths
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'ml_models'), exist_ok=True)
+        shutil.copy(self.forest.model_file.name, os.path.join(settings.MEDIA_ROOT, media_path))
+        self.forest.model_file, self.forest.model_type = media_path, 'RANDOM_FOREST'
+        self.forest.save()
+
+    def training_data(self):
+        import pandas as pd
+
+        X = np.random.default_rng(3).random((60, 3))
+        return pd.DataFrame(X, columns=['a', 'b', 'c']), pd.Series(X.sum(axis=1))
+
+    def test_retrain_is_queued_and_run_by_the_worker(self):
+        from ml_api.retraining_logic import BaseRetrainer
+
+        url = reverse('ml_api:mlalgorithm-retrain', args=[self.forest.id])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+        self.assertTrue(response['Location'].endswith(f'/api/retrain-jobs/{job_id}/'))
+        again = self.client.post(url)  # Already queued: same job
+        self.assertEqual((again.status_code, again.data['job_id'], again.data['created']), (202, job_id, False))
+        self.assertEqual(self.client.get(response.data['result_url']).status_code, 202)
+
+        with patch.object(BaseRetrainer, '_get_combined_data_for_retraining', return_value=self.training_data()):
+            call_command('run_retrain_worker', '--once', stdout=StringIO())
+
+        job = self.client.get(reverse('ml_api:retrainjob-detail', args=[job_id])).data
+        self.assertEqual(job['status'], 'SUCCEEDED')
+        self.assertEqual(list(job['phase_timings']), ['preprocess', 'load', 'fit', 'save'])
+        self.assertIsNotNone(job['run_seconds'])
+        result = self.client.get(reverse('ml_api:retrainjob-result', args=[job_id]))
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.data['new_algorithm']['version'], '1.0.1')
+        self.assertEqual(result.data['metrics']['data_points_used'], 60)
+
+    def test_hyperparameter_search_mode(self):
+        from ml_api.retraining_logic import BaseRetrainer, RandomForestRetrainer
+
+        url = reverse('ml_api:mlalgorithm-retrain', args=[self.forest.id])
+        self.assertEqual(self.client.post(url, {'search': 'exhaustive'}, format='json').status_code, 400)
+        response = self.client.post(url, {'search': 'grid', 'cv': 2, 'n_jobs': 64}, format='json')
+        self.assertEqual(response.data['options'], {'search': {'strategy': 'grid', 'cv': 2, 'n_jobs': 64}})
+
+        space = {'n_estimators': [3], 'max_depth': [2, None]}
+        with patch.object(BaseRetrainer, '_get_combined_data_for_retraining', return_value=self.training_data()), \
+                patch.object(RandomForestRetrainer, 'SEARCH_SPACE', space), \
+                self.settings(RETRAIN_SEARCH_MAX_JOBS=2):
+            call_command('run_retrain_worker', '--once', stdout=StringIO())
+
+        result = self.client.get(response.data['result_url']).data
+        self.assertEqual(result['status'], 'SUCCEEDED')
+        self.assertEqual(list(result['phase_timings']), ['preprocess', 'load', 'search', 'fit', 'save'])
+        search = result['hyperparameter_search']
+        self.assertEqual((search['strategy'], search['cv_folds'], search['n_jobs']), ('grid', 2, 2))  # CPU budget cap
+        self.assertEqual(search['candidates_evaluated'], 4)  # The loaded model's n_estimators=5 is a candidate too
+        self.assertEqual(search['candidates'][0]['params'], search['best_params'])
+        self.assertIn('mean_fit_seconds', search['candidates'][0])
+        new_model = joblib.load(MLAlgorithm.objects.get(pk=result['new_algorithm']['id']).model_file.path)
+        self.assertEqual(new_model.n_estimators, search['best_params']['n_estimators'])
+
+        from xgboost import XGBRegressor
+
+        from ml_api.retraining_logic import XGBoostRetrainer
+
+        X, y = self.training_data()
+        early = XGBRegressor(n_estimators=50, max_depth=2, early_stopping_rounds=3)
+        early.fit(X[:40], y[:40], eval_set=[(X[40:], y[40:])], verbose=False)
+        retrainer = object.__new__(XGBoostRetrainer)  # The search only needs its options
+        retrainer.search = {'strategy': 'grid', 'cv': 2, 'n_jobs': 1}
+        with patch.object(XGBoostRetrainer, 'SEARCH_SPACE', {'max_depth': [2, 3]}):
+            best_params = retrainer._search_hyperparameters(early, X, y)  # CV fits have no eval_set
+        self.assertIn(best_params['max_depth'], (2, 3))
+        self.assertEqual(early.early_stopping_rounds, 3)  # The loaded model is left as it was
+
+    def test_incremental_and_full_modes(self):
+        from ml_api.retraining_logic import BaseRetrainer, XGBoostRetrainer
+
+        url = reverse('ml_api:mlalgorithm-retrain', args=[self.forest.id])
+        self.assertEqual(self.client.post(url, {'mode': 'incremental', 'search': 'grid'}, format='json').status_code, 400)
+        self.forest.trained_through_claim_id = 10
+        self.forest.save()
+
+        job_id = self.client.post(url).data['job_id']  # Random forests default to incremental
+        with patch.object(BaseRetrainer, '_get_new_data_for_retraining', return_value=self.training_data()) as new_data, \
+                self.settings(RETRAIN_INCREMENTAL_MIN_ROWS=10, RETRAIN_RF_WARM_START_TREES=3):
+            call_command('run_retrain_worker', '--once', stdout=StringIO())
+        new_data.assert_called_once_with(10)
+        result = self.client.get(reverse('ml_api:retrainjob-result', args=[job_id])).data
+        self.assertEqual(result['mode'], 'incremental')
+        forest = joblib.load(MLAlgorithm.objects.get(pk=result['new_algorithm']['id']).model_file.path)
+        self.assertEqual((len(forest.estimators_), forest.warm_start), (8, False))  # 5 kept + 3 added
+
+        url = reverse('ml_api:mlalgorithm-retrain', args=[result['new_algorithm']['id']])  # v1.0.1 -> v1.0.2
+        job_id = self.client.post(url, {'mode': 'full'}, format='json').data['job_id']
+        with patch.object(BaseRetrainer, '_get_combined_data_for_retraining', return_value=self.training_data()):
+            call_command('run_retrain_worker', '--once', stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('ml_api:retrainjob-result', args=[job_id])).data['mode'], 'full')
+
+        from xgboost import XGBRegressor
+
+        from ml_api.retraining_logic import RandomForestRetrainer
+
+        X, y = self.training_data()
+        retrainer = object.__new__(RandomForestRetrainer)
+        newest = forest.estimators_[-1]
+        with self.settings(RETRAIN_RF_WARM_START_TREES=4, RETRAIN_RF_MAX_TREES=10):
+            forest = retrainer._fit_incremental(forest, X[:20], y[:20])
+        self.assertEqual((len(forest.estimators_), forest.n_estimators), (10, 10))  # 8 + 4, oldest 2 dropped
+        self.assertIs(forest.estimators_[5], newest)
+        np.testing.assert_allclose(
+            forest.predict(X[:5]), np.mean([tree.predict(X[:5].to_numpy()) for tree in forest.estimators_], axis=0)
+        )
+
+        booster = XGBRegressor(n_estimators=10, max_depth=2).fit(X, y)
+        retrainer = object.__new__(XGBoostRetrainer)  # _fit_incremental only needs the model and rows
+        with self.settings(RETRAIN_XGB_INCREMENTAL_ROUNDS=4):
+            booster = retrainer._fit_incremental(booster, X[:20], y[:20])
+        self.assertEqual(booster.get_booster().num_boosted_rounds(), 14)
+        self.assertEqual(booster.n_estimators, 10)
+
+        early = XGBRegressor(n_estimators=200, max_depth=2, learning_rate=0.5, early_stopping_rounds=3)
+        early.fit(X[:40], y[:40], eval_set=[(X[40:], y[40:])], verbose=False)
+        self.assertLess(early.best_iteration + 1, early.get_booster().num_boosted_rounds())
+        rounds = early.get_booster().num_boosted_rounds()
+        with self.settings(RETRAIN_XGB_INCREMENTAL_ROUNDS=4):
+            early = retrainer._fit_incremental(early, X[:20], y[:20])
+        self.assertEqual(early.get_booster().num_boosted_rounds(), rounds + 4)
+        self.assertIsNone(getattr(early, 'best_iteration', None))  # Predictions use the new rounds too
+        self.assertEqual(early.early_stopping_rounds, 3)
+        np.testing.assert_allclose(  # Same output as predicting with every round explicitly
+            early.predict(X[:5]), early.predict(X[:5], iteration_range=(0, rounds + 4)), rtol=1e-6,
+        )
+        retrainer._fit_model(early, X, y)  # A full refit has no validation set either
+        self.assertEqual(early.get_booster().num_boosted_rounds(), 200)
+
+    def test_failures_and_unsupported_types(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from ml_api.models import RetrainJob
+
+        response = self.client.post(reverse('ml_api:mlalgorithm-retrain', args=[self.algorithm.id]))
+        self.assertEqual(response.status_code, 501)  # No retrainer for 'OTHER' models; nothing is queued
+        self.assertFalse(RetrainJob.objects.exists())
+
+        job_id = self.client.post(reverse('ml_api:mlalgorithm-retrain', args=[self.forest.id])).data['job_id']
+        call_command('run_retrain_worker', '--once', stdout=StringIO())  # No claims database in the tests
+        result = self.client.get(reverse('ml_api:retrainjob-result', args=[job_id])).data
+        self.assertEqual(result['status'], 'FAILED')
+        self.assertIn("Cannot access 'claims' database", result['error'])
+
+        stale = RetrainJob.objects.create(
+            algorithm=self.forest, status=RetrainJob.STATUS_RUNNING,
+            started_at=timezone.now() - timedelta(days=1),
+        )
+        response = self.client.post(reverse('ml_api:mlalgorithm-retrain', args=[self.forest.id]))
+        self.assertNotEqual(response.data['job_id'], stale.pk)  # The dead worker's job no longer blocks retraining
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, RetrainJob.STATUS_FAILED)
+
+    def test_heartbeat_and_orphaned_jobs(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from ml_api.models import RetrainJob
+        from ml_api.retrain_jobs import fail_stale_jobs, worker_name
+
+        long_ago = timezone.now() - timedelta(days=1)
+        alive = RetrainJob.objects.create(  # Long search, but its worker still sends heartbeats
+            algorithm=self.forest, status=RetrainJob.STATUS_RUNNING, started_at=long_ago,
+            heartbeat_at=timezone.now(), worker='elsewhere:1',
+        )
+        dead = RetrainJob.objects.create(
+            algorithm=self.forest, status=RetrainJob.STATUS_RUNNING, started_at=timezone.now(),
+            heartbeat_at=long_ago, worker='elsewhere:2',
+        )
+        self.assertEqual(fail_stale_jobs(), 1)
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual((alive.status, dead.status), (RetrainJob.STATUS_RUNNING, RetrainJob.STATUS_FAILED))
+
+        restarted = RetrainJob.objects.create(  # Claimed by this host's previous worker, e.g. before a restart
+            algorithm=self.algorithm, status=RetrainJob.STATUS_RUNNING, started_at=timezone.now(),
+            heartbeat_at=timezone.now(), worker=worker_name(),
+        )
+        call_command('run_retrain_worker', '--once', stdout=StringIO())
+        restarted.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(restarted.status, RetrainJob.STATUS_FAILED)
+        self.assertIn('exited', restarted.error)
+        self.assertEqual(alive.status, RetrainJob.STATUS_RUNNING)  # Another host's job is left alone
+
+
+class ColumnarRetrainExtractTests(TestCase):
+    def test_fill_columns_grows_and_maps_none_to_nan(self):
+        from ml_api.retrain_preprocessing import fill_columns
+
+        rows = ((i, None if i % 2 else i * 2.5) for i in range(7))
+        columns = fill_columns(rows, 2, expected_rows=3, chunk_size=2)  # More rows than expected
+        self.assertEqual(columns.shape, (7, 2))
+        self.assertEqual(columns[:, 0].tolist(), list(range(7)))
+        self.assertTrue(np.isnan(columns[1, 1]))
+        self.assertEqual(fill_columns(iter(()), 2, expected_rows=5).shape, (0, 2))
+
+    def test_matches_the_object_path(self):
+        from decimal import Decimal
+        from types import SimpleNamespace
+
+        from ml_api.retrain_preprocessing import (
+            CLAIM_FIELD_COLUMNS, EXTRACT_COLUMNS, preprocess_claim_columns, preprocess_claim_objects,
+        )
+
+        rng = np.random.default_rng(5)
+        values = np.round(rng.random((40, len(EXTRACT_COLUMNS))) * 100, 2)
+        for col in ('specialhealthexpenses', 'specialfixes', 'specialrehabilitation', 'specialadditionalinjury'):
+            values[:, EXTRACT_COLUMNS.index(col)] = 0  # Claims with these amounts are filtered in SQL
+        prognosis = EXTRACT_COLUMNS.index('injuryprognosis')
+        values[:, prognosis] = rng.integers(1, 30, 40)
+        values[::4, prognosis] = np.nan  # Accidents without an Injury
+
+        claims = []
+        for row in values:
+            injury = None if np.isnan(row[prognosis]) else SimpleNamespace(injury_prognosis=int(row[prognosis]))
+            claim = SimpleNamespace(accident=SimpleNamespace(injury=injury), claim_date=None)
+            for col, field in CLAIM_FIELD_COLUMNS.items():
+                setattr(claim, field, Decimal(f"{row[EXTRACT_COLUMNS.index(col)]:.2f}"))
+            claims.append(claim)
+
+        X_obj, y_obj = preprocess_claim_objects(claims)
+        X_col, y_col = preprocess_claim_columns(values.copy())
+        self.assertEqual(list(X_col.columns), FEATURE_NAMES)
+        np.testing.assert_allclose(X_col.to_numpy(dtype=np.float64), X_obj.to_numpy(dtype=np.float64))
+        np.testing.assert_allclose(y_col.to_numpy(), y_obj.to_numpy(dtype=np.float64))
+        self.assertEqual(X_col['injuryprognosis'].iloc[0], 7)  # Missing prognosis = 25 months
+
+
+class TrainingSnapshotTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def frames(self, n_rows, seed):
+        import pandas as pd
+
+        values = np.random.default_rng(seed).random((n_rows, len(FEATURE_NAMES) + 1))
+        return pd.DataFrame(values[:, :-1], columns=FEATURE_NAMES), pd.Series(values[:, -1])
+
+    def test_appends_and_memory_maps_committed_rows(self):
+        from ml_api.training_snapshot import X_FILE, append_rows, load_snapshot, read_meta
+
+        X1, y1 = self.frames(5, 1)
+        X2, y2 = self.frames(3, 2)
+        append_rows(X1, y1, watermark=10, directory=self.directory)
+        with open(os.path.join(self.directory, X_FILE), 'ab') as fh:
+            fh.write(b'\0' * 40)  # Torn append: data written, meta.json never replaced
+        meta = append_rows(X2, y2, watermark=17, directory=self.directory)
+        self.assertEqual((meta['rows'], meta['watermark']), (8, 17))
+
+        X, y = load_snapshot(self.directory)
+        self.assertEqual(list(X.columns), FEATURE_NAMES)
+        np.testing.assert_array_equal(X.to_numpy(), np.vstack([X1.to_numpy(), X2.to_numpy()]))
+        np.testing.assert_array_equal(y.to_numpy(), np.concatenate([y1.to_numpy(), y2.to_numpy()]))
+
+        append_rows(X2, y2, watermark=17, directory=self.directory, rebuild=True)
+        self.assertEqual(read_meta(self.directory)['rows'], 3)
+        self.assertEqual(load_snapshot(tempfile.mkdtemp())[0].shape, (0, 0))
+
+    def test_rebuilds_when_old_or_layout_changed(self):
+        import time
+
+        from ml_api.training_snapshot import _is_stale
+
+        meta = {'rows': 1, 'columns': FEATURE_NAMES, 'created_at': time.time()}
+        self.assertFalse(_is_stale(meta))
+        self.assertTrue(_is_stale(None))
+        self.assertTrue(_is_stale(dict(meta, columns=FEATURE_NAMES[:-1])))
+        self.assertTrue(_is_stale(dict(meta, created_at=time.time() - 8 * 86400)))
+        with self.settings(TRAINING_SNAPSHOT_REBUILD_DAYS=0):
+            self.assertFalse(_is_stale(dict(meta, created_at=0)))
+
+
+@test_media_settings
+class ExplanationPrecomputeTests(ModelArtifactMixin, TransactionTestCase):  # Explained on background threads
+    def setUp(self):
+        super().setUp()
+        explainer_cache.clear()
+        self.forest = self.register_forest()
+
+    def tearDown(self):
+        explanation_precomputer.shutdown()
+        explainer_cache.clear()
+        super().tearDown()
+
+    def status(self, request_id, method='get'):
+        return getattr(self.client, method)(reverse('ml_api:mlrequest-explanation-status', args=[request_id]))
+
+    def test_predict_queues_explanation_and_status_reports_it(self):
+        response = self.client.post(
+            reverse('ml_api:mlalgorithm-predict', args=[self.forest.id]) + '?explain=true',
+            {'input_data': [[0.2, 0.5, 0.9]]}, format='json',
+        )
+        self.assertEqual(response.data['explanation_status'], 'pending')
+        request_id = response.data['request_id']
+        explanation_precomputer.flush()
+
+        status = self.status(request_id).data
+        self.assertEqual(status['status'], 'ready')
+        self.assertTrue(status['explainer_version'].startswith('TreeExplainer/shap-'))
+        values, _, _ = compute_shap(self.forest.id, self.forest.model_file.name, [[0.2, 0.5, 0.9]])
+        np.testing.assert_allclose(MLRequestExplanation.objects.get(request_id=request_id).shap_values, values)
+        explain = self.client.get(reverse('ml_api:mlrequest-explain', args=[request_id]))
+        self.assertTrue(explain.data['stored'])
+
+        response = self.client.post(  # Not queued unless asked for
+            reverse('ml_api:mlalgorithm-predict', args=[self.forest.id]), {'input_data': [[0.1, 0.1, 0.1]]},
+            format='json',
+        )
+        self.assertNotIn('explanation_status', response.data)
+        self.assertEqual(self.status(response.data['request_id']).data['status'], 'none')
+
+    def test_post_queues_and_failures_are_reported(self):
+        ml_request = MLRequest.objects.create(
+            input_data=[[1.0, 2.0, 3.0]], prediction=[0.0], algorithm=self.register_unexplainable(),
+        )
+        self.assertEqual(self.status(ml_request.id).data['status'], 'none')
+        self.assertEqual(self.status(ml_request.id, 'post').data['status'], 'pending')
+        explanation_precomputer.flush()
+
+        status = self.status(ml_request.id).data  # SHAP cannot explain the KNN model
+        self.assertEqual(status['status'], 'failed')
+        self.assertIn('ExplainerUnavailable', status['error'])
+        self.assertEqual(explanation_precomputer.stats()['failed'], 1)
+
+        forest_request = MLRequest.objects.create(input_data=[[0.3, 0.3, 0.3]], prediction=[0.9], algorithm=self.forest)
+        MLRequestExplanation.objects.create(request=forest_request, status=MLRequestExplanation.STATUS_PENDING)
+        explain = self.client.get(reverse('ml_api:mlrequest-explain', args=[forest_request.id]))
+        self.assertFalse(explain.data['stored'])  # A PENDING row is computed on demand and replaced
+        self.assertEqual(self.status(forest_request.id).data['status'], 'ready')
+
+
+@test_media_settings
+@override_settings(ROOT_URLCONF='config.urls_asgi')
+class AsyncPredictTests(ModelArtifactMixin, TransactionTestCase):  # Log rows are written from another thread
+    async def test_async_predict_matches_sync_response(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        from ml_api.async_views import _log_tasks
+
+        response = await AsyncClient().post(
+            f'/api/algorithms/{self.algorithm.id}/predict/', {'input_data': [[1.0, 2.0, 3.0]]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        expected = joblib.load(self.model_path).predict(np.array([[1.0, 2.0, 3.0]]))
+        np.testing.assert_allclose(data['prediction'], expected)
+        self.assertTrue(response['Server-Timing'].startswith('lookup;dur='))
+        for task in list(_log_tasks):
+            await task  # The log write runs after the response
+        logged = await sync_to_async(MLRequest.objects.filter(request_uuid=data['request_id']).exists)()
+        self.assertTrue(logged)
+
+    async def test_async_predict_validation_and_overload(self):
+        from django.test import AsyncClient
+
+        from ml_api.async_views import inference_pool
+
+        url = f'/api/algorithms/{self.algorithm.id}/predict/'
+        response = await AsyncClient().post(url, {'input_data': [[1.0, 'a', 3.0]]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('row 0, column 1', response.content.decode())
+
+        in_flight = inference_pool.in_flight
+        inference_pool.in_flight = inference_pool.max_workers + inference_pool.max_pending  # Saturate
+        try:
+            response = await AsyncClient().post(url, {'input_data': [[1.0, 2.0, 3.0]]}, content_type='application/json')
+        finally:
+            inference_pool.in_flight = in_flight
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    async def test_async_explain_svg_output(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        ml_request = await sync_to_async(MLRequest.objects.create)(
+            input_data=[[0.2, 0.5, 0.9]], prediction=[1.6], algorithm=self.algorithm,
+        )
+        url = f'/api/requests/{ml_request.id}/explain/'
+        response = await AsyncClient().get(url, {'output': 'svg'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertTrue(response.content.startswith(b'<svg'))
+        response = await AsyncClient().get(url, {'output': 'contributions'})
+        self.assertEqual(response.status_code, 200)
+
+
+class EndpointRoutingTests(MLaaSTestCase):
+    def test_predict_by_endpoint_follows_active_model_swap(self):
+        from ml_api.routing import routing_table
+
+        other = MLAlgorithm.objects.create(
+            name='Linear', version='2.0.0', model_file=self.model_path,
+            parent_endpoint=self.endpoint, is_active=False,
+        )
+        by_name = reverse('ml_api:endpoint-predict', args=[self.endpoint.name])
+        payload = {'input_data': [[1.0, 2.0, 3.0]]}
+        self.client.post(by_name, payload, format='json')
+        self.assertEqual(MLRequest.objects.latest('id').algorithm_id, self.algorithm.id)
+
+        rebuilds = routing_table.rebuilds
+        self.client.post(by_name, payload, format='json')
+        self.assertEqual(routing_table.rebuilds, rebuilds)  # Served from the cached table
+
+        self.client.post(reverse('ml_api:engineer_set_active_model'), {'model_id': other.id}, format='json')
+        response = self.client.post(
+            reverse('ml_api:endpoint-predict', args=[self.endpoint.id]), payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MLRequest.objects.latest('id').algorithm_id, other.id)
+
+    def test_route_ignores_saves_to_other_active_names(self):
+        from ml_api.routing import routing_table
+
+        other = MLAlgorithm.objects.create(
+            name='Other Linear', version='1.0.0', model_file=self.model_path, parent_endpoint=self.endpoint,
+        )
+        self.assertIsNone(routing_table.resolve(self.endpoint.name))  # Two names, no primary: ambiguous
+
+        self.endpoint.primary_algorithm_name = 'Linear'
+        self.endpoint.save()
+        self.assertEqual(routing_table.resolve(self.endpoint.name).id, self.algorithm.id)
+
+        other.description = 'Edited'
+        other.save()
+        self.assertEqual(routing_table.resolve(self.endpoint.id).id, self.algorithm.id)
+
+        self.client.post(reverse('ml_api:engineer_set_active_model'), {'model_id': other.id}, format='json')
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.primary_algorithm_name, 'Other Linear')
+        self.assertEqual(routing_table.resolve(self.endpoint.name).id, other.id)
+        self.algorithm.description = 'Edited'
+        self.algorithm.save()
+        self.assertEqual(routing_table.resolve(self.endpoint.name).id, other.id)
+
+    def test_unknown_endpoint_returns_404(self):
+        response = self.client.post(
+            reverse('ml_api:endpoint-predict', args=['missing']), {'input_data': [[1.0]]}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class WarmupTests(MLaaSTestCase):
+    def test_warmup_loads_active_models_and_reports_ready(self):
+        from ml_api.warmup import warm_active_models
+
+        summary = warm_active_models()
+        self.assertEqual(summary[0]['status'], 'ok')
+        self.assertEqual(model_cache.stats()['cached_algorithm_ids'], [self.algorithm.id])
+        response = self.client.get(reverse('ml_api:readiness'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['ready'])
+
+    def test_unreachable_database_keeps_readiness_at_503(self):
+        import threading
+
+        from django.db import OperationalError
+
+        from ml_api import warmup
+
+        with patch.object(warmup, '_warmup_done', threading.Event()), \
+                patch.object(MLAlgorithm.objects, 'filter', side_effect=OperationalError('no such column')):
+            self.assertEqual(warmup.warm_active_models(), [])  # Logged, not raised
+            self.assertFalse(warmup._warmup_started)
+            with patch('ml_api.views.ensure_warmup_started') as ensure_started:
+                response = self.client.get(reverse('ml_api:readiness'))
+        self.assertEqual(response.status_code, 503)
+        ensure_started.assert_called_once()  # The probe retries warm-up
+
+
+@test_media_settings
+class AsyncRequestLoggingTests(TransactionTestCase):
+    def setUp(self):
+        self.endpoint = Endpoint.objects.create(name='Test Endpoint', owner='Tests')
+        self.algorithm = MLAlgorithm.objects.create(
+            name='Linear', version='1.0.0', model_file='linear.pkl', parent_endpoint=self.endpoint,
+        )
+
+    def test_rows_are_written_in_batches_and_found_by_uuid(self):
+        from ml_api.request_logger import MLRequestWriter
+
+        writer = MLRequestWriter(max_queue_size=10, batch_size=2, flush_interval=0.05, overflow_policy='sync')
+        request_ids = [
+            writer.submit(input_data=[[1, 2, 3]], prediction=[1.0], algorithm=self.algorithm, response_time=0.01)
+            for _ in range(3)
+        ]
+        writer.flush()
+        writer.shutdown()
+        self.assertEqual(writer.written, 3)
+        self.assertEqual(MLRequest.objects.filter(request_uuid__in=request_ids).count(), 3)
+
+        response = APIClient().get(reverse('ml_api:mlrequest-detail', args=[request_ids[0]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['request_uuid'], str(request_ids[0]))
@@ -0,0 +1,143 @@
+# ml_api/timing.py
+"""
+Per-stage latency accounting for predict requests.
+
+A StageTimer is created per request and records how long each stage took:
+
+  lookup       - resolving the MLAlgorithm (by ID, or through the routing table)
+  validate     - parsing the body and validating the feature matrix
+  model_fetch  - getting the runtime model from the per-worker model cache
+  predict      - prediction cache lookups and model.predict
+  log_write    - writing (or enqueueing) the MLRequest row
+  serialize    - rendering the response body
+
+The durations are sent in a Server-Timing header (when PREDICT_SERVER_TIMING
+is set), returned as a `timings` block when the client asks with
+?timings=true, and added to a per-algorithm, per-stage latency histogram that
+the metrics endpoint exposes.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PREDICT_STAGES = ("lookup", "validate", "model_fetch", "predict", "log_write", "serialize")
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)  # Upper bounds in milliseconds
+
+
+class StageTimer:
+    """Collects wall-clock durations of the named stages of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}  # stage -> seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the enclosed block as `name` (repeated blocks accumulate)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        """Adds `seconds` to a stage."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        """Seconds since the timer was created."""
+        return time.perf_counter() - self.started
+
+    def timings_ms(self) -> dict:
+        """Returns {stage: milliseconds} in pipeline order plus the running total, rounded for JSON."""
+        names = [name for name in PREDICT_STAGES if name in self.durations]
+        names += [name for name in self.durations if name not in PREDICT_STAGES]
+        timings = {name: round(self.durations[name] * 1000, 3) for name in names}
+        timings["total"] = round(self.total() * 1000, 3)
+        return timings
+
+    def server_timing_header(self) -> str:
+        """Formats the stages as a Server-Timing header value (durations in ms)."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings_ms().items())
+
+
+def timings_requested(query_params) -> bool:
+    """True when the client asked for the `timings` block (?timings=true|1)."""
+    return str(query_params.get("timings", "")).lower() in ("1", "true", "yes")
+
+
+class StageLatencyHistograms:
+    """Per-algorithm, per-stage latency histograms for this worker process."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._histograms = {}  # (algorithm_id, stage) -> [count, sum_ms, max_ms, bucket counts..., overflow]
+        self._lock = threading.Lock()
+
+    def observe(self, algorithm_id: int, timer: StageTimer):
+        """Adds every stage of a finished request (and its total) to the histograms."""
+        observations = [(name, seconds * 1000) for name, seconds in timer.durations.items()]
+        observations.append(("total", timer.total() * 1000))
+        with self._lock:
+            for name, ms in observations:
+                histogram = self._histograms.get((algorithm_id, name))
+                if histogram is None:
+                    histogram = self._histograms[(algorithm_id, name)] = [0, 0.0, 0.0] + [0] * (len(self.buckets_ms) + 1)
+                histogram[0] += 1
+                histogram[1] += ms
+                histogram[2] = max(histogram[2], ms)
+                for index, bound in enumerate(self.buckets_ms):
+                    if ms <= bound:
+                        histogram[3 + index] += 1
+                        break
+                else:
+                    histogram[-1] += 1
+
+    def _quantile_bound(self, histogram, q: float):
+        """Upper bucket bound below which a fraction q of the observations fall (None if it overflows)."""
+        target = q * histogram[0]
+        running = 0
+        for bound, count in zip(self.buckets_ms, histogram[3:-1]):
+            running += count
+            if running >= target:
+                return bound
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def stats(self) -> dict:
+        """Returns {algorithm_id: {stage: histogram summary}} for the metrics endpoint."""
+        with self._lock:
+            snapshot = {key: list(histogram) for key, histogram in self._histograms.items()}
+        stats = {}
+        for (algorithm_id, name), histogram in sorted(snapshot.items(), key=lambda item: (item[0][0], item[0][1])):
+            buckets = {f"le_{bound}": count for bound, count in zip(self.buckets_ms, histogram[3:-1])}
+            buckets[f"gt_{self.buckets_ms[-1]}"] = histogram[-1]
+            stats.setdefault(str(algorithm_id), {})[name] = {
+                "count": histogram[0],
+                "mean_ms": round(histogram[1] / histogram[0], 3),
+                "max_ms": round(histogram[2], 3),
+                "p50_le_ms": self._quantile_bound(histogram, 0.50),
+                "p95_le_ms": self._quantile_bound(histogram, 0.95),
+                "p99_le_ms": self._quantile_bound(histogram, 0.99),
+                "histogram_ms": buckets,
+            }
+        return stats
+
+
+def finish_request_timing(response, algorithm_id, timer: StageTimer):
+    """Sets the Server-Timing header on a predict response and records the request in the histograms."""
+    if settings.PREDICT_SERVER_TIMING:
+        response["Server-Timing"] = timer.server_timing_header()
+    if algorithm_id is not None:
+        stage_latency.observe(algorithm_id, timer)
+    return response
+
+
+# Module-level histograms shared by the request threads of this worker process
+stage_latency = StageLatencyHistograms()
@@ -0,0 +1,187 @@
+# ml_api/training_snapshot.py
+"""
+Incremental snapshot of the preprocessed retraining dataset.
+
+Instead of re-reading and re-preprocessing the whole claims table on every
+retrain, the preprocessed feature matrix and target are kept under
+MEDIA_ROOT/TRAINING_SNAPSHOT_DIR as raw float64 files (X.f64 row-major with one
+column per FINAL_FEATURE_COLUMNS_ORDERED entry, y.f64) plus meta.json. The
+meta file records the row count, the column layout and the watermark: the
+highest claim ID already covered. A refresh extracts only claims with a
+higher ID (retrain_preprocessing_columnar) and appends their rows; loading
+memory-maps the files, so it costs the same for any history length.
+
+Appends write the data files first and replace meta.json atomically last, so
+a refresh that dies halfway leaves bytes past the recorded row count; they
+are ignored on load and truncated by the next refresh. Refreshes take an
+exclusive lock on a lock file in the snapshot directory.
+
+Claims are append-only by ID here: edits to or deletions of claims that are
+already covered are not seen. Nor are late commits: the watermark is the
+highest claim ID visible when a refresh starts, but PostgreSQL hands out IDs
+at insert time, so a claim whose transaction commits after that read with a
+lower ID is skipped. The same holds for MLAlgorithm.trained_through_claim_id
+in incremental retraining. The snapshot is therefore rebuilt from scratch
+when it is older than TRAINING_SNAPSHOT_REBUILD_DAYS, when the column layout
+changes, or on request (manage.py refresh_training_snapshot --rebuild); a
+full refit covers such claims for a model.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import Max
+
+from .retrain_preprocessing import FINAL_FEATURE_COLUMNS_ORDERED, TARGET_COLUMN, retrain_preprocessing_columnar
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+X_FILE = 'X.f64'
+Y_FILE = 'y.f64'
+LOCK_FILE = '.lock'
+
+
+def snapshot_dir() -> str:
+    """Absolute directory of the snapshot files."""
+    return os.path.join(settings.MEDIA_ROOT, settings.TRAINING_SNAPSHOT_DIR)
+
+
+def read_meta(directory: str = None):
+    """Returns the snapshot's meta.json contents, or None if there is no snapshot."""
+    path = os.path.join(directory or snapshot_dir(), META_FILE)
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(directory: str, meta: dict):
+    """Replaces meta.json atomically; this is the commit point of an append."""
+    tmp_path = os.path.join(directory, f"{META_FILE}.tmp")
+    with open(tmp_path, 'w') as fh:
+        json.dump(meta, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, os.path.join(directory, META_FILE))
+
+
+@contextlib.contextmanager
+def _locked(directory: str):
+    """Exclusive lock so only one process refreshes the snapshot at a time."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _is_stale(meta) -> bool:
+    """True if the snapshot must be rebuilt: missing, different layout, or older than the rebuild interval."""
+    if meta is None or meta.get('columns') != FINAL_FEATURE_COLUMNS_ORDERED:
+        return True
+    max_age = settings.TRAINING_SNAPSHOT_REBUILD_DAYS * 86400
+    return bool(max_age) and time.time() - meta['created_at'] > max_age
+
+
+def append_rows(X: pd.DataFrame, y: pd.Series, watermark: int, directory: str = None, rebuild: bool = False) -> dict:
+    """
+    Appends preprocessed rows to the snapshot and advances its watermark.
+    The caller holds the refresh lock.
+
+    Args:
+        X: Features in FINAL_FEATURE_COLUMNS_ORDERED order (may be empty).
+        y: Target, one value per row of X.
+        watermark: Highest claim ID covered once these rows are stored.
+        directory: Snapshot directory (defaults to snapshot_dir()).
+        rebuild: Discard the existing rows first.
+
+    Returns:
+        dict: The new meta.json contents.
+    """
+    directory = directory or snapshot_dir()
+    meta = None if rebuild else read_meta(directory)
+    if meta is None:
+        for name in (X_FILE, Y_FILE, META_FILE):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, name))
+        meta = {'rows': 0, 'columns': FINAL_FEATURE_COLUMNS_ORDERED, 'created_at': time.time()}
+
+    n_features = len(FINAL_FEATURE_COLUMNS_ORDERED)
+    rows = np.ascontiguousarray(X[FINAL_FEATURE_COLUMNS_ORDERED].to_numpy(dtype=np.float64)) if len(X) else (
+        np.empty((0, n_features))
+    )
+    target = np.ascontiguousarray(y.to_numpy(dtype=np.float64)) if len(y) else np.empty(0)
+    for name, block, row_bytes in ((X_FILE, rows, n_features * 8), (Y_FILE, target, 8)):
+        with open(os.path.join(directory, name), 'ab') as fh:
+            fh.truncate(meta['rows'] * row_bytes)  # Drop bytes of an append that never committed
+            fh.write(block.tobytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    meta.update(rows=meta['rows'] + rows.shape[0], watermark=int(watermark), updated_at=time.time())
+    _write_meta(directory, meta)
+    return meta
+
+
+def load_snapshot(directory: str = None) -> tuple:
+    """
+    Memory-maps the snapshot as (X, y) (read-only, float64) for the committed row count.
+    Returns empty frames if there is no snapshot or it has no rows.
+    """
+    directory = directory or snapshot_dir()
+    meta = read_meta(directory)
+    if not meta or not meta['rows']:
+        return pd.DataFrame(), pd.Series(dtype='float64')
+    n_rows, columns = meta['rows'], meta['columns']
+    X = np.memmap(os.path.join(directory, X_FILE), dtype=np.float64, mode='r', shape=(n_rows, len(columns)))
+    y = np.memmap(os.path.join(directory, Y_FILE), dtype=np.float64, mode='r', shape=(n_rows,))
+    return pd.DataFrame(X, columns=columns, copy=False), pd.Series(y, name=TARGET_COLUMN, copy=False)
+
+
+def refresh_snapshot(claims_queryset, rebuild: bool = False, directory: str = None) -> dict:
+    """
+    Preprocesses the claims added since the watermark and appends them to the snapshot.
+
+    Args:
+        claims_queryset: All Claim objects that belong in the training set.
+        rebuild: Re-extract every claim even if the snapshot is current.
+        directory: Snapshot directory (defaults to snapshot_dir()).
+
+    Returns:
+        dict: {"rows": total rows, "appended": rows added, "watermark": highest claim ID,
+               "rebuilt": bool, "seconds": refresh time}
+    Raises:
+        EnvironmentError: If the 'claims' models cannot be accessed.
+    """
+    directory = directory or snapshot_dir()
+    start = time.perf_counter()
+    with _locked(directory):
+        meta = read_meta(directory)
+        rebuild = rebuild or _is_stale(meta)
+        watermark = 0 if rebuild else meta.get('watermark', 0)
+        # Upper bound taken before extracting, so claims added meanwhile wait for the next refresh
+        high_watermark = claims_queryset.aggregate(max_id=Max('pk'))['max_id'] or 0
+        X, y = pd.DataFrame(), pd.Series(dtype='float64')
+        if high_watermark > watermark:
+            X, y = retrain_preprocessing_columnar(claims_queryset.filter(pk__gt=watermark, pk__lte=high_watermark))
+        meta = append_rows(X, y, max(watermark, high_watermark), directory, rebuild=rebuild)
+    summary = {
+        "rows": meta['rows'],
+        "appended": len(X),
+        "watermark": meta['watermark'],
+        "rebuilt": rebuild,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    logger.info("Training snapshot refreshed: %s", summary)
+    return summary
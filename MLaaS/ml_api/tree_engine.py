@@ -0,0 +1,269 @@
+# ml_api/tree_engine.py
+"""
+Compiled, array-based inference for tree ensembles.
+
+A fitted scikit-learn RandomForestRegressor or XGBoost regressor is converted
+into flat NumPy arrays (feature index, threshold, left/right child and node
+value for every node of every tree). Prediction walks all trees for all rows
+at once, one tree level per step, which avoids the per-call input checking
+and Python dispatch of the original estimators. This matters most for the
+single-row requests that make up most claim traffic.
+
+Compiled ensembles are saved as a `.trees.npz` sidecar next to the pickle and
+are only written after their output has been checked against the original
+model (see compile_and_verify).
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COMPILED_SUFFIX = '.trees.npz'
+VERIFY_ROWS = 512  # Synthetic rows used to compare compiled and original predictions
+VERIFY_RTOL = 1e-5
+VERIFY_ATOL = 1e-6
+
+# XGBoost objectives whose prediction is the raw margin (identity link)
+XGBOOST_IDENTITY_OBJECTIVES = (
+    'reg:squarederror', 'reg:squaredlogerror', 'reg:pseudohubererror',
+    'reg:absoluteerror', 'reg:quantileerror',
+)
+
+
+class TreeCompilationError(Exception):
+    """Raised when a model cannot be compiled or its compiled output does not match."""
+    pass
+
+
+class CompiledTreeEnsemble:
+    """
+    Flat-array tree ensemble with a predict() compatible with the estimators it replaces.
+
+    Nodes of all trees share one set of arrays; feature == -1 marks a leaf.
+    Splits go left when `x <= threshold` (scikit-learn) or `x < threshold`
+    (XGBoost). Both libraries round features to float32 before comparing, so
+    the input is rounded the same way; thresholds are kept in float64.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, n_features,
+                 split_rule='le', aggregate='mean', base_score=0.0, source=''):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.n_features_in_ = int(n_features)
+        self.split_rule = split_rule
+        self.aggregate = aggregate
+        self.base_score = float(base_score)
+        self.source = source  # Class name of the original estimator
+        self.max_depth = self._depth()
+        # Leaves point at themselves, so rows that reach a leaf early stay put
+        node_ids = np.arange(self.feature.shape[0], dtype=np.int32)
+        is_leaf = self.feature < 0
+        self._left = np.where(is_leaf, node_ids, self.left)
+        self._right = np.where(is_leaf, node_ids, self.right)
+        self._feature = np.where(is_leaf, 0, self.feature)
+
+    def _depth(self) -> int:
+        """Returns the number of levels needed to reach every leaf."""
+        depth = 0
+        frontier = self.roots
+        while frontier.size:
+            frontier = frontier[self.feature[frontier] >= 0]
+            if not frontier.size:
+                break
+            frontier = np.concatenate([self.left[frontier], self.right[frontier]])
+            depth += 1
+        return depth
+
+    def predict(self, X):
+        """Predicts a (rows, features) matrix; returns a 1-D float64 array."""
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)  # Same rounding as the original estimators
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[-1]} features, but the compiled ensemble expects {self.n_features_in_}."
+            )
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.shape[0]))
+        for _ in range(self.max_depth):
+            x = X[rows, self._feature[nodes]]
+            if self.split_rule == 'le':
+                go_left = x <= self.threshold[nodes]
+            else:
+                go_left = x < self.threshold[nodes]
+            nodes = np.where(go_left, self._left[nodes], self._right[nodes])
+        leaf_values = self.value[nodes]
+        if self.aggregate == 'mean':
+            return leaf_values.mean(axis=1)
+        return leaf_values.sum(axis=1) + self.base_score
+
+    def save(self, path: str):
+        """Writes the arrays and metadata to an .npz file (written atomically)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots,
+            meta=np.array(json.dumps({
+                'n_features': self.n_features_in_, 'split_rule': self.split_rule,
+                'aggregate': self.aggregate, 'base_score': self.base_score, 'source': self.source,
+            })),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads an ensemble written by save(); usable as a model_cache loader."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(
+                data['feature'], data['threshold'], data['left'], data['right'],
+                data['value'], data['roots'], meta['n_features'],
+                split_rule=meta['split_rule'], aggregate=meta['aggregate'],
+                base_score=meta['base_score'], source=meta['source'],
+            )
+
+
+def _concat_trees(trees):
+    """Concatenates per-tree node arrays, offsetting child indices; returns the flat arrays."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for feature, threshold, left, right, value in trees:
+        is_leaf = feature < 0
+        features.append(np.where(is_leaf, -1, feature))
+        thresholds.append(threshold)
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        values.append(value)
+        roots.append(offset)
+        offset += feature.shape[0]
+    return (np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+            np.concatenate(rights), np.concatenate(values), np.array(roots))
+
+
+def compile_sklearn_forest(model) -> CompiledTreeEnsemble:
+    """Compiles a fitted single-output scikit-learn forest regressor."""
+    estimators = getattr(model, 'estimators_', None)
+    if not estimators or getattr(model, 'n_outputs_', 1) != 1 or not hasattr(model, 'n_features_in_'):
+        raise TreeCompilationError(f"{type(model).__name__} is not a fitted single-output forest regressor.")
+    trees = []
+    for estimator in estimators:
+        tree = estimator.tree_
+        if tree.value.shape[1:] != (1, 1):
+            raise TreeCompilationError("Only single-output regression trees can be compiled.")
+        trees.append((tree.feature, tree.threshold, tree.children_left, tree.children_right, tree.value[:, 0, 0]))
+    arrays = _concat_trees(trees)
+    return CompiledTreeEnsemble(
+        *arrays, n_features=model.n_features_in_, split_rule='le', aggregate='mean',
+        source=type(model).__name__,
+    )
+
+
+def compile_xgboost(model) -> CompiledTreeEnsemble:
+    """Compiles a fitted single-target XGBoost gbtree regressor with an identity-link objective."""
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    learner = json.loads(booster.save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    if objective not in XGBOOST_IDENTITY_OBJECTIVES:
+        raise TreeCompilationError(f"XGBoost objective '{objective}' is not supported.")
+    if learner['gradient_booster'].get('name') != 'gbtree':
+        raise TreeCompilationError("Only the gbtree booster can be compiled.")
+    model_param = learner['learner_model_param']
+    if int(model_param.get('num_class', 0)) > 1 or int(model_param.get('num_target', 1)) != 1:
+        raise TreeCompilationError("Only single-target XGBoost models can be compiled.")
+    base_score = float(model_param['base_score'].strip('[]'))
+
+    gbtree_model = learner['gradient_booster']['model']
+    tree_dumps = gbtree_model['trees']
+    try:
+        best_iteration = model.best_iteration  # Set by early stopping; predict() stops there
+    except AttributeError:
+        best_iteration = None
+    if best_iteration is not None:
+        tree_dumps = tree_dumps[:int(gbtree_model['iteration_indptr'][best_iteration + 1])]
+
+    trees = []
+    for tree in tree_dumps:
+        if any(tree.get('split_type', [])) or tree.get('categories'):
+            raise TreeCompilationError("Categorical XGBoost splits are not supported.")
+        left = np.asarray(tree['left_children'], dtype=np.int32)
+        trees.append((
+            np.where(left < 0, -1, np.asarray(tree['split_indices'], dtype=np.int32)),
+            np.asarray(tree['split_conditions'], dtype=np.float32),
+            left,
+            np.asarray(tree['right_children'], dtype=np.int32),
+            np.asarray(tree['split_conditions'], dtype=np.float64),  # Leaf nodes store their value here
+        ))
+    arrays = _concat_trees(trees)
+    return CompiledTreeEnsemble(
+        *arrays, n_features=int(model_param['num_feature']), split_rule='lt', aggregate='sum',
+        base_score=base_score, source=type(model).__name__,
+    )
+
+
+def compile_model(model) -> CompiledTreeEnsemble:
+    """
+    Compiles a supported tree ensemble.
+
+    Raises:
+        TreeCompilationError: If the model type or configuration is not supported.
+    """
+    module = type(model).__module__
+    if module.startswith('xgboost'):
+        return compile_xgboost(model)
+    if module.startswith('sklearn.ensemble') and type(model).__name__ in (
+            'RandomForestRegressor', 'ExtraTreesRegressor'):
+        return compile_sklearn_forest(model)
+    raise TreeCompilationError(f"No tree compiler for {type(model).__name__}.")
+
+
+def verification_rows(compiled: CompiledTreeEnsemble, n_rows: int = VERIFY_ROWS) -> np.ndarray:
+    """Random rows spread over each feature's split thresholds, so both sides of most splits are taken."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n_rows, compiled.n_features_in_))
+    for f in range(compiled.n_features_in_):
+        thresholds = compiled.threshold[compiled.feature == f]
+        if thresholds.size:
+            X[:, f] = rng.choice(thresholds, size=n_rows) + rng.normal(scale=1e-3, size=n_rows)
+    return X
+
+
+def compile_and_verify(model, compiled_path: str) -> CompiledTreeEnsemble:
+    """
+    Compiles a model, checks it against the original's predictions and saves it.
+
+    Args:
+        model: The fitted estimator.
+        compiled_path: Where to write the `.trees.npz` file.
+
+    Returns:
+        CompiledTreeEnsemble: The verified ensemble.
+    Raises:
+        TreeCompilationError: If compilation fails or outputs differ beyond tolerance.
+    """
+    compiled = compile_model(model)
+    X = verification_rows(compiled)
+    expected = np.asarray(model.predict(X), dtype=np.float64).ravel()
+    actual = compiled.predict(X)
+    if not np.allclose(actual, expected, rtol=VERIFY_RTOL, atol=VERIFY_ATOL):
+        worst = float(np.max(np.abs(actual - expected)))
+        raise TreeCompilationError(
+            f"Compiled predictions differ from {type(model).__name__} by up to {worst:.3g}."
+        )
+    compiled.save(compiled_path)
+    logger.info(
+        "Compiled %s into %d trees / %d nodes (depth %d) at %s.",
+        compiled.source, compiled.roots.shape[0], compiled.feature.shape[0], compiled.max_depth, compiled_path
+    )
+    return compiled
+
+
+def compiled_path_for(model_file_abs_path: str) -> str:
+    """Returns the sidecar path for a model artifact."""
+    return os.path.splitext(model_file_abs_path)[0] + COMPILED_SUFFIX
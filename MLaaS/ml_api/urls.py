@@ -2,16 +2,19 @@
 app_name = 'ml_api'
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EndpointViewSet, MLAlgorithmViewSet, MLRequestViewSet, engineer_list_models, engineer_set_active_model
+from .views import EndpointViewSet, MLAlgorithmViewSet, MLRequestViewSet, RetrainJobViewSet, engineer_list_models, engineer_set_active_model, readiness, service_metrics
 # Create a router and register our viewsets with it.
 router = DefaultRouter()  # Create a router instance
 router.register(r'endpoints', EndpointViewSet, basename='endpoint')  # Register endpoint viewset
 router.register(r'algorithms', MLAlgorithmViewSet, basename='mlalgorithm')  # Register algorithm viewset
 router.register(r'requests', MLRequestViewSet, basename='mlrequest')  # Register request viewset
+router.register(r'retrain-jobs', RetrainJobViewSet, basename='retrainjob')  # Register retraining job viewset
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
     path('engineer/models/', engineer_list_models, name='engineer_list_models'),
     path('engineer/set_active_model/', engineer_set_active_model, name='engineer_set_active_model'),
+    path('metrics/', service_metrics, name='service_metrics'),
+    path('health/ready/', readiness, name='readiness'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
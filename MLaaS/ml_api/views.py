@@ -4,38 +4,65 @@ import logging
 import os
 import time
 import traceback
-import joblib
+import uuid
 import numpy as np
-import matplotlib.pyplot as plt
-import shap
-import io
-import pandas as pd
-import base64
 from django.conf import settings  
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from shap import LinearExplainer, KernelExplainer
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 from rest_framework.permissions import AllowAny
 from ml_api.retrain_preprocessing import FINAL_FEATURE_COLUMNS_ORDERED as FEATURE_NAMES
-from sklearn.linear_model import LinearRegression, LogisticRegression
 
 # Import logic and CUSTOM exceptions from the retraining module
-from .retraining_logic import ( 
-    RetrainingError,
-    get_retrainer,
+from .retraining_logic import get_retrainer
+from .async_views import pool_stats as async_pool_stats
+from .batching import micro_batcher
+from .explainers import ExplainerUnavailable, explainer_cache
+from .explanation_queue import explanation_precomputer, precompute_requested
+from .explanation_render import render_bar_chart_png_base64, render_bar_chart_svg
+from .explanation_store import (
+    explanation_model_path,
+    get_or_compute_explanation,
+    get_or_compute_explanations,
+    is_explainable,
 )
-from .models import Endpoint, MLAlgorithm, MLRequest
+from .inference import FeatureCountMismatch, run_prediction
+from .model_cache import model_cache
+from .prediction_cache import prediction_cache
+from .runtimes import get_runtime_model, remove_runtime_artifacts
+from .timing import StageTimer, finish_request_timing, stage_latency, timings_requested
+from .warmup import ensure_warmup_started, get_model_file_abs_path, warmup_status
+from .bulk_prediction import BULK_INPUT_READERS, stream_bulk_predictions
+from .models import Endpoint, MLAlgorithm, MLRequest, MLRequestExplanation, RetrainJob
+from .retrain_jobs import enqueue_retrain
+from .request_logger import request_writer
+from .routing import routing_table
+from .wire_formats import BINARY_PARSER_CLASSES, BINARY_RENDERER_CLASSES, NDJSON_MEDIA_TYPE, NDJSONRenderer
 from .serializers import (
     AlgorithmPredictInputSerializer,
     EndpointSerializer,
+    ExplainBatchRequestSerializer,
     MLAlgorithmSerializer,
     MLRequestSerializer,
+    RetrainJobSerializer,
+    RetrainRequestSerializer,
 )
 
 # Configure logging
 logger = logging.getLogger(__name__)
+
+# Predict accepts/returns .npy and Arrow IPC bodies as well as JSON (the default)
+PREDICT_PARSER_CLASSES = list(api_settings.DEFAULT_PARSER_CLASSES) + BINARY_PARSER_CLASSES
+PREDICT_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + BINARY_RENDERER_CLASSES
+BULK_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer]
+EXPLAIN_OUTPUTS = ('png', 'contributions', 'svg')  # ?output= values accepted by explain; png is the default
 FEATURE_NAMES = [
     'injuryprognosis','generalfixed','generaluplift','generalrest',
     'specialhealthexpenses','specialtherapy','specialrehabilitation',
@@ -65,12 +92,216 @@ DISPLAY_NAMES = {
     'specialtripcosts':       'Trip expenses',
     'specialjourneyexpenses': 'Journey expenses',
 }
-class EndpointViewSet(viewsets.ModelViewSet):
+
+
+class PredictionMixin:
+    """
+    Shared prediction flow for ViewSet actions that have already resolved the
+    MLAlgorithm to use (by primary key, or through an endpoint's routing table).
+
+    Each stage of the request is timed with a StageTimer (see timing.py); the
+    response carries the durations in a Server-Timing header.
+    """
+
+    stage_timer = None  # Set by the predict actions
+
+    def _predict(self, request, algorithm, timer=None):
+        """
+        Validates input, fetches the model from the per-worker cache, predicts
+        and logs the MLRequest.
+
+        Loads model file based on relative path stored in DB joined with BASE_DIR.
+        """
+        pk = algorithm.id  # Used in log and error messages
+        timer = timer or StageTimer()
+        self.stage_timer, self.timed_algorithm_id = timer, pk
+
+        with timer.stage("validate"):
+            serializer = self.get_serializer(data=request.data)  # Validate input data
+            is_valid = serializer.is_valid()
+        if not is_valid:
+            logger.warning(
+                "Prediction failed for Algorithm ID %s: Invalid input data. Errors: %s",
+                pk, serializer.errors
+            )
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # --- Get relative path from DB ---
+        lookup_start = time.perf_counter()
+        model_file_rel_path = None
+        if algorithm.model_file and hasattr(algorithm.model_file, 'name'):
+            model_file_rel_path = algorithm.model_file.name  # Get the model file path
+
+        if not model_file_rel_path:
+            logger.error("Prediction failed: No model file path registered in DB for Algorithm ID %s.", pk)
+            return Response(
+                {"error": f"No model file path found in database for algorithm ID {pk}."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,  # Indicate internal config issue
+            )
+
+        # --- Construct absolute path and check existence ---
+        try:
+            model_file_abs_path = os.path.join(settings.BASE_DIR, model_file_rel_path)  # Construct absolute path
+            if not os.path.exists(model_file_abs_path):
+                logger.error(
+                    "Prediction failed: Model file for Algorithm ID %s not found "
+                    "at expected absolute path: %s", pk, model_file_abs_path
+                )
+                return Response(
+                    {
+                        "error": f"Model file not found or inaccessible at calculated path "
+                                 f"'{model_file_abs_path}' for algorithm ID {pk}. Cannot predict."
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,  # Service unavailable as model file missing
+                )
+        except Exception as path_error:
+            logger.error(
+                "Prediction failed: Error constructing/checking model file path for Algorithm ID %s. Rel path: '%s'. Error: %s",
+                 pk, model_file_rel_path, path_error, exc_info=True
+            )
+            return Response(
+                 {"error": f"Server error determining model file location for algorithm ID {pk}."},
+                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        timer.record("lookup", time.perf_counter() - lookup_start)
+
+        try:
+            input_data = serializer.validated_data["input_data"]  # Validated float64 matrix
+
+            outcome = run_prediction(algorithm, model_file_abs_path, input_data, timer=timer)
+            prediction = outcome["prediction"]
+            cached = outcome["cached"]
+            cache_hit, load_time, predict_time = outcome["model_cache_hit"], outcome["load_time"], outcome["predict_time"]
+
+            prediction_list = (
+                prediction.tolist()
+                if isinstance(prediction, np.ndarray)
+                else prediction
+            )
+            response_time_secs = load_time + predict_time  # Total processing time (load_time is 0 on a cache hit)
+
+            # --- Logging request  ---
+            show_timings = timings_requested(request.query_params)
+            try:
+                log_start = time.perf_counter()
+                log_fields = {
+                    "input_data": input_data.tolist(),
+                    "prediction": prediction_list,
+                    "algorithm": algorithm,
+                    "response_time": response_time_secs,
+                }
+                if settings.MLREQUEST_ASYNC_LOGGING:
+                    # Queue for the background writer; the pre-allocated UUID is the request_id
+                    request_id = str(request_writer.submit(**log_fields))
+                else:
+                    request_id = MLRequest.objects.create(**log_fields).id
+                timer.record("log_write", time.perf_counter() - log_start)
+                response_data = {
+                    "prediction": prediction_list,
+                    "request_id": request_id,
+                    "algorithm_version": algorithm.version,
+                    "processing_time_ms": round(response_time_secs * 1000, 2),
+                    "model_cache_hit": cache_hit,
+                    "cached": cached,
+                }
+                if precompute_requested(request.query_params):
+                    # Explained in the background; poll /api/requests/<request_id>/explanation-status/
+                    queued = explanation_precomputer.submit(request_id)
+                    response_data["explanation_status"] = "pending" if queued else "not_queued"
+                if show_timings:
+                    response_data["timings"] = timer.timings_ms()  # serialize is only in the Server-Timing header
+                logger.info(
+                    "Prediction successful for Algorithm ID %s. Request ID: %s. Time: %.4fs",
+                    pk, request_id, response_time_secs
+                )
+                return Response(response_data, status=status.HTTP_200_OK)
+            except Exception as db_error:
+                logger.critical(
+                    "Error saving MLRequest log for algorithm %s (ID: %s): %s",
+                    algorithm.name, pk, db_error, exc_info=True
+                )
+                timer.record("log_write", time.perf_counter() - log_start)
+                response_data = {
+                    "prediction": prediction_list,
+                    "warning": "Prediction successful, but failed to log request details.",
+                    "algorithm_version": algorithm.version,
+                    "processing_time_ms": round(response_time_secs * 1000, 2),
+                    "model_cache_hit": cache_hit,
+                    "cached": cached,
+                }
+                if show_timings:
+                    response_data["timings"] = timer.timings_ms()
+                return Response(response_data, status=status.HTTP_200_OK)
+
+        # --- Specific Error Handling for Prediction Process ---
+        except FeatureCountMismatch as mismatch:
+            logger.warning(
+                "Prediction failed for Algorithm ID %s: %s", pk, mismatch
+            )
+            return Response({"error": str(mismatch)}, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError:  # Should be caught by os.path.exists check, but handle defensively
+            logger.error(
+                "Prediction failed: Model file disappeared between check and load: %s",
+                model_file_abs_path, exc_info=True  # Log absolute path
+            )
+            return Response(
+                {
+                    "error": f"Model file became inaccessible during prediction process: "
+                             f"{model_file_abs_path}."  # Report absolute path
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        except ValueError as ve:  # Input data format/shape errors
+            logger.error(
+                "Prediction ValueError for Algorithm ID %s: %s", pk, ve, exc_info=True
+            )
+            return Response(
+                {
+                    "error": f"Prediction failed due to invalid input data format or "
+                             f"shape for the loaded model: {str(ve)}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except (AttributeError, TypeError) as te:  # Model incompatibility
+            logger.error(
+                "Prediction TypeError/AttributeError for Algorithm ID %s: %s", pk, te, exc_info=True
+            )
+            return Response(
+                {
+                    "error": f"Prediction failed due to model incompatibility or "
+                             f"internal error: {str(te)}"
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        except Exception as e:  # Other unexpected errors
+            logger.error(
+                "Unexpected prediction error for Algorithm ID %s: %s", pk, e, exc_info=True
+            )
+            return Response(
+                {
+                    "error": "An unexpected server error occurred during prediction."
+                             f" Details: {str(e)}"
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Renders timed predict responses here so serialisation is counted, then adds Server-Timing."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        timer = self.stage_timer
+        if timer is None or not isinstance(response, Response):
+            return response
+        with timer.stage("serialize"):
+            response.render()  # Django skips rendering an already-rendered response
+        return finish_request_timing(response, getattr(self, "timed_algorithm_id", None), timer)
+
+class EndpointViewSet(PredictionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing logical ML Endpoints.
 
     Provides standard CRUD operations (Create, Retrieve, Update, Destroy)
-    for Endpoint resources. Requires authentication (currently set to AllowAny).
+    for Endpoint resources, plus `/predict/` which routes to the endpoint's
+    active algorithm. Requires authentication (currently set to AllowAny).
     """
 
     queryset = Endpoint.objects.all().order_by("name")  # Queryset for all endpoints ordered by name
@@ -79,7 +310,34 @@ class EndpointViewSet(viewsets.ModelViewSet):
     # permission_classes = [permissions.IsAuthenticated]
     permission_classes = [permissions.AllowAny]  # Allow any user for now
 
-class MLAlgorithmViewSet(viewsets.ModelViewSet):
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="predict",
+        serializer_class=AlgorithmPredictInputSerializer,
+        parser_classes=PREDICT_PARSER_CLASSES,
+        renderer_classes=PREDICT_RENDERER_CLASSES,
+    )
+    def predict(self, request, pk=None):
+        """
+        Perform prediction with the endpoint's active algorithm.
+
+        `pk` may be the endpoint ID or its exact name. The active algorithm is
+        resolved through the in-process routing table, so no database query is
+        needed per prediction and a model swap takes effect immediately.
+        """
+        timer = self.stage_timer = StageTimer()
+        with timer.stage("lookup"):
+            algorithm = routing_table.resolve(pk)
+        if algorithm is None:
+            logger.warning("Prediction failed: No active algorithm routed for endpoint '%s'.", pk)
+            return Response(
+                {"error": f"No active algorithm found for endpoint '{pk}'."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return self._predict(request, algorithm, timer)
+
+class MLAlgorithmViewSet(PredictionMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing ML Algorithms.
 
@@ -144,6 +402,7 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
         # Delete DB record first
         try:
             instance.delete()  # Delete the instance from the database
+            model_cache.evict(algorithm_id)  # Drop any cached copy held by this worker
             logger.info(
                 "ML Algorithm '%s' (ID: %d) deleted from DB.",
                 algorithm_name, algorithm_id
@@ -158,6 +417,7 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
         if model_file_abs_path and os.path.exists(model_file_abs_path):
             try:
                 os.remove(model_file_abs_path)  # Remove the model file
+                remove_runtime_artifacts(model_file_abs_path)  # And any compiled runtime sidecar
                 logger.info(
                     "Associated model file deleted: %s", model_file_abs_path
                 )
@@ -181,6 +441,8 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
         methods=["post"],
         url_path="predict",
         serializer_class=AlgorithmPredictInputSerializer,
+        parser_classes=PREDICT_PARSER_CLASSES,
+        renderer_classes=PREDICT_RENDERER_CLASSES,
     )
     def predict(self, request, pk=None):
         """
@@ -188,10 +450,12 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
 
         Loads model file based on relative path stored in DB joined with BASE_DIR.
         """
+        timer = self.stage_timer = StageTimer()
         try:
-            algorithm = MLAlgorithm.objects.select_related("parent_endpoint").get(
-                pk=pk  # Get the algorithm by primary key
-            )
+            with timer.stage("lookup"):
+                algorithm = MLAlgorithm.objects.select_related("parent_endpoint").get(
+                    pk=pk  # Get the algorithm by primary key
+                )
         except MLAlgorithm.DoesNotExist:  # Use specific exception from model
             logger.warning("Prediction failed: Algorithm with ID %s not found.", pk)
             return Response(
@@ -199,170 +463,83 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        serializer = self.get_serializer(data=request.data)  # Validate input data
-        if not serializer.is_valid():
-            logger.warning(
-                "Prediction failed for Algorithm ID %s: Invalid input data. Errors: %s",
-                pk, serializer.errors
-            )
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return self._predict(request, algorithm, timer)
 
-        # --- Get relative path from DB ---
-        model_file_rel_path = None
-        if algorithm.model_file and hasattr(algorithm.model_file, 'name'):
-            model_file_rel_path = algorithm.model_file.name  # Get the model file path
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="predict/bulk",
+        parser_classes=[],  # The body is read as a stream, never through request.data
+        renderer_classes=BULK_RENDERER_CLASSES,
+    )
+    def predict_bulk(self, request, pk=None):
+        """
+        Streams predictions for a large NDJSON or .npy body, chunk by chunk.
 
-        if not model_file_rel_path:
-            logger.error("Prediction failed: No model file path registered in DB for Algorithm ID %s.", pk)
-            return Response(
-                {"error": f"No model file path found in database for algorithm ID {pk}."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,  # Indicate internal config issue
-            )
+        The body is read in chunks of BULK_PREDICT_CHUNK_ROWS rows (override with
+        ?chunk_rows=), each chunk is predicted and written to the response as
+        NDJSON before the next is read, and one summary MLRequest is logged per
+        chunk. Requests need a Content-Length; chunked transfer encoding is not
+        passed through by WSGI.
+        """
+        algorithm = get_object_or_404(MLAlgorithm, pk=pk)
 
-        # --- Construct absolute path and check existence ---
-        try:
-            model_file_abs_path = os.path.join(settings.BASE_DIR, model_file_rel_path)  # Construct absolute path
-            if not os.path.exists(model_file_abs_path):
-                logger.error(
-                    "Prediction failed: Model file for Algorithm ID %s not found "
-                    "at expected absolute path: %s", pk, model_file_abs_path
-                )
-                return Response(
-                    {
-                        "error": f"Model file not found or inaccessible at calculated path "
-                                 f"'{model_file_abs_path}' for algorithm ID {pk}. Cannot predict."
-                    },
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE,  # Service unavailable as model file missing
-                )
-        except Exception as path_error:
-            logger.error(
-                "Prediction failed: Error constructing/checking model file path for Algorithm ID %s. Rel path: '%s'. Error: %s",
-                 pk, model_file_rel_path, path_error, exc_info=True
-            )
+        content_type = request.content_type.split(';')[0].strip()
+        read_chunks = BULK_INPUT_READERS.get(content_type)
+        if read_chunks is None:
             return Response(
-                 {"error": f"Server error determining model file location for algorithm ID {pk}."},
-                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                {"error": f"Bulk prediction expects '{NDJSON_MEDIA_TYPE}' or 'application/x-npy', "
+                          f"got '{content_type}'."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             )
 
-        # --- Load model using absolute path ---
         try:
-            load_start = time.time()  # Start timer for loading model
-            model = joblib.load(model_file_abs_path)  # Load the model
-            load_time = time.time() - load_start  # Calculate load time
-            logger.info(
-                "Loaded model for Algorithm ID %s from '%s' in %.4fs",
-                pk, model_file_abs_path, load_time
-            )
-
-            # --- Prediction logic  ---
-            input_data = np.array(serializer.validated_data["input_data"])  # Prepare input data
-
-            expected_features = getattr(model, "n_features_in_", None)  # Get expected number of features
-            if expected_features is not None and input_data.shape[1] != expected_features:
-                error_msg = (
-                    f"Input data shape mismatch: received {input_data.shape[1]} features, "
-                    f"but model expects {expected_features}."
-                )
-                logger.warning(
-                    "Prediction failed for Algorithm ID %s: %s", pk, error_msg
-                )
-                return Response({"error": error_msg}, status=status.HTTP_400_BAD_REQUEST)
-
-            predict_start = time.time()  # Start timer for prediction
-            prediction = model.predict(input_data)  # Perform prediction
-            predict_time = time.time() - predict_start  # Calculate prediction time
-
-            prediction_list = (
-                prediction.tolist()
-                if isinstance(prediction, np.ndarray)
-                else prediction
-            )
-            response_time_secs = load_time + predict_time  # Total processing time
-
-            # --- Logging request  ---
-            ml_request = None
-            try:
-                ml_request = MLRequest.objects.create(
-                    input_data=serializer.validated_data["input_data"],
-                    prediction=prediction_list,
-                    algorithm=algorithm,
-                    response_time=response_time_secs,
-                )
-                response_data = {
-                    "prediction": prediction_list,
-                    "request_id": ml_request.id,
-                    "algorithm_version": algorithm.version,
-                    "processing_time_ms": round(response_time_secs * 1000, 2),
-                }
-                logger.info(
-                    "Prediction successful for Algorithm ID %s. Request ID: %d. Time: %.4fs",
-                    pk, ml_request.id, response_time_secs
-                )
-                return Response(response_data, status=status.HTTP_200_OK)
-            except Exception as db_error:
-                logger.critical(
-                    "Error saving MLRequest log for algorithm %s (ID: %s): %s",
-                    algorithm.name, pk, db_error, exc_info=True
-                )
-                response_data = {
-                    "prediction": prediction_list,
-                    "warning": "Prediction successful, but failed to log request details.",
-                    "algorithm_version": algorithm.version,
-                    "processing_time_ms": round(response_time_secs * 1000, 2),
-                }
-                return Response(response_data, status=status.HTTP_200_OK)
-
-        # --- Specific Error Handling for Prediction Process ---
-        except FileNotFoundError:  # Should be caught by os.path.exists check, but handle defensively
-            logger.error(
-                "Prediction failed: Model file disappeared between check and load: %s",
-                model_file_abs_path, exc_info=True  # Log absolute path
-            )
+            chunk_rows = int(request.query_params.get("chunk_rows", settings.BULK_PREDICT_CHUNK_ROWS))
+        except ValueError:
+            return Response({"error": "chunk_rows must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= chunk_rows <= settings.BULK_PREDICT_MAX_CHUNK_ROWS:
             return Response(
-                {
-                    "error": f"Model file became inaccessible during prediction process: "
-                             f"{model_file_abs_path}."  # Report absolute path
-                },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-        except ValueError as ve:  # Input data format/shape errors
-            logger.error(
-                "Prediction ValueError for Algorithm ID %s: %s", pk, ve, exc_info=True
-            )
-            return Response(
-                {
-                    "error": f"Prediction failed due to invalid input data format or "
-                             f"shape for the loaded model: {str(ve)}"
-                },
+                {"error": f"chunk_rows must be between 1 and {settings.BULK_PREDICT_MAX_CHUNK_ROWS}."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        except (AttributeError, TypeError) as te:  # Model incompatibility
-            logger.error(
-                "Prediction TypeError/AttributeError for Algorithm ID %s: %s", pk, te, exc_info=True
-            )
+
+        model_file_abs_path = get_model_file_abs_path(algorithm)
+        if not model_file_abs_path or not os.path.exists(model_file_abs_path):
+            logger.error("Bulk prediction failed: Model file for Algorithm ID %s not found.", pk)
             return Response(
-                {
-                    "error": f"Prediction failed due to model incompatibility or "
-                             f"internal error: {str(te)}"
-                },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
-        except Exception as e:  # Other unexpected errors
-            logger.error(
-                "Unexpected prediction error for Algorithm ID %s: %s", pk, e, exc_info=True
+                {"error": f"Model file not found for algorithm ID {pk}. Cannot predict."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
+        try:
+            model, _, _ = get_runtime_model(algorithm, model_file_abs_path)
+        except Exception as e:
+            logger.error("Bulk prediction failed: Could not load model for Algorithm ID %s: %s", pk, e, exc_info=True)
             return Response(
-                {
-                    "error": "An unexpected server error occurred during prediction."
-                             f" Details: {str(e)}"
-                },
+                {"error": f"Failed to load model for algorithm ID {pk}."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-    # --- Retrain method remains the same ---
+        chunks = read_chunks(request._request, chunk_rows)  # Reads the WSGI input lazily
+        return StreamingHttpResponse(
+            stream_bulk_predictions(algorithm, model, chunks),
+            content_type=NDJSON_MEDIA_TYPE,
+        )
+
     @action(detail=True, methods=["post"], url_path="retrain")
     def retrain(self, request, pk=None):
-        """Handles POST request to trigger retraining for a specific algorithm ID."""
+        """
+        Queues retraining for a specific algorithm ID and answers 202 with the job.
+
+        The run_retrain_worker process fits the model; poll status_url for the
+        current phase and per-phase timings, and result_url for the new version.
+        While the algorithm already has a queued or running job, that job is returned.
+
+        An optional body {"search": "grid" | "random", "n_iter", "cv", "n_jobs"}
+        runs a cross-validated hyperparameter search before the final fit; the
+        candidate table is part of the job result. {"mode": "full" | "incremental"}
+        overrides the model type's default (incremental continues the model on
+        the claims added since it was trained).
+        """
         try:
             algorithm_to_retrain = self.get_object()  # Get the algorithm instance
         except ObjectDoesNotExist:
@@ -372,6 +549,11 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+        options_serializer = RetrainRequestSerializer(data=request.data)
+        if not options_serializer.is_valid():
+            return Response(options_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        options = options_serializer.to_job_options()
+
         logger.info(
             "Received request to retrain Algorithm ID: %s (Type: %s, Version: %s)",
             pk,
@@ -380,34 +562,8 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
         )
 
         try:
-            retrainer = get_retrainer(algorithm_to_retrain)  # Get retrainer for the algorithm
-            new_algorithm_instance, results = retrainer.retrain()  # Perform retraining
-
-            if results.get("status") == "no_data":
-                logger.info(
-                    "Retraining for Algorithm ID %s resulted in no action: %s",
-                    pk, results.get('message')
-                )
-                return Response(results, status=status.HTTP_200_OK)
-
-            new_serializer = self.get_serializer(new_algorithm_instance)  # Serialize new algorithm instance
-            response_data = {
-                "message": results.get(
-                    "message", "Retraining process completed successfully."
-                ),
-                "new_algorithm": new_serializer.data,
-                "metrics": {
-                    k: v
-                    for k, v in results.items()
-                    if k.endswith("_seconds") or k.startswith("data_points")
-                },
-            }
-            logger.info(
-                "Retraining successful for Algorithm ID %s. New version created: %s (ID: %d)",
-                pk, new_algorithm_instance.version, new_algorithm_instance.id
-            )
-            return Response(response_data, status=status.HTTP_201_CREATED)
-
+            get_retrainer(algorithm_to_retrain)  # Fails fast on unsupported types or a missing artifact
+            job, created = enqueue_retrain(algorithm_to_retrain, options=options)
         except FileNotFoundError as e:
             logger.error(
                 "Retraining failed for Algorithm ID %s. Error: %s: %s",
@@ -426,24 +582,6 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
                 {"error": f"Retraining failed: Not implemented for this algorithm type - {str(e)}"},
                 status=status.HTTP_501_NOT_IMPLEMENTED,
             )
-        except EnvironmentError as e:
-            logger.error(
-                "Retraining failed for Algorithm ID %s. Error: %s: %s",
-                pk, type(e).__name__, e, exc_info=True
-            )
-            return Response(
-                {"error": f"Retraining failed: Environment error (e.g., DB access) - {str(e)}"},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE,
-            )
-        except RetrainingError as e:
-            logger.error(
-                "Retraining failed for Algorithm ID %s. Error: %s: %s",
-                pk, type(e).__name__, e, exc_info=True
-            )
-            return Response(
-                {"error": f"Retraining failed: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
         except Exception as e:
             logger.error(
                 "Unexpected error during retraining trigger for Algorithm ID %s: %s",
@@ -457,6 +595,86 @@ class MLAlgorithmViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        status_url = reverse('ml_api:retrainjob-detail', args=[job.pk], request=request)
+        message = (
+            f"Retraining queued as job {job.pk}." if created
+            else f"Retraining is already {job.get_status_display().lower()} as job {job.pk}."
+        )
+        return Response(
+            {
+                "message": message,
+                "job_id": job.pk,
+                "status": job.status,
+                "created": created,
+                "options": job.options,
+                "status_url": status_url,
+                "result_url": reverse('ml_api:retrainjob-result', args=[job.pk], request=request),
+            },
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url},
+        )
+
+class RetrainJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for polling retraining jobs queued by MLAlgorithmViewSet.retrain.
+
+    Retrieve reports the status, the running phase and per-phase timings;
+    the result action returns the outcome once the job has finished.
+    """
+
+    queryset = RetrainJob.objects.all().select_related('algorithm').order_by("-created_at")
+    serializer_class = RetrainJobSerializer  # Serializer for job status
+    permission_classes = [permissions.AllowAny]  # Allow any user for now
+
+    filterset_fields = [
+        "algorithm__id",  # Filter by algorithm ID
+        "status",  # Filter by job status
+    ]
+
+    @action(detail=True, methods=['get'], url_path='result')
+    def result(self, request, pk=None):
+        """
+        Outcome of a finished job: the new algorithm version and metrics, the
+        no-data message, or the error. 202 with the current status while the
+        job is still queued or running.
+        """
+        job = self.get_object()
+        if job.status in RetrainJob.ACTIVE_STATUSES:
+            return Response(
+                {
+                    "job_id": job.pk,
+                    "status": job.status,
+                    "phase": job.phase,
+                    "message": f"Retraining is still {job.get_status_display().lower()}.",
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        results = job.result or {}
+        data = {"job_id": job.pk, "status": job.status, "phase_timings": job.phase_timings}
+        if job.status == RetrainJob.STATUS_SUCCEEDED:
+            data.update({
+                "message": results.get("message", "Retraining process completed successfully."),
+                "new_algorithm": MLAlgorithmSerializer(
+                    job.new_algorithm, context=self.get_serializer_context()
+                ).data if job.new_algorithm else None,
+                "metrics": {
+                    k: v
+                    for k, v in results.items()
+                    if k.endswith("_seconds") or k.startswith("data_points")
+                },
+            })
+            data["mode"] = results.get("mode", "full")
+            if "mode_note" in results:
+                data["mode_note"] = results["mode_note"]
+            if "hyperparameter_search" in results:
+                data["hyperparameter_search"] = results["hyperparameter_search"]
+        elif job.status == RetrainJob.STATUS_NO_DATA:
+            data["message"] = results.get("message")
+        else:
+            data["error"] = job.error
+        return Response(data)
+
 class MLRequestViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing ML prediction request logs.
@@ -483,37 +701,69 @@ class MLRequestViewSet(viewsets.ReadOnlyModelViewSet):
         "algorithm__parent_endpoint__name",  # Filter by parent endpoint name
     ]
     search_fields = ["input_data", "prediction"]  # Fields to search in
+
+    def get_object(self):
+        """
+        Looks a request up by integer ID, or by the UUID returned as request_id
+        when MLRequest logging is asynchronous.
+        """
+        lookup_value = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        lookup_field = "pk" if lookup_value.isdigit() else "request_uuid"
+        ml_request = get_object_or_404(self.get_queryset(), **{lookup_field: lookup_value})
+        self.check_object_permissions(self.request, ml_request)
+        return ml_request
+
     @action(detail=True, methods=['get'], url_path='explain')
     def explain(self, request, pk=None):
         """
         Provides SHAP explanations for a specific prediction request,
         plotting the top 10 factors but only returning the top 3 in JSON.
+
+        SHAP values are read from the request's stored MLRequestExplanation
+        and only computed (and stored) when there is none yet.
+
+        ?output= selects the response:
+          png            JSON with a base64 PNG chart and the top 3 features (default)
+          contributions  JSON with every feature's SHAP contribution, no chart,
+                         for client-side charting
+          svg            the chart as an image/svg+xml document, cached
         """
         PLOT_N = 10   # how many bars to show in the chart
         JSON_N = 3    # how many features to include in the JSON
 
-        # 1) load the request and build a DataFrame
-        ml_req = self.get_object()
-        df     = pd.DataFrame(ml_req.input_data)  # shape (1, n_features)
+        output = request.query_params.get('output', 'png')
+        if output not in EXPLAIN_OUTPUTS:
+            return Response(
+                {"error": f"Unknown output '{output}'. Use one of: {', '.join(EXPLAIN_OUTPUTS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # 2) load the model from disk
-        filename = os.path.basename(ml_req.algorithm.model_file.name)
-        model_fp = os.path.join(settings.MODEL_ROOT, filename)
-        if not os.path.exists(model_fp):
+        # 1) load the request
+        ml_req = self.get_object()
+        if isinstance(ml_req.input_data, dict):  # Bulk chunk summaries carry no feature rows
             return Response(
-                {"error": f"Model file not found at {model_fp}."},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
+                {"error": "Bulk prediction summaries cannot be explained."},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        model = joblib.load(model_fp)
 
+        # 2) stored SHAP values, computed with this worker's cached explainer on a miss
+        algorithm = ml_req.algorithm
+        explanation, stored = None, False
         try:
-            # 3) compute SHAP importances
-            explainer   = shap.Explainer(model, feature_names=FEATURE_NAMES)
-            shap_out    = explainer(df)
-            importances = np.abs(shap_out.values).mean(axis=0)
+            explanation, stored = get_or_compute_explanation(ml_req)
+            importances = np.abs(np.asarray(explanation.shap_values)).mean(axis=0)
 
-        except Exception:
-            # fallback to sklearn importances
+        except Exception as shap_error:
+            if not isinstance(shap_error, (ExplainerUnavailable, FileNotFoundError)):
+                logger.warning("SHAP failed for MLRequest %s: %s", ml_req.pk, shap_error)
+            # 3) fallback to sklearn importances
+            model_fp = explanation_model_path(algorithm)
+            if model_fp is None:
+                return Response(
+                    {"error": f"Model file not found for algorithm ID {algorithm.id}."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            model, _, _ = model_cache.get(algorithm.id, model_fp)
             if hasattr(model, "coef_"):
                 importances = np.abs(model.coef_).ravel()
             elif hasattr(model, "feature_importances_"):
@@ -524,30 +774,33 @@ class MLRequestViewSet(viewsets.ReadOnlyModelViewSet):
                     status=status.HTTP_501_NOT_IMPLEMENTED
                 )
 
+        metric = "mean absolute SHAP value" if explanation else "model feature importance"
+        explainer_version = explanation.explainer_version if explanation else None
+
         # 4) pick indices for plotting vs JSON
         sorted_idx = np.argsort(importances)[::-1]
         plot_idx   = sorted_idx[:PLOT_N]
         json_idx   = sorted_idx[:JSON_N]
 
-        # 5) build plot for top PLOT_N
+        if output == 'contributions':
+            return Response(self._contributions(ml_req, explanation, importances, sorted_idx, metric))
+
+        # 5) chart for top PLOT_N
         plot_names = [DISPLAY_NAMES[FEATURE_NAMES[i]] for i in plot_idx]
         plot_vals  = importances[plot_idx]
+        chart = (plot_names, plot_vals, f"Top {PLOT_N} Factors Driving This Claim", "Average absolute SHAP value")
+
+        if output == 'svg':
+            cache_key = f"explain-svg:{ml_req.pk}:{explainer_version}" if explanation else None
+            svg = cache.get(cache_key) if cache_key else None
+            if svg is None:
+                svg = render_bar_chart_svg(*chart)
+                if cache_key:
+                    cache.set(cache_key, svg, settings.EXPLAIN_SVG_CACHE_SECONDS)
+            return HttpResponse(svg, content_type="image/svg+xml")
 
-        plt.figure(figsize=(6, 4))
-        plt.barh(plot_names[::-1], plot_vals[::-1])
-        plt.xlabel("Average absolute SHAP value")
-        plt.title(f"Top {PLOT_N} Factors Driving This Claim")
-        plt.gca().invert_yaxis()
-        for i, v in enumerate(plot_vals[::-1]):
-            plt.text(v + 1e-6, i, f"{v:.2f}", va="center")
-
-        # 6) serialize figure
-        buf = io.BytesIO()
-        plt.tight_layout()
-        plt.savefig(buf, format="png")
-        plt.close()
-        buf.seek(0)
-        img_b64 = base64.b64encode(buf.read()).decode("utf-8")
+        # 6) PNG figure (matplotlib is imported on first use)
+        img_b64 = render_bar_chart_png_base64(*chart)
 
         # 7) prepare top JSON_N features
         top_feats = []
@@ -564,7 +817,158 @@ class MLRequestViewSet(viewsets.ReadOnlyModelViewSet):
             "algorithm":    ml_req.algorithm.name,
             "shap_image":   img_b64,
             "top_features": top_feats,
-            "metric":       "mean absolute SHAP value"
+            "metric":       metric,
+            "stored":       stored,
+            "explainer_version": explainer_version,
+        })
+
+    @action(detail=True, methods=['get', 'post'], url_path='explanation-status')
+    def explanation_status(self, request, pk=None):
+        """
+        State of a request's stored explanation, for pages that poll instead
+        of waiting on a synchronous SHAP call.
+
+        status is "ready", "pending" (queued or being computed), "failed"
+        (with the error) or "none". POST queues the request for background
+        computation unless it is ready or already pending.
+        """
+        try:
+            ml_req = self.get_object()
+        except Http404:
+            if explanation_precomputer.is_queued(pk):  # Queued before its log row was written
+                return Response({"request_id": pk, "status": "pending"})
+            raise
+
+        explanation = MLRequestExplanation.objects.filter(request=ml_req).only(
+            'status', 'explainer_version', 'error', 'created_at'
+        ).first()
+        if explanation is not None:
+            state = explanation.status.lower()
+        elif explanation_precomputer.is_queued(ml_req.pk, ml_req.request_uuid):
+            state = "pending"
+        else:
+            state = "none"
+
+        if request.method == 'POST' and state in ("none", "failed"):
+            if isinstance(ml_req.input_data, dict):
+                return Response(
+                    {"error": "Bulk prediction summaries cannot be explained."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not explanation_precomputer.submit(ml_req.pk):
+                return Response(
+                    {"error": "The explanation queue is full; try again later."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            state = "pending"
+
+        data = {"request_id": ml_req.pk, "status": state}
+        if state == "ready":
+            data["explainer_version"] = explanation.explainer_version
+            data["computed_at"] = explanation.created_at
+        elif state == "failed":
+            data["error"] = explanation.error
+        return Response(data)
+
+    @staticmethod
+    def _contributions(ml_req, explanation, importances, sorted_idx, metric):
+        """Per-feature contributions, most important first, for clients that draw their own chart."""
+        rows = np.asarray(ml_req.input_data, dtype=np.float64)
+        shap_values = np.asarray(explanation.shap_values) if explanation else None
+        features = []
+        for i in sorted_idx:
+            name = FEATURE_NAMES[i]
+            features.append({
+                "feature": name,
+                "display_name": DISPLAY_NAMES[name],
+                "value": float(rows[0, i]) if rows.shape[0] == 1 else rows[:, i].tolist(),
+                "contribution": float(shap_values[:, i].mean()) if explanation else None,  # Signed, mean over rows
+                "importance": float(importances[i]),
+            })
+        return {
+            "request_id":   ml_req.pk,
+            "algorithm":    ml_req.algorithm.name,
+            "prediction":   ml_req.prediction,
+            "base_value":   explanation.base_value if explanation else None,
+            "features":     features,
+            "metric":       metric,
+            "explainer_version": explanation.explainer_version if explanation else None,
+        }
+
+    @action(detail=False, methods=['post'], url_path='explain-batch')
+    def explain_batch(self, request):
+        """
+        SHAP contributions for many prediction requests at once.
+
+        Body: {"request_ids": [...], "store": true, "include_values": true}.
+        IDs may be integer IDs or request UUIDs (at most EXPLAIN_BATCH_MAX_REQUESTS).
+        Stored explanations are read in one query; the rest are grouped by
+        algorithm and each group is explained with a single vectorised SHAP
+        call over the stacked input rows, then stored with one bulk insert
+        unless "store" is false. Results keep the order of request_ids;
+        requests that cannot be explained are listed under "errors".
+        """
+        body = ExplainBatchRequestSerializer(data=request.data)
+        if not body.is_valid():
+            return Response(body.errors, status=status.HTTP_400_BAD_REQUEST)
+        request_ids = body.validated_data['request_ids']
+        int_ids, uuid_ids, lookup_keys = set(), set(), []
+        for value in request_ids:
+            text = str(value)
+            if text.isdigit():
+                int_ids.add(int(text))
+                lookup_keys.append(int(text))
+                continue
+            try:
+                uuid_ids.add(uuid.UUID(text))
+            except ValueError:
+                return Response({"request_ids": [f"'{value}' is not a request ID or UUID."]},
+                                status=status.HTTP_400_BAD_REQUEST)
+            lookup_keys.append(uuid.UUID(text))
+        store = body.validated_data['store']
+        include_values = body.validated_data['include_values']
+
+        found = {}  # ID and UUID -> MLRequest
+        for ml_req in self.get_queryset().filter(Q(pk__in=int_ids) | Q(request_uuid__in=uuid_ids)):
+            found[ml_req.pk] = found[ml_req.request_uuid] = ml_req
+        requested = []  # (requested ID, MLRequest or None), in input order
+        explainable = {}
+        for value, key in zip(request_ids, lookup_keys):
+            ml_req = found.get(key)
+            requested.append((value, ml_req))
+            if ml_req is not None and is_explainable(ml_req):
+                explainable[ml_req.pk] = ml_req
+
+        explanations, from_store, failures = get_or_compute_explanations(list(explainable.values()), store=store)
+
+        results, errors = [], []
+        for value, ml_req in requested:
+            if ml_req is None:
+                errors.append({"request_id": value, "error": "Request not found."})
+            elif ml_req.pk in failures:
+                errors.append({"request_id": value, "error": failures[ml_req.pk]})
+            elif ml_req.pk not in explanations:
+                errors.append({"request_id": value, "error": "Bulk prediction summaries cannot be explained."})
+            else:
+                explanation = explanations[ml_req.pk]
+                result = {
+                    "request_id": ml_req.pk,
+                    "algorithm": ml_req.algorithm_id,
+                    "base_value": explanation.base_value,
+                    "explainer_version": explanation.explainer_version,
+                    "stored": ml_req.pk in from_store,
+                }
+                if include_values:
+                    result["shap_values"] = explanation.shap_values
+                results.append(result)
+
+        n_features = len(results[0]["shap_values"][0]) if include_values and results else None
+        return Response({
+            "feature_names": FEATURE_NAMES if n_features == len(FEATURE_NAMES) else None,
+            "results": results,
+            "errors": errors,
+            "computed": sum(1 for result in results if not result["stored"]),
+            "saved": store,
         })
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -579,7 +983,10 @@ def engineer_list_models(request):
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def engineer_set_active_model(request):
-    """Set a model as active (by id) and deactivate others with the same name/endpoint."""
+    """
+    Set a model as active (by id), deactivate others with the same name/endpoint
+    and make its name the endpoint's primary algorithm, so the endpoint routes to it.
+    """
     model_id = request.data.get('model_id')
     if not model_id:
         return Response({'error': 'No model_id provided'}, status=400)
@@ -587,8 +994,40 @@ def engineer_set_active_model(request):
         model = MLAlgorithm.objects.get(pk=model_id)
         # Deactivate all models with the same name and parent_endpoint
         MLAlgorithm.objects.filter(name=model.name, parent_endpoint=model.parent_endpoint).update(is_active=False)
+        # Route the endpoint to this name; model.save() below bumps the routing version
+        Endpoint.objects.filter(pk=model.parent_endpoint_id).update(primary_algorithm_name=model.name)
         model.is_active = True
         model.save()
         return Response({'success': True, 'active_model_id': model.id})
     except MLAlgorithm.DoesNotExist:
-        return Response({'error': 'Model not found'}, status=404)
\ No newline at end of file
+        return Response({'error': 'Model not found'}, status=404)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def service_metrics(request):
+    """
+    Returns in-process counters for this worker (caches, logging, routing,
+    batching, async inference pool, per-stage predict latency, SHAP explainers).
+    """
+    return Response({
+        'pid': os.getpid(),
+        'model_cache': model_cache.stats(),
+        'request_writer': request_writer.stats(),
+        'routing': routing_table.stats(),
+        'micro_batching': micro_batcher.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'explainer_cache': explainer_cache.stats(),
+        'explanation_precompute': explanation_precomputer.stats(),
+        'inference_pool': async_pool_stats(),
+        'predict_stage_latency': stage_latency.stats(),
+    })
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def readiness(request):
+    """Readiness probe: 200 once active models are warmed up, 503 until then."""
+    state = warmup_status()
+    if not state['ready']:
+        ensure_warmup_started()  # No-op when the gunicorn hook already ran warm-up
+        return Response(state, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(state, status=status.HTTP_200_OK)
@@ -0,0 +1,128 @@
+# ml_api/warmup.py
+"""
+Warm-up of active models at worker boot.
+
+Loading every active artifact into the model cache and running one synthetic
+prediction moves the cold joblib.load and first-call costs (NumPy, XGBoost and
+scikit-learn lazy initialisation) out of the first real claim. The readiness
+endpoint reports 200 only once this has finished.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import MLAlgorithm
+
+logger = logging.getLogger(__name__)
+
+WARMUP_FEATURE_COUNT = 18  # Fallback width when a model does not expose n_features_in_
+
+_warmup_done = threading.Event()  # Set once warm-up has finished (successfully or not)
+_warmup_lock = threading.Lock()
+_warmup_started = False
+_warmup_summary = []  # One dict per active algorithm, reported by the readiness endpoint
+
+
+def get_model_file_abs_path(algorithm: MLAlgorithm):
+    """Returns the absolute artifact path for an algorithm (relative paths are joined to BASE_DIR)."""
+    if not algorithm.model_file or not getattr(algorithm.model_file, 'name', None):
+        return None
+    return os.path.join(settings.BASE_DIR, algorithm.model_file.name)
+
+
+def warm_active_models(run_prediction: bool = True):
+    """
+    Loads every active MLAlgorithm into the model cache and runs one synthetic
+    prediction on each. Failures are logged and reported, never raised, so a
+    broken artifact or an unreachable database cannot stop a worker from
+    booting. If the active models cannot be listed, readiness stays 503 and the
+    next readiness probe starts warm-up again.
+
+    Args:
+        run_prediction: Set to False when preloading in the gunicorn master, so
+                        no native thread pools are started before fork.
+
+    Returns:
+        list: Per-algorithm summary dicts.
+    """
+    from .runtimes import get_runtime_model  # runtimes imports this module
+
+    global _warmup_started
+    with _warmup_lock:
+        _warmup_started = True
+
+    warmup_start = time.time()
+    try:
+        active_algorithms = list(MLAlgorithm.objects.filter(is_active=True).order_by('id'))
+    except Exception as e:
+        logger.error("Warm-up could not list active models (pid %d): %s", os.getpid(), e)
+        with _warmup_lock:
+            _warmup_started = False  # Let ensure_warmup_started retry
+        return []
+
+    summary = []
+    for algorithm in active_algorithms:
+        item = {"algorithm_id": algorithm.id, "name": algorithm.name, "version": algorithm.version}
+        model_file_abs_path = get_model_file_abs_path(algorithm)
+        try:
+            if not model_file_abs_path or not os.path.exists(model_file_abs_path):
+                raise FileNotFoundError(f"Model file not found at '{model_file_abs_path}'.")
+            model, _, load_time = get_runtime_model(algorithm, model_file_abs_path)
+            item["load_time_seconds"] = round(load_time, 4)
+            if not run_prediction:
+                item["status"] = "loaded"
+                summary.append(item)
+                continue
+            n_features = getattr(model, "n_features_in_", None) or WARMUP_FEATURE_COUNT
+            predict_start = time.time()
+            model.predict(np.zeros((1, n_features)))  # Synthetic row exercises the predict path
+            item.update({
+                "status": "ok",
+                "predict_time_seconds": round(time.time() - predict_start, 4),
+            })
+        except Exception as e:
+            logger.warning(
+                "Warm-up failed for Algorithm ID %s (%s): %s", algorithm.id, algorithm.name, e
+            )
+            item.update({"status": "failed", "error": str(e)})
+        summary.append(item)
+
+    _warmup_summary[:] = summary
+    _warmup_done.set()
+    logger.info(
+        "Warm-up finished for %d active model(s) in %.4fs (pid %d).",
+        len(summary), time.time() - warmup_start, os.getpid()
+    )
+    return summary
+
+
+def ensure_warmup_started():
+    """
+    Starts warm-up in a background thread if no server hook has run it yet
+    (e.g. under `manage.py runserver`).
+    """
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=warm_active_models, name="model-warmup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    """True once warm-up has finished, or immediately when warm-up is disabled."""
+    return not settings.MODEL_WARMUP_ON_BOOT or _warmup_done.is_set()
+
+
+def warmup_status() -> dict:
+    """Returns the readiness state and the per-model warm-up summary."""
+    return {
+        "ready": is_ready(),
+        "warmup_enabled": settings.MODEL_WARMUP_ON_BOOT,
+        "models": list(_warmup_summary),
+    }
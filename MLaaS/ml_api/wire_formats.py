@@ -0,0 +1,266 @@
+# ml_api/wire_formats.py
+"""
+Binary wire formats for the predict endpoints.
+
+Large batches are far cheaper to move as raw float buffers than as JSON lists.
+predict accepts and returns:
+  application/x-npy                    - a single NumPy .npy array
+  application/vnd.apache.arrow.stream  - an Arrow IPC stream (requires pyarrow)
+
+The request format is chosen by Content-Type and the response format by
+Accept (or ?format=npy / ?format=arrow). JSON stays the default. Decoding
+wraps the request body without copying it, so the array handed to
+model.predict shares memory with the body whenever the payload is already a
+row-major float64 matrix.
+"""
+
+import io
+import json
+
+import numpy as np
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# --- Optional Arrow dependency ---
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401  Registers pa.ipc
+    HAS_PYARROW = True
+except ImportError:
+    pa = None
+    HAS_PYARROW = False
+
+NPY_MEDIA_TYPE = 'application/x-npy'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+PREDICTION_HEADER_PREFIX = 'X-Prediction-'  # Response metadata travels in headers for binary bodies
+
+
+def decode_npy(body: bytes) -> np.ndarray:
+    """
+    Wraps an .npy payload as a read-only array over the body bytes (no copy).
+
+    Raises:
+        ParseError: If the payload is not a valid numeric .npy array.
+    """
+    buffer = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(buffer)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(buffer)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(buffer)
+        else:
+            raise ParseError(f"Unsupported .npy format version {version}.")
+    except ValueError as e:
+        raise ParseError(f"Invalid .npy payload: {e}")
+    if dtype.hasobject or dtype.kind not in 'biuf':
+        raise ParseError(f"Unsupported .npy dtype '{dtype}'; a numeric array is required.")
+
+    count = int(np.prod(shape)) if shape else 1
+    try:
+        array = np.frombuffer(body, dtype=dtype, count=count, offset=buffer.tell())
+    except ValueError as e:
+        raise ParseError(f"Truncated .npy payload: {e}")
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def decode_arrow_stream(body: bytes) -> np.ndarray:
+    """
+    Decodes an Arrow IPC stream into a (rows, features) matrix.
+
+    Two layouts are accepted:
+      - one FixedSizeList<float64> column with one list per row (zero-copy), or
+      - one numeric column per feature, in feature order (one copy to interleave rows).
+
+    Raises:
+        ParseError: If pyarrow is missing or the stream has an unsupported layout.
+    """
+    if not HAS_PYARROW:
+        raise ParseError("Arrow IPC input requires the 'pyarrow' package on the MLaaS service.")
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ParseError(f"Invalid Arrow IPC stream: {e}")
+    if table.num_columns == 0:
+        raise ParseError("Arrow IPC stream contains no columns.")
+
+    first = table.column(0)
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(first.type):
+        rows = first.combine_chunks()  # No-op for the usual single-batch stream
+        values = rows.flatten()
+        if rows.null_count or values.null_count:
+            raise ParseError("Arrow feature rows must not contain nulls.")
+        # A view over the Arrow buffer for primitive numeric values (no copy)
+        return values.to_numpy(zero_copy_only=False).reshape(len(rows), first.type.list_size)
+
+    columns = []
+    for index, column in enumerate(table.columns):
+        if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+                or pa.types.is_boolean(column.type)):
+            raise ParseError(f"Arrow column {index} has non-numeric type '{column.type}'.")
+        if column.null_count:
+            raise ParseError(f"Arrow column {index} contains nulls.")
+        columns.append(column.to_numpy())
+    return np.column_stack(columns)
+
+
+def _read_exactly(stream, n_bytes: int) -> bytes:
+    """Reads n_bytes from a stream that may return short reads."""
+    parts = []
+    remaining = n_bytes
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            raise ParseError(f"Request body ended {remaining} bytes early.")
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+def iter_ndjson_chunks(stream, chunk_rows: int):
+    """
+    Yields lists of up to chunk_rows feature rows from an NDJSON stream
+    (one JSON array per line) without reading the whole body.
+
+    Raises:
+        ParseError: On a line that is not valid JSON.
+    """
+    rows = []
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            raise ParseError(f"Invalid NDJSON on line {line_number}: {e}")
+        if len(rows) == chunk_rows:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def iter_npy_chunks(stream, chunk_rows: int):
+    """
+    Yields (rows, features) arrays of up to chunk_rows rows from a C-ordered
+    2-D .npy stream, reading only one chunk of the body at a time.
+
+    Raises:
+        ParseError: If the header is invalid or the array is not a C-ordered numeric matrix.
+    """
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        elif version == (2, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        else:
+            raise ParseError(f"Unsupported .npy format version {version}.")
+    except ValueError as e:
+        raise ParseError(f"Invalid .npy payload: {e}")
+    if fortran_order or len(shape) != 2 or dtype.hasobject or dtype.kind not in 'biuf':
+        raise ParseError("Bulk .npy input must be a C-ordered 2-D numeric array.")
+
+    n_rows, n_features = shape
+    row_bytes = n_features * dtype.itemsize
+    for start in range(0, n_rows, chunk_rows):
+        count = min(chunk_rows, n_rows - start)
+        chunk = _read_exactly(stream, count * row_bytes)
+        yield np.frombuffer(chunk, dtype=dtype).reshape(count, n_features)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets clients negotiate NDJSON for streaming endpoints; non-streamed bodies render as one line."""
+
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8') + b'\n'
+
+
+class NpyParser(BaseParser):
+    """Parses an .npy request body into {'input_data': ndarray}."""
+
+    media_type = NPY_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {'input_data': decode_npy(stream.read() if stream is not None else b'')}
+
+
+class ArrowStreamParser(BaseParser):
+    """Parses an Arrow IPC stream request body into {'input_data': ndarray}."""
+
+    media_type = ARROW_STREAM_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {'input_data': decode_arrow_stream(stream.read() if stream is not None else b'')}
+
+
+class PredictionBinaryRenderer(BaseRenderer):
+    """
+    Base class for binary prediction renderers. The body holds only the
+    prediction array; the other response fields (request_id, algorithm_version,
+    processing_time_ms, ...) are sent as X-Prediction-* headers. Responses
+    without a prediction (errors) are rendered as JSON.
+    """
+
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if not isinstance(data, dict) or 'prediction' not in data:
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data, renderer_context=renderer_context)
+
+        if response is not None:
+            for key, value in data.items():
+                if key == 'prediction':
+                    continue
+                header = PREDICTION_HEADER_PREFIX + key.replace('_', '-').title()
+                response[header] = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+        return self.encode(np.asarray(data['prediction'], dtype=np.float64))
+
+    def encode(self, prediction: np.ndarray) -> bytes:
+        raise NotImplementedError
+
+
+class NpyRenderer(PredictionBinaryRenderer):
+    """Renders the prediction array as an .npy body."""
+
+    media_type = NPY_MEDIA_TYPE
+    format = 'npy'
+
+    def encode(self, prediction):
+        buffer = io.BytesIO()
+        np.save(buffer, prediction, allow_pickle=False)
+        return buffer.getvalue()
+
+
+class ArrowStreamRenderer(PredictionBinaryRenderer):
+    """Renders the prediction array as a one-column ('prediction') Arrow IPC stream."""
+
+    media_type = ARROW_STREAM_MEDIA_TYPE
+    format = 'arrow'
+
+    def encode(self, prediction):
+        if prediction.ndim > 1:  # Multi-output models: one list per row
+            column = pa.FixedSizeListArray.from_arrays(pa.array(prediction.ravel()), prediction.shape[1])
+        else:
+            column = pa.array(prediction)
+        batch = pa.record_batch([column], names=['prediction'])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+
+# Formats offered by the predict actions in addition to the REST framework defaults
+BINARY_PARSER_CLASSES = [NpyParser] + ([ArrowStreamParser] if HAS_PYARROW else [])
+BINARY_RENDERER_CLASSES = [NpyRenderer] + ([ArrowStreamRenderer] if HAS_PYARROW else [])